@@ -0,0 +1,238 @@
+"""
+Load-test the ask endpoint: sync view under WSGI vs. async view under ASGI.
+
+Creates a throwaway database with synthetic documents, starts a stub Ollama
+that takes --delay seconds per answer, then serves the app twice with the
+same number of worker processes: gunicorn sync workers with the sync view
+(/api/ask/) and uvicorn with the async view (/api/ask/async/). At each
+concurrency level it fires --requests distinct questions and reports
+throughput, latency percentiles, errors and the peak number of LLM calls
+the stub saw in flight at once.
+
+Usage (from backend/):
+    python -m benchmarks.ask_concurrency_benchmark [--concurrency 1 16 64 256] [--requests 256]
+        [--delay 1.0] [--workers 2] [--servers wsgi asgi] [--semantic]
+
+Without --semantic the prompt is built from the stored pages, so no embedding
+model is needed; with it, documents are indexed and every question is
+embedded and searched (needs the embedding model).
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from benchmarks.ollama_stub import start_stub
+
+WORDS = (
+    "agreement party clause payment invoice delivery schedule obligation term notice "
+    "period service quality report review budget revision approval contract section "
+    "liability warranty renewal termination confidential supplier customer annex"
+).split()
+
+SETTINGS_TEMPLATE = """from docgpt.settings import *
+
+DEBUG = False
+DATABASES = {{"default": {{"ENGINE": "django.db.backends.sqlite3", "NAME": {db!r}, "OPTIONS": {{"timeout": 30}}}}}}
+MEDIA_ROOT = {media!r}
+"""
+
+
+def write_settings(work_dir):
+    """
+    A settings module pointing the database and every side store at `work_dir`;
+    returns the environment that selects it
+    """
+    with open(os.path.join(work_dir, "bench_settings.py"), "w") as f:
+        f.write(SETTINGS_TEMPLATE.format(db=os.path.join(work_dir, "db.sqlite3"), media=os.path.join(work_dir, "media")))
+    return {
+        "PYTHONPATH": os.pathsep.join([work_dir, BACKEND_DIR, os.environ.get("PYTHONPATH", "")]),
+        "DJANGO_SETTINGS_MODULE": "bench_settings",
+        "CHROMA_DB_PATH": os.path.join(work_dir, "chroma_db"),
+        "VECTOR_INDEX_PATH": os.path.join(work_dir, "vector_index"),
+        "LEXICAL_INDEX_PATH": os.path.join(work_dir, "lexical.sqlite3"),
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embedding_cache.sqlite3"),
+        "DOCGPT_PRELOAD_MODELS": "False"
+    }
+
+
+def populate(n_documents, n_pages, semantic, seed=5):
+    """
+    Create documents with stored pages (and, with `semantic`, indexed chunks); returns their ids
+    """
+    from django.core.management import call_command
+    from docgpt.models import Document, DocumentPage
+    from docgpt.registry import get_vector_store
+
+    call_command("migrate", verbosity=0)
+    rng = np.random.default_rng(seed)
+    ids = []
+    for number in range(n_documents):
+        document = Document.objects.create(title=f"synthetic-{number}.pdf", status=Document.STATUS_INDEXED)
+        pages = [" ".join(rng.choice(WORDS, 400)) + "." for _ in range(n_pages)]
+        offset = 0
+        for page_number, text in enumerate(pages, 1):
+            DocumentPage.objects.create(document=document, page_number=page_number, text=text, start_offset=offset)
+            offset += len(text) + 1
+        if semantic:
+            vector_store = get_vector_store()
+            chunks = vector_store.chunk_pages(enumerate(pages, 1))
+            vector_store.index_chunks(document.id, document.title, chunks)
+        ids.append(document.id)
+    return ids
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, workers, env, work_dir):
+    port = free_port()
+    if kind == "wsgi":
+        command = [
+            sys.executable, "-m", "gunicorn", "docgpt.wsgi:application",
+            "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--timeout", "600", "--log-level", "warning"
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "docgpt.asgi:application",
+            "--workers", str(workers), "--port", str(port), "--log-level", "warning", "--no-access-log"
+        ]
+    # Run outside backend/ so gunicorn doesn't pick up gunicorn.conf.py (its post_fork loads the models)
+    process = subprocess.Popen(command, cwd=work_dir, env={**os.environ, **env})
+    url = f"http://127.0.0.1:{port}"
+    import httpx
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/api/test/", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+async def load(url, path, document_ids, concurrency, n_requests, semantic):
+    """
+    Send n_requests distinct questions with `concurrency` in flight; returns (latencies, statuses, wall seconds)
+    """
+    import httpx
+
+    questions = iter(range(n_requests))
+    latencies, statuses = [], {}
+
+    async def client_loop(client):
+        for number in questions:
+            payload = {
+                "question": f"What does the {WORDS[number % len(WORDS)]} clause say? (#{number})",
+                "document_id": document_ids[number % len(document_ids)],
+                "use_semantic_search": semantic
+            }
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=httpx.Timeout(600.0, pool=None)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        return latencies, statuses, time.perf_counter() - start
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 1) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--requests", type=int, default=256, help="questions per concurrency level")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds the stub LLM takes per answer")
+    parser.add_argument("--workers", type=int, default=2, help="server worker processes")
+    parser.add_argument("--servers", nargs="+", default=["wsgi", "asgi"], choices=["wsgi", "asgi"])
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--semantic", action="store_true", help="embed and search every question")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="ask-bench-")
+    stub = start_stub(delay=args.delay)
+    env = write_settings(work_dir)
+    env.update({
+        "OLLAMA_BASE_URL": stub.url,
+        "OLLAMA_MODELS": "stub",
+        # Every in-flight question may hold an LLM connection; caches would hide the work
+        "LLM_POOL_SIZE": str(max(args.concurrency)),
+        "ANSWER_CACHE_ENABLED": "False",
+        "QUERY_CACHE_BACKEND": "none"
+    })
+    os.environ.update(env)
+    sys.path.insert(0, work_dir)
+    import django
+    django.setup()
+    document_ids = populate(args.documents, args.pages, args.semantic)
+
+    results = []
+    try:
+        for kind in args.servers:
+            process, url = start_server(kind, args.workers, env, work_dir)
+            path = "/api/ask/" if kind == "wsgi" else "/api/ask/async/"
+            try:
+                for concurrency in args.concurrency:
+                    stub.reset_counters()
+                    latencies, statuses, wall = asyncio.run(
+                        load(url, path, document_ids, concurrency, args.requests, args.semantic)
+                    )
+                    ok = statuses.get(200, 0)
+                    results.append({
+                        "server": kind,
+                        "endpoint": path,
+                        "workers": args.workers,
+                        "concurrency": concurrency,
+                        "requests": args.requests,
+                        "ok": ok,
+                        "errors": {str(status): count for status, count in statuses.items() if status != 200},
+                        "throughput_rps": round(ok / wall, 2),
+                        "latency_p50_ms": percentile_ms(latencies, 50),
+                        "latency_p95_ms": percentile_ms(latencies, 95),
+                        "latency_p99_ms": percentile_ms(latencies, 99),
+                        "llm_peak_in_flight": stub.peak_in_flight
+                    })
+                    print(json.dumps(results[-1]), file=sys.stderr)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    finally:
+        stub.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
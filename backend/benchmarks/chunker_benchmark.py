@@ -0,0 +1,144 @@
+"""
+Compare the legacy character chunker with the token-aware TokenChunker.
+
+Measures chunking throughput, chunk token-length spread (and how many chunks
+overflow the embedding model's window and get silently truncated), and
+retrieval quality on a synthetic corpus with planted facts.
+
+Usage (from backend/):
+    python -m benchmarks.chunker_benchmark [--pages 200] [--facts 50] [--pdf file.pdf ...]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "docgpt.settings")
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from docgpt.chunking import build_chunker
+from docgpt.extraction import iter_pages
+from docgpt.registry import get_embedding_model
+from docgpt.vector_store import DocumentVectorStore
+
+FILLER_WORDS = (
+    "agreement party clause payment invoice delivery schedule obligation term notice "
+    "period service quality report review budget revision approval contract section "
+    "liability warranty renewal termination confidential supplier customer annex"
+).split()
+
+
+def synthetic_pages(n_pages, n_facts, seed=13):
+    """
+    Pages of filler prose with `n_facts` planted sentences; returns (pages, facts)
+    where each fact is (question, unique answer token)
+    """
+    rng = random.Random(seed)
+    facts = []
+    fact_pages = {rng.randrange(n_pages): i for i in range(n_facts)}
+    pages = []
+    for page_number in range(1, n_pages + 1):
+        sentences = []
+        for _ in range(rng.randint(15, 30)):
+            words = rng.choices(FILLER_WORDS, k=rng.randint(6, 40))
+            sentences.append(" ".join(words).capitalize() + ".")
+        if page_number - 1 in fact_pages:
+            code = f"ZX{rng.randint(1000, 9999)}"
+            name = f"{rng.choice(FILLER_WORDS)}-{page_number}"
+            sentences.insert(rng.randrange(len(sentences)), f"The access code for vault {name} is {code}.")
+            facts.append((f"What is the access code for vault {name}?", code))
+        # Uneven line breaks, like real PDF extraction output
+        text = ""
+        for sentence in sentences:
+            text += sentence + ("\n" if rng.random() < 0.3 else " ")
+        pages.append((page_number, text))
+    return pages, facts
+
+
+def token_stats(texts, chunker, window):
+    counts = [chunker.count_tokens(text) for text in texts]
+    return {
+        "chunks": len(counts),
+        "tokens_mean": round(statistics.mean(counts), 1),
+        "tokens_stdev": round(statistics.pstdev(counts), 1),
+        "tokens_min": min(counts),
+        "tokens_max": max(counts),
+        "over_window": sum(1 for count in counts if count > window - 2)
+    }
+
+
+def retrieval_quality(texts, facts, model, k_values=(1, 3, 5)):
+    embeddings = model.encode(texts, normalize_embeddings=True, batch_size=64)
+    queries = model.encode([question for question, _ in facts], normalize_embeddings=True)
+    ranked = np.argsort(-(queries @ embeddings.T), axis=1)
+    return {
+        f"hit@{k}": round(sum(
+            1 for (question, answer), order in zip(facts, ranked)
+            if any(answer in texts[i] for i in order[:k])
+        ) / len(facts), 3)
+        for k in k_values
+    }
+
+
+def run(pages, facts, repeats=3):
+    model = get_embedding_model()
+    window = getattr(model, "max_seq_length", None) or 256
+    chunker = build_chunker(model, max_tokens=settings.CHUNK_MAX_TOKENS, overlap_tokens=settings.CHUNK_OVERLAP_TOKENS)
+    legacy = DocumentVectorStore(client=object(), embedding_model=model)
+    full_text = "".join(text + "\n" for _, text in pages)
+
+    results = {"pages": len(pages), "characters": len(full_text)}
+    for name, chunk in (
+        ("legacy_char_chunker", lambda: legacy.chunk_text(full_text)),
+        ("token_chunker", lambda: [c["text"] for c in chunker.chunk_pages(pages)]),
+    ):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            texts = chunk()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        entry = {
+            "seconds": round(best, 4),
+            "pages_per_sec": round(len(pages) / best, 1),
+            "mb_per_sec": round(len(full_text) / best / 1e6, 2),
+        }
+        entry.update(token_stats(texts, chunker, window))
+        if facts:
+            entry.update(retrieval_quality(texts, facts, model))
+        results[name] = entry
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--facts", type=int, default=50)
+    parser.add_argument("--pdf", nargs="*", default=[], help="benchmark real PDFs (throughput and token stats only)")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if args.pdf:
+        results = [dict(file=path, **run(list(iter_pages(path)), [])) for path in args.pdf]
+    else:
+        pages, facts = synthetic_pages(args.pages, min(args.facts, args.pages))
+        results = [dict(file="synthetic", **run(pages, facts))]
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Local stand-in for the Ollama /api/generate endpoint, for benchmarks.
+
+Answers every model with a fixed text after a configurable delay (streamed
+as newline-delimited JSON when "stream" is set, like Ollama), and counts
+requests and the peak number handled at once, so benchmarks measure DocGPT
+rather than a real model.
+
+Usage (from backend/):
+    python -m benchmarks.ollama_stub [--port 11434] [--delay 1.0]
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER_TOKENS = ["The", " answer", " is", " in", " the", " document", "."]
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, address, delay: float = 0.0):
+        super().__init__(address, _Handler)
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.peak_in_flight = self.in_flight
+
+    def _enter(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": []})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        server._enter()
+        try:
+            if not request.get("stream"):
+                time.sleep(server.delay)
+                self._send_json(200, {
+                    "model": request.get("model"),
+                    "response": "".join(ANSWER_TOKENS),
+                    "done": True,
+                    "prompt_eval_count": len(request.get("prompt", "").split()),
+                    "eval_count": len(ANSWER_TOKENS)
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in ANSWER_TOKENS + [None]:
+                time.sleep(server.delay / (len(ANSWER_TOKENS) + 1))
+                line = json.dumps({"response": token or "", "done": token is None}).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            server._leave()
+
+
+def start_stub(port: int = 0, delay: float = 0.0) -> StubOllamaServer:
+    """
+    Start the stub on a background thread; port 0 picks a free port (see .url)
+    """
+    server = StubOllamaServer(("127.0.0.1", port), delay=delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds per answer")
+    args = parser.parse_args()
+    server = StubOllamaServer(("127.0.0.1", args.port), delay=args.delay)
+    print(f"Stub Ollama listening on {server.url} ({args.delay}s per answer)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
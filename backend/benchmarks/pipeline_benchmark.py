@@ -0,0 +1,331 @@
+"""
+Benchmark the ingestion and query hot paths across corpus sizes.
+
+Writes synthetic PDFs (--pages pages each) and ingests them into a throwaway
+database and vector store, growing the corpus to each --corpus size in
+turn. At every size it measures:
+
+    chunk_text / chunk_pages   chunking one document's text (character / token chunker)
+    add_document               extraction, chunking, embedding and indexing of each new PDF
+    search_documents           queries within one document and across the whole corpus
+    get_document_stats         corpus-wide and per-document stats
+    ask                        POST /api/ask/ end to end, with a stub standing in for Ollama
+                               (the per-stage breakdown is averaged over the questions)
+
+and reports throughput, latency percentiles, peak RSS and the on-disk size
+of the index as JSON. With --baseline the run is compared to an earlier
+result file: any throughput (*_per_sec) that fell, or median latency
+(p50_ms) or memory / disk figure (*_mb) that rose, by more than --tolerance
+is listed (as are failed questions) and the exit status is 1, so the
+suite can gate a deploy.
+
+Usage (from backend/):
+    python -m benchmarks.pipeline_benchmark [--corpus 1 5 20] [--pages 20] [--queries 20]
+        [--delay 0.05] [--output results.json] [--baseline previous.json] [--tolerance 0.2]
+
+Needs the embedding model (EMBEDDING_MODEL_NAME); the vector backend follows
+VECTOR_BACKEND. Caches are disabled so every call does its work.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+from benchmarks.ollama_stub import start_stub
+from benchmarks.synthetic_pdf import WORDS, make_pdf
+from benchmarks.ask_concurrency_benchmark import write_settings
+
+# Metrics compared against a baseline, by name suffix
+HIGHER_IS_BETTER = ("_per_sec",)
+LOWER_IS_BETTER = ("p50_ms", "_mb")
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+
+def latency_stats(seconds):
+    return {
+        "calls": len(seconds),
+        "calls_per_sec": round(len(seconds) / max(sum(seconds), 1e-9), 1),
+        "p50_ms": percentile_ms(seconds, 50),
+        "p95_ms": percentile_ms(seconds, 95),
+        "p99_ms": percentile_ms(seconds, 99)
+    }
+
+
+def timed(function, arguments):
+    """
+    Call `function` once per argument; returns the latencies in seconds
+    """
+    latencies = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def max_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def directory_mb(path):
+    if os.path.isfile(path):
+        return round(os.path.getsize(path) / 1e6, 2)
+    total = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+    return round(total / 1e6, 2)
+
+
+def questions(n, seed=3):
+    rng = random.Random(seed)
+    return [
+        f"What does the {rng.choice(WORDS)} {rng.choice(WORDS)} clause say about {rng.choice(WORDS)}?"
+        for _ in range(n)
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ingest(vector_store, pdf_dir, first, last, n_pages):
+    """
+    Write and add documents `first`..`last - 1`; returns (document ids, chunking and add_document results)
+    """
+    from docgpt.models import Document
+
+    document_ids = []
+    chunk_text_seconds, chunk_pages_seconds, add_seconds = [], [], []
+    characters = 0
+    for number in range(first, last):
+        path = os.path.join(pdf_dir, f"synthetic-{number}.pdf")
+        page_texts = make_pdf(path, n_pages, seed=number + 1)
+        text = "\n".join(page_texts)
+        characters += len(text)
+
+        start = time.perf_counter()
+        vector_store.chunk_text(text)
+        chunk_text_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        vector_store.chunk_pages(enumerate(page_texts, 1))
+        chunk_pages_seconds.append(time.perf_counter() - start)
+
+        document = Document.objects.create(title=os.path.basename(path), status=Document.STATUS_INDEXED)
+        start = time.perf_counter()
+        if not vector_store.add_document(document.id, path, document.title):
+            raise RuntimeError(f"add_document failed for {path}")
+        add_seconds.append(time.perf_counter() - start)
+        document_ids.append(document.id)
+
+    def chunking(seconds):
+        return dict(latency_stats(seconds), mb_per_sec=round(characters / max(sum(seconds), 1e-9) / 1e6, 2))
+
+    n_documents = last - first
+    return document_ids, {
+        "chunk_text": chunking(chunk_text_seconds),
+        "chunk_pages": chunking(chunk_pages_seconds),
+        "add_document": dict(
+            latency_stats(add_seconds),
+            documents=n_documents,
+            pages_per_sec=round(n_documents * n_pages / max(sum(add_seconds), 1e-9), 1)
+        )
+    }
+
+
+def ask(document_ids, queries):
+    """
+    Ask every question through the API; returns latency stats and the mean time per stage
+    """
+    from django.test import Client
+
+    client = Client()
+    latencies, stages, failures = [], {}, 0
+    for number, question in enumerate(queries):
+        start = time.perf_counter()
+        response = client.post("/api/ask/", {
+            "question": question,
+            "document_id": document_ids[number % len(document_ids)],
+            "debug": True
+        }, content_type="application/json")
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            failures += 1
+            continue
+        for name, seconds in response.json().get("timings", {}).items():
+            stages.setdefault(name, []).append(seconds)
+    return dict(
+        latency_stats(latencies),
+        failures=failures,
+        stages_ms={name: round(float(np.mean(values)) * 1000, 2) for name, values in stages.items()}
+    )
+
+
+def run(corpus_sizes, n_pages, n_queries, work_dir):
+    from django.conf import settings
+    from docgpt.registry import get_vector_store
+
+    vector_store = get_vector_store()
+    pdf_dir = os.path.join(work_dir, "pdfs")
+    os.makedirs(pdf_dir)
+    index_path = settings.CHROMA_DB_PATH if settings.VECTOR_BACKEND == "chroma" else settings.VECTOR_INDEX_PATH
+    queries = questions(n_queries)
+    # Load the embedding model and tokenizer before anything is timed
+    vector_store.encode(queries[:4])
+    vector_store.chunk_pages([(1, queries[0])])
+
+    document_ids = []
+    results = []
+    for size in sorted(set(corpus_sizes)):
+        if size <= len(document_ids):
+            continue
+        new_ids, step = ingest(vector_store, pdf_dir, len(document_ids), size, n_pages)
+        document_ids.extend(new_ids)
+        stats = vector_store.get_document_stats()
+
+        # One untimed call each, so first-use setup isn't counted
+        vector_store.search_documents(queries[0], document_id=document_ids[0])
+        vector_store.search_documents(queries[0])
+        step["search_one_document"] = latency_stats(timed(
+            lambda query: vector_store.search_documents(query, document_id=document_ids[0]), queries
+        ))
+        step["search_all_documents"] = latency_stats(timed(vector_store.search_documents, queries))
+        step["stats_all_documents"] = latency_stats(timed(lambda _: vector_store.get_document_stats(), queries))
+        step["stats_one_document"] = latency_stats(timed(vector_store.get_document_stats, [document_ids[0]] * n_queries))
+        step["ask"] = ask(document_ids, queries)
+
+        results.append(dict(
+            corpus_documents=len(document_ids),
+            corpus_pages=len(document_ids) * n_pages,
+            corpus_chunks=stats.get("total_chunks"),
+            **step,
+            memory={"max_rss_mb": max_rss_mb(), "index_mb": directory_mb(index_path)}
+        ))
+        print(json.dumps({"corpus_documents": len(document_ids), "ask": step["ask"]}), file=sys.stderr)
+    return results
+
+
+def flatten(report):
+    """
+    {"<documents> docs / <section> / <metric>": value} for every number in a report's results
+    """
+    metrics = {}
+    for step in report["results"]:
+        for section, values in step.items():
+            if isinstance(values, dict):
+                for name, value in values.items():
+                    if isinstance(value, (int, float)):
+                        metrics[f"{step['corpus_documents']} docs / {section} / {name}"] = value
+    return metrics
+
+
+def regressions(report, baseline, tolerance):
+    current, previous = flatten(report), flatten(baseline)
+    found = []
+    for key, before in previous.items():
+        after = current.get(key)
+        if after is None or not before:
+            continue
+        if key.endswith(HIGHER_IS_BETTER) and after < before * (1 - tolerance):
+            found.append(f"{key}: {before} -> {after}")
+        elif key.endswith(LOWER_IS_BETTER) and after > before * (1 + tolerance):
+            found.append(f"{key}: {before} -> {after}")
+    # Failed questions are a regression at any tolerance
+    found.extend(
+        f"{key}: {previous.get(key, 0)} -> {after}"
+        for key, after in current.items() if key.endswith("/ failures") and after > previous.get(key, 0)
+    )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--corpus", type=int, nargs="+", default=[1, 5, 20], help="corpus sizes in documents")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic PDF")
+    parser.add_argument("--queries", type=int, default=20, help="searches / stats calls / questions per corpus size")
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds the stub LLM takes per answer")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    stub = start_stub(delay=args.delay)
+    env = write_settings(work_dir)
+    env.update({
+        "OLLAMA_BASE_URL": stub.url,
+        "OLLAMA_MODELS": "stub",
+        "ANSWER_CACHE_ENABLED": "False",
+        "QUERY_CACHE_BACKEND": "none",
+        "EMBEDDING_CACHE_ENABLED": "False"
+    })
+    os.environ.update(env)
+    sys.path.insert(0, work_dir)
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+    try:
+        results = run(args.corpus, args.pages, args.queries, work_dir)
+    finally:
+        stub.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "environment": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.time()
+        },
+        "config": {
+            "pages_per_document": args.pages,
+            "queries": args.queries,
+            "llm_delay": args.delay,
+            "embedding_model": settings.EMBEDDING_MODEL_NAME,
+            "vector_backend": settings.VECTOR_BACKEND,
+            "search_mode": settings.SEARCH_MODE,
+            "rerank": settings.RERANK_ENABLED
+        },
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"Regression: {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Measure query-embedding latency and throughput with and without micro-batching.
+
+Starts N client threads that each embed distinct search queries through
+DocumentVectorStore.embed_query, as concurrent requests would, first with
+every query encoded on its own (QUERY_BATCH_MAX_SIZE=1) and then through the
+micro-batcher at each --max-wait window. For every concurrency level it
+reports throughput, latency percentiles (p50 / p95 / p99) and the average and
+largest batch the encoder saw. The query cache is disabled so every query is
+encoded.
+
+Usage (from backend/):
+    python -m benchmarks.query_batching_benchmark [--concurrency 1 4 16 64] [--queries 512]
+        [--batch-size 32] [--max-wait 0 2 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "docgpt.settings")
+# A cached query embedding would skip the encoder
+os.environ["QUERY_CACHE_BACKEND"] = "none"
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from docgpt.registry import get_embedding_model
+from docgpt.vector_store import DocumentVectorStore
+
+WORDS = (
+    "agreement party clause payment invoice delivery schedule obligation term notice "
+    "period service quality report review budget revision approval contract section "
+    "liability warranty renewal termination confidential supplier customer annex"
+).split()
+
+
+def questions(n, seed=11):
+    rng = np.random.default_rng(seed)
+    return [
+        f"What does the {' '.join(rng.choice(WORDS, 3))} section say about {rng.choice(WORDS)}? (#{i})"
+        for i in range(n)
+    ]
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+
+def load(vector_store, queries, concurrency):
+    """
+    Embed every query with `concurrency` threads; returns (latencies, wall seconds)
+    """
+    pending = iter(queries)
+    pending_lock = threading.Lock()
+    latencies = []
+
+    def client():
+        while True:
+            with pending_lock:
+                query = next(pending, None)
+            if query is None:
+                return
+            start = time.perf_counter()
+            vector_store.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def run(concurrency_levels, n_queries, batch_size, max_waits):
+    model = get_embedding_model()
+    queries = questions(n_queries)
+    # Warm up the model (first calls allocate buffers)
+    model.encode(queries[:batch_size], batch_size=batch_size)
+
+    modes = [("unbatched", 1, 0.0)] + [(f"batched, wait {wait:g} ms", batch_size, wait) for wait in max_waits]
+    results = []
+    for mode, size, wait in modes:
+        settings.QUERY_BATCH_MAX_SIZE = size
+        settings.QUERY_BATCH_MAX_WAIT_MS = wait
+        vector_store = DocumentVectorStore(embedding_model=model)
+        for concurrency in concurrency_levels:
+            batcher = vector_store.query_batcher
+            if batcher is not None:
+                batcher.reset_stats()
+            latencies, wall = load(vector_store, queries, concurrency)
+            batches = batcher.stats() if batcher is not None else {"average_batch": 1.0, "largest_batch": 1}
+            results.append({
+                "mode": mode,
+                "max_batch_size": size,
+                "max_wait_ms": wait,
+                "concurrency": concurrency,
+                "queries": len(latencies),
+                "throughput_qps": round(len(latencies) / wall, 1),
+                "latency_p50_ms": percentile_ms(latencies, 50),
+                "latency_p95_ms": percentile_ms(latencies, 95),
+                "latency_p99_ms": percentile_ms(latencies, 99),
+                "average_batch": batches["average_batch"],
+                "largest_batch": batches["largest_batch"]
+            })
+            print(json.dumps(results[-1]), file=sys.stderr)
+    return {"model": settings.EMBEDDING_MODEL_NAME, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--queries", type=int, default=512, help="queries per concurrency level")
+    parser.add_argument("--batch-size", type=int, default=32, help="largest batch encoded at once")
+    parser.add_argument("--max-wait", type=float, nargs="+", default=[0, 2, 5], help="batching windows in ms")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.concurrency, args.queries, args.batch_size, args.max_wait)
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
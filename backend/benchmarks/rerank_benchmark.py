@@ -0,0 +1,107 @@
+"""
+Measure the latency / quality trade-off of cross-encoder reranking.
+
+Builds a synthetic corpus with planted facts, retrieves candidates by dense
+similarity and compares hit@k of the first-stage ranking with hit@k after
+reranking N candidates, together with per-query rerank latency (p50 / p95)
+for each candidate count and time budget.
+
+Usage (from backend/):
+    python -m benchmarks.rerank_benchmark [--pages 200] [--facts 50] [--candidates 10 20 30 50] [--budget 0.5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "docgpt.settings")
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from sentence_transformers import CrossEncoder
+from docgpt.chunking import build_chunker
+from docgpt.registry import get_embedding_model
+from docgpt.rerank import Reranker
+from benchmarks.chunker_benchmark import synthetic_pages
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+
+def hit_rate(rankings, texts, facts, k):
+    return round(sum(
+        1 for (_, answer), ranking in zip(facts, rankings)
+        if any(answer in texts[i] for i in ranking[:k])
+    ) / len(facts), 3)
+
+
+def run(pages, facts, candidate_counts, budgets, top_k=3):
+    model = get_embedding_model()
+    chunker = build_chunker(model, max_tokens=settings.CHUNK_MAX_TOKENS, overlap_tokens=settings.CHUNK_OVERLAP_TOKENS)
+    texts = [chunk["text"] for chunk in chunker.chunk_pages(pages)]
+
+    embeddings = model.encode(texts, normalize_embeddings=True, batch_size=64, convert_to_numpy=True)
+    queries = model.encode([question for question, _ in facts], normalize_embeddings=True, convert_to_numpy=True)
+    dense = np.argsort(-(queries @ embeddings.T), axis=1)
+
+    results = {
+        "chunks": len(texts),
+        "queries": len(facts),
+        "rerank_model": settings.RERANK_MODEL_NAME,
+        "dense": {f"hit@{k}": hit_rate(dense, texts, facts, k) for k in (1, top_k)}
+    }
+
+    cross_encoder = CrossEncoder(settings.RERANK_MODEL_NAME, device="cpu")
+    for budget in budgets:
+        for n_candidates in candidate_counts:
+            reranker = Reranker(cross_encoder, batch_size=settings.RERANK_BATCH_SIZE, time_budget=budget)
+            rankings, latencies, skipped = [], [], 0
+            for (question, _), order in zip(facts, dense):
+                candidates = [{"index": int(i), "text": texts[i]} for i in order[:n_candidates]]
+                info = {}
+                reranked = reranker.rerank(question, candidates, top_k, info=info)
+                rankings.append([result["index"] for result in reranked])
+                latencies.append(info["seconds"])
+                skipped += 0 if info["reranked"] else 1
+            results[f"rerank_{n_candidates}_budget_{budget or 'none'}"] = {
+                "candidates": n_candidates,
+                "time_budget": budget,
+                "hit@1": hit_rate(rankings, texts, facts, 1),
+                f"hit@{top_k}": hit_rate(rankings, texts, facts, top_k),
+                "latency_p50": percentile(latencies, 50),
+                "latency_p95": percentile(latencies, 95),
+                "latency_mean": round(statistics.mean(latencies), 4),
+                "skipped": skipped
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--facts", type=int, default=50)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 30, 50])
+    parser.add_argument("--budget", type=float, nargs="+", default=[0.0, settings.RERANK_TIME_BUDGET],
+                        help="per-request time budgets in seconds (0 = unlimited)")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    pages, facts = synthetic_pages(args.pages, min(args.facts, args.pages))
+    results = run(pages, facts, args.candidates, args.budget)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Write synthetic text PDFs of a given size for benchmarks.
+
+Pages hold filler prose (about 4 KB of text each) set in Helvetica, one
+text line per PDF line, so PyPDF2 extracts them like a typical text PDF.
+Output is deterministic for a given seed.
+
+Usage (from backend/):
+    python -m benchmarks.synthetic_pdf out.pdf [--pages 50] [--seed 1]
+"""
+import random
+import argparse
+import textwrap
+from typing import List
+
+WORDS = (
+    "agreement party clause payment invoice delivery schedule obligation term notice "
+    "period service quality report review budget revision approval contract section "
+    "liability warranty renewal termination confidential supplier customer annex"
+).split()
+
+LINE_CHARACTERS = 95
+LINES_PER_PAGE = 60
+
+
+def synthetic_page_texts(n_pages: int, seed: int = 1, sentences=(16, 24)) -> List[str]:
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(1, n_pages + 1):
+        text = " ".join(
+            " ".join(rng.choices(WORDS, k=rng.randint(6, 40))).capitalize() + "."
+            for _ in range(rng.randint(*sentences))
+        )
+        # A sentence unique to the page, so every page (and document) has distinct chunks
+        pages.append(f"Reference {seed}-{page_number} applies to this page. {text}")
+    return pages
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, page_texts: List[str]) -> None:
+    """
+    Write one PDF page per text, wrapped to the page width (text beyond LINES_PER_PAGE lines is dropped)
+    """
+    n_pages = len(page_texts)
+    font_object = 3 + 2 * n_pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(n_pages)), n_pages
+        )).encode()
+    ]
+    for i, text in enumerate(page_texts):
+        lines = textwrap.wrap(text, LINE_CHARACTERS)[:LINES_PER_PAGE]
+        content = "BT /F1 9 Tf 11 TL 40 760 Td\n" + "\n".join(f"({_escape(line)}) Tj T*" for line in lines) + "\nET"
+        content = content.encode("latin-1", "replace")
+        objects.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_object} 0 R >> >> >>"
+        ).encode())
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def make_pdf(path: str, n_pages: int, seed: int = 1) -> List[str]:
+    """
+    Write a synthetic PDF with `n_pages` pages; returns the page texts
+    """
+    page_texts = synthetic_page_texts(n_pages, seed)
+    write_pdf(path, page_texts)
+    return page_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    make_pdf(args.path, args.pages, args.seed)
+    print(f"Wrote {args.pages} pages to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Compare vector backends on the same corpus: recall@k vs. query latency vs. memory.
+
+Builds a clustered synthetic corpus of unit vectors (or loads real embeddings
+from an .npy file), computes exact top-k neighbours as ground truth and then,
+for each backend (Chroma HNSW, NumPy flat, NumPy IVF at several probe counts)
+and each storage mode of the NumPy index (float32, int8 or binary codes with
+float rescoring), measures build time, per-query latency (p50 / p95),
+recall@k, the size of the data a query scans (what has to stay in RAM),
+resident memory after querying (anonymous and file-backed) and on-disk size. Every configuration runs in
+its own process so memory numbers don't bleed into each other.
+
+Usage (from backend/):
+    python -m benchmarks.vector_backend_benchmark [--vectors 100000] [--dim 384] [--queries 200]
+        [--probes 4 8 16 32] [--backends chroma flat ivf] [--quantization none int8 binary]
+        [--rescore 8] [--embeddings file.npy]
+"""
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import argparse
+import tempfile
+import resource
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+
+def synthetic_vectors(n, dim, clusters=1000, seed=7):
+    """
+    Unit vectors drawn around random cluster centres, roughly like sentence
+    embeddings of a corpus made of many topics
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 1.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_neighbours(vectors, queries, k):
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def memory_mb():
+    """
+    Resident memory split into anonymous (heap) and file-backed pages (Linux).
+    Mapped index files show up as file-backed pages, which also include
+    neighbouring pages the kernel maps in around each fault, so they overstate
+    what random row reads need; scanned_mb is the hot working set.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith("Rss"))
+        return {
+            key: round(int(fields[field].split()[0]) / 1024, 1)
+            for key, field in (("anon", "RssAnon"), ("file", "RssFile"))
+        }
+    except (OSError, KeyError):
+        peak = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return {"anon": peak, "file": 0.0}
+
+
+def directory_mb(path):
+    return round(sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / 2 ** 20, 1)
+
+
+def open_collection(backend, path, probes, quantization, rescore_factor):
+    if backend == "chroma":
+        import chromadb
+        from chromadb.config import Settings
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        return client, client.get_or_create_collection(name="bench", metadata={"hnsw:space": "cosine"})
+    from docgpt.vector_backends import NumpyVectorClient
+    # Clustering is triggered explicitly once everything is loaded
+    client = NumpyVectorClient(
+        path, index=backend, ivf_probes=probes, ivf_min_train=2 ** 62,
+        quantization=quantization, rescore_factor=rescore_factor
+    )
+    return client, client.get_or_create_collection("bench")
+
+
+def scanned_mb(collection):
+    # Codes (plus scales) when quantized, the float vectors otherwise
+    sizes = collection.nbytes()
+    names = ("codes.i8", "scales.f32", "codes.u8") if collection.quantization != "none" else ("vectors.f32",)
+    return round(sum(sizes.get(name, 0) for name in names) / 2 ** 20, 1)
+
+
+def build_index(backend, quantization, path, data_dir, rescore_factor, result_queue):
+    vectors = np.load(os.path.join(data_dir, "vectors.npy"), mmap_mode="r")
+    client, collection = open_collection(backend, path, 1, quantization, rescore_factor)
+    batch_size = client.get_max_batch_size()
+
+    start = time.perf_counter()
+    for batch_start in range(0, len(vectors), batch_size):
+        batch = np.asarray(vectors[batch_start:batch_start + batch_size])
+        collection.add(
+            ids=[str(i) for i in range(batch_start, batch_start + len(batch))],
+            embeddings=batch if backend != "chroma" else batch.tolist(),
+            metadatas=[{"document_id": (batch_start + i) // 100} for i in range(len(batch))],
+            documents=[""] * len(batch)
+        )
+    if backend == "ivf":
+        collection.train()
+    result_queue.put(time.perf_counter() - start)
+
+
+def query_index(backend, quantization, path, data_dir, probes, k, rescore_factor, result_queue):
+    # Runs in a fresh process, so resident memory covers what querying touches, not the build
+    queries = np.load(os.path.join(data_dir, "queries.npy"))
+    truth = np.load(os.path.join(data_dir, "truth.npy"))
+    baseline = memory_mb()
+    _, collection = open_collection(backend, path, probes[0], quantization, rescore_factor)
+
+    results = []
+    for n_probes in (probes if backend == "ivf" else [None]):
+        if n_probes is not None:
+            collection.ivf_probes = n_probes
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            begin = time.perf_counter()
+            found = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+            latencies.append(time.perf_counter() - begin)
+            hits += len({int(i) for i in found["ids"][0]} & set(expected.tolist()))
+        name = backend if n_probes is None else f"ivf(probes={n_probes})"
+        results.append({
+            "backend": name if backend == "chroma" else f"{name}/{quantization}",
+            f"recall@{k}": round(hits / (len(queries) * k), 4),
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            "scanned_mb": scanned_mb(collection) if backend != "chroma" else None,
+            **{f"rss_{key}_mb": round(value - baseline[key], 1) for key, value in memory_mb().items()}
+        })
+    result_queue.put(results)
+
+
+def run_in_process(target, *args):
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=target, args=args + (result_queue,))
+    process.start()
+    while True:
+        try:
+            result = result_queue.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"{target.__name__}{args[:2]} exited with code {process.exitcode}")
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--backends", nargs="+", default=["chroma", "flat", "ivf"], choices=["chroma", "flat", "ivf"])
+    parser.add_argument("--quantization", nargs="+", default=["none", "int8", "binary"],
+                        choices=["none", "int8", "binary"], help="storage modes of the numpy backends")
+    parser.add_argument("--rescore", type=int, default=8, help="candidates rescored per result when quantized")
+    parser.add_argument("--embeddings", help="benchmark on real embeddings from an (n, dim) .npy file instead")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim)
+    # Queries are perturbed corpus vectors, so each has close neighbours
+    rng = np.random.default_rng(11)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.8 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    data_dir = tempfile.mkdtemp(prefix="vector-bench-data-")
+    try:
+        np.save(os.path.join(data_dir, "vectors.npy"), vectors)
+        np.save(os.path.join(data_dir, "queries.npy"), queries)
+        np.save(os.path.join(data_dir, "truth.npy"), exact_neighbours(vectors, queries, args.k))
+        n_vectors = len(vectors)
+        del vectors
+
+        results = []
+        configurations = [
+            (backend, quantization)
+            for backend in args.backends
+            for quantization in (["none"] if backend == "chroma" else args.quantization)
+        ]
+        for backend, quantization in configurations:
+            path = tempfile.mkdtemp(prefix=f"vector-bench-{backend}-")
+            try:
+                build_seconds = run_in_process(build_index, backend, quantization, path, data_dir, args.rescore)
+                for result in run_in_process(
+                    query_index, backend, quantization, path, data_dir, args.probes, args.k, args.rescore
+                ):
+                    result.update(vectors=n_vectors, build_seconds=round(build_seconds, 2), disk_mb=directory_mb(path))
+                    results.append(result)
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 from django.http import JsonResponse
 from django.urls import path
 from .views import (
-    DocumentUploadView, AskDocumentView, TestView, DocumentViewSet,
-    DocumentStatsView, DocumentDeleteView
+    DocumentUploadView, BatchDocumentUploadView, AskDocumentView, AskDocumentStreamView, TestView, DocumentViewSet,
+    DocumentStatsView, DocumentDeleteView, DocumentStatusView, ask_document_async
 )
 from rest_framework.routers import DefaultRouter
 
@@ -10,17 +10,30 @@ def api_root(request):
     return JsonResponse({
         "endpoints": {
             "upload": "/api/upload/",
+            "upload_batch": "/api/upload/batch/",
             "ask": "/api/ask/",
+            "ask_stream": "/api/ask/stream/",
+            "ask_async": "/api/ask/async/",
             "test": "/api/test/",
             "documents": "/api/documents/",
             "stats": "/api/stats/",
-            "delete": "/api/delete/<document_id>/"
+            "delete": "/api/delete/<document_id>/",
+            "status": "/api/status/<document_id>/",
+            "metrics": "/metrics"
         },
         "features": {
             "semantic_search": True,
             "vector_store": True,
             "document_chunking": True,
-            "ai_powered_qa": True
+            "ai_powered_qa": True,
+            "background_ingestion": True,
+            "streaming_answers": True,
+            "bulk_ingestion": True,
+            "multi_document_qa": True,
+            "hybrid_search": True,
+            "async_ask": True,
+            "request_coalescing": True,
+            "latency_metrics": True
         }
     })
 
@@ -30,9 +43,13 @@ router.register(r'documents', DocumentViewSet)
 urlpatterns = [
     path('', api_root),
     path('upload/', DocumentUploadView.as_view(), name='upload-document'),
+    path('upload/batch/', BatchDocumentUploadView.as_view(), name='upload-documents-batch'),
     path('ask/', AskDocumentView.as_view(), name='ask-document'),
+    path('ask/stream/', AskDocumentStreamView.as_view(), name='ask-document-stream'),
+    path('ask/async/', ask_document_async, name='ask-document-async'),
     path('test/', TestView.as_view(), name='test'),
     path('stats/', DocumentStatsView.as_view(), name='document-stats'),
     path('stats/<int:document_id>/', DocumentStatsView.as_view(), name='document-stats-detail'),
     path('delete/<int:document_id>/', DocumentDeleteView.as_view(), name='delete-document'),
+    path('status/<int:document_id>/', DocumentStatusView.as_view(), name='document-status'),
 ] + router.urls
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class DocgptConfig(AppConfig):
+    name = 'docgpt'
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        # Models are loaded lazily on first use unless preloading is requested.
+        # When preloading inside a pre-fork master (gunicorn preload_app), only the
+        # embedding model is loaded so each worker opens its own Chroma client.
+        if settings.DOCGPT_PRELOAD_MODELS:
+            from .registry import warm_up
+            warm_up(include_client=False)
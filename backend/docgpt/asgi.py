@@ -0,0 +1,9 @@
+# ASGI entry point, for the async ask view (/api/ask/async/):
+#   uvicorn docgpt.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'docgpt.settings')
+
+application = get_asgi_application()
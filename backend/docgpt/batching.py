@@ -0,0 +1,104 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects items submitted by concurrent callers and processes them in batches.
+
+    A background thread takes the first waiting item, keeps collecting for up
+    to `max_wait` seconds or until `max_batch_size` items are queued, then
+    calls `function` once with the distinct items and hands each caller its
+    own result (or the exception). While a batch is being processed new items
+    queue up, so under load batches fill without waiting; an idle caller pays
+    at most `max_wait`. The thread is started lazily and again after a fork.
+    """
+
+    def __init__(
+        self,
+        function: Callable[[List[Hashable]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait: float = 0.002,
+        name: str = "docgpt-batcher"
+    ):
+        self.function = function
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def _pending(self) -> queue.SimpleQueue:
+        if self._queue is None or self._pid != os.getpid():
+            with self._lock:
+                if self._queue is None or self._pid != os.getpid():
+                    pending = queue.SimpleQueue()
+                    threading.Thread(target=self._work, args=(pending,), name=self.name, daemon=True).start()
+                    self._queue = pending
+                    self._pid = os.getpid()
+        return self._queue
+
+    def submit(self, item: Hashable) -> Future:
+        future = Future()
+        self._pending().put((item, future))
+        return future
+
+    def run(self, item: Hashable) -> Any:
+        """
+        Submit `item` and wait for its result
+        """
+        return self.submit(item).result()
+
+    def _collect(self, pending: queue.SimpleQueue) -> List[tuple]:
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self, pending: queue.SimpleQueue) -> None:
+        while True:
+            batch = self._collect(pending)
+            # Identical items in one batch are processed once
+            distinct = list(dict.fromkeys(item for item, _ in batch))
+            try:
+                results = dict(zip(distinct, self.function(distinct)))
+            except Exception as e:
+                logger.warning(f"{self.name}: batch of {len(distinct)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            for item, future in batch:
+                future.set_result(results[item])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "largest_batch": self.largest_batch,
+                "average_batch": round(self.items / self.batches, 2) if self.batches else 0.0
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.batches = self.items = self.largest_batch = 0
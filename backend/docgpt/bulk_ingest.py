@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import logging
+from itertools import islice
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .models import Document
+from .extraction import Page, extract_pages_timed, get_process_pool, can_use_process_pool, store_pages
+from .registry import get_vector_store
+from .metrics import observe_stages
+
+logger = logging.getLogger(__name__)
+
+
+class IngestManifest:
+    """
+    Append-only JSON-lines record of bulk ingestion progress, keyed by source path.
+
+    The last line for a path wins, so an interrupted run can be resumed by
+    reloading the manifest and skipping paths that are already indexed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    self.entries[entry["path"]] = entry
+        self._file = open(path, "a")
+
+    def record(self, path: str, **fields) -> None:
+        entry = dict(self.entries.get(path, {}), path=path, updated_at=time.time(), **fields)
+        self.entries[path] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def status(self, path: str) -> Optional[str]:
+        return self.entries.get(path, {}).get("status")
+
+    def document_id(self, path: str) -> Optional[int]:
+        return self.entries.get(path, {}).get("document_id")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def create_documents(files: Iterable[Tuple[str, object]], collection: str = "") -> List[Document]:
+    """
+    Save (title, file) pairs to media storage and create their Document rows
+    with a single bulk_create. `file` is a Django File/UploadedFile or a path.
+    """
+    documents = []
+    for title, source in files:
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                name = default_storage.save(f"uploads/{os.path.basename(title)}", File(f))
+        else:
+            name = default_storage.save(f"uploads/{os.path.basename(title)}", source)
+        documents.append(Document(title=title, file=name, collection=collection, status=Document.STATUS_QUEUED))
+    return Document.objects.bulk_create(documents, batch_size=500)
+
+
+def iter_extracted(paths: List[str], workers: int) -> Iterator[Tuple[str, Optional[List[Page]], float, Optional[str]]]:
+    """
+    Extract many PDFs across a process pool, yielding
+    (path, pages, seconds, error) as each one finishes.
+
+    At most 2 x workers files are in flight so memory stays bounded
+    regardless of how many paths are passed in.
+    """
+    if workers <= 1 or not can_use_process_pool():
+        for path in paths:
+            try:
+                pages, seconds = extract_pages_timed(path)
+                yield path, pages, seconds, None
+            except Exception as e:
+                yield path, None, 0.0, str(e)
+        return
+
+    pool = get_process_pool(workers)
+    remaining = iter(paths)
+    in_flight = {pool.submit(extract_pages_timed, path): path for path in islice(remaining, workers * 2)}
+
+    while in_flight:
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            path = in_flight.pop(future)
+            try:
+                pages, seconds = future.result()
+                yield path, pages, seconds, None
+            except Exception as e:
+                yield path, None, 0.0, str(e)
+            for next_path in islice(remaining, 1):
+                in_flight[pool.submit(extract_pages_timed, next_path)] = next_path
+
+
+class BulkIngestor:
+    """
+    Pipelined ingestion of many documents.
+
+    PDFs are extracted in a process pool while the main process chunks the
+    finished ones; chunks from many documents are embedded together and
+    written to Chroma in large batched add calls every `batch_chunks` chunks.
+    """
+
+    def __init__(
+        self,
+        vector_store=None,
+        workers: Optional[int] = None,
+        batch_chunks: Optional[int] = None,
+        on_indexed: Optional[Callable[[Document], None]] = None,
+        on_failed: Optional[Callable[[Document, str], None]] = None
+    ):
+        self.vector_store = vector_store or get_vector_store()
+        self.workers = workers if workers is not None else settings.PDF_EXTRACTION_WORKERS
+        self.batch_chunks = batch_chunks or settings.BULK_INGEST_BATCH_CHUNKS
+        self.on_indexed = on_indexed
+        self.on_failed = on_failed
+        self.summary = {"indexed": 0, "failed": 0, "chunks": 0}
+
+    def _fail(self, document: Document, error: str, timings: Optional[dict] = None) -> None:
+        logger.error(f"Error ingesting document {document.id}: {error}")
+        document.status = Document.STATUS_FAILED
+        document.error = error
+        document.stage_timings = timings or {}
+        document.processed_at = timezone.now()
+        document.save(update_fields=["status", "error", "stage_timings", "processed_at"])
+        self.summary["failed"] += 1
+        if self.on_failed:
+            self.on_failed(document, error)
+
+    def ingest(self, documents: List[Document]) -> Dict[str, int]:
+        by_path = {document.file.path: document for document in documents}
+        Document.objects.filter(id__in=[document.id for document in documents]).update(
+            status=Document.STATUS_EXTRACTING, error=""
+        )
+
+        pending = []
+        pending_chunks = 0
+        for path, pages, extraction_seconds, error in iter_extracted(list(by_path), self.workers):
+            document = by_path[path]
+            timings = {"extraction": round(extraction_seconds, 3)}
+            if error is not None:
+                self._fail(document, error, timings)
+                continue
+            if not any(text.strip() for _, text in pages):
+                self._fail(document, "No text could be extracted from the PDF", timings)
+                continue
+
+            # A bad document fails on its own instead of ending the whole batch
+            try:
+                pages = list(store_pages(document, pages))
+
+                start = time.time()
+                chunks = self.vector_store.chunk_pages(pages)
+                timings["chunking"] = round(time.time() - start, 3)
+            except Exception as e:
+                self._fail(document, str(e), timings)
+                continue
+
+            pending.append((document, chunks, timings))
+            pending_chunks += len(chunks)
+            if pending_chunks >= self.batch_chunks:
+                self._flush(pending)
+                pending, pending_chunks = [], 0
+
+        if pending:
+            self._flush(pending)
+        return self.summary
+
+    def _flush(self, pending: List[Tuple[Document, list, dict]]) -> None:
+        """
+        Embed and index the chunks of several documents in one go
+        """
+        Document.objects.filter(id__in=[document.id for document, _, _ in pending]).update(
+            status=Document.STATUS_EMBEDDING
+        )
+        n_chunks = sum(len(chunks) for _, chunks, _ in pending)
+
+        try:
+            # One Chroma read for the whole batch finds chunks that are already stored
+            start = time.time()
+            plans = self.vector_store.plan_index([(document.id, document.title, chunks) for document, chunks, _ in pending])
+            planning_seconds = time.time() - start
+
+            texts = [text for plan in plans for text in plan.texts_to_embed]
+            start = time.time()
+            embeddings = self.vector_store.embed_chunks(texts)
+            embedding_seconds = time.time() - start
+
+            start = time.time()
+            self.vector_store.apply_index(plans, embeddings)
+            indexing_seconds = time.time() - start + planning_seconds
+        except Exception as e:
+            for document, _, timings in pending:
+                self._fail(document, str(e), timings)
+            return
+
+        logger.info(
+            f"Indexed {len(pending)} documents / {n_chunks} chunks, {len(texts)} embedded "
+            f"({len(texts) / max(embedding_seconds, 1e-6):.1f} chunks/sec embedding)"
+        )
+
+        now = timezone.now()
+        for (document, chunks, timings), plan in zip(pending, plans):
+            # Batch-level embedding/indexing time, attributed by chunk share
+            share = len(chunks) / max(n_chunks, 1)
+            timings["embedding"] = round(embedding_seconds * share, 3)
+            timings["embedding_chunks_per_sec"] = round(len(texts) / max(embedding_seconds, 1e-6), 1)
+            timings["indexing"] = round(indexing_seconds * share, 3)
+            timings["index_changes"] = plan.summary()
+            timings["total"] = round(sum(timings[key] for key in ("extraction", "chunking", "embedding", "indexing")), 3)
+            observe_stages(timings, ("extraction", "chunking", "embedding", "indexing"))
+            document.status = Document.STATUS_INDEXED
+            document.chunk_count = len(chunks)
+            document.stage_timings = timings
+            document.error = ""
+            document.processed_at = now
+        Document.objects.bulk_update(
+            [document for document, _, _ in pending],
+            ["status", "chunk_count", "stage_timings", "error", "processed_at"]
+        )
+
+        self.summary["indexed"] += len(pending)
+        self.summary["chunks"] += n_chunks
+        if self.on_indexed:
+            for document, _, _ in pending:
+                self.on_indexed(document)
@@ -0,0 +1,271 @@
+import re
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with a per-entry TTL
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        # Counters are kept apart from cached values and bounded separately. An evicted
+        # counter must never go back to a value it had before (entries keyed by an old
+        # generation would come back), so unknown counters start above every evicted value.
+        self._counters = OrderedDict()
+        self._counter_floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            if key not in self._counters:
+                return self._counter_floor
+            self._counters.move_to_end(key)
+            return self._counters[key]
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, self._counter_floor) + 1
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_entries:
+                _, value = self._counters.popitem(last=False)
+                self._counter_floor = max(self._counter_floor, value + 1)
+            return self._counters[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Redis-backed cache with the same interface as LRUCache.
+
+    Eviction is left to Redis; use maxmemory-policy volatile-lru so only
+    entries with a TTL are evicted and the (TTL-less) counters survive.
+    Redis errors are logged and treated as cache misses so a Redis outage
+    never breaks a request.
+    """
+
+    def __init__(self, url: str, namespace: str = "docgpt", ttl: Optional[float] = None):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        try:
+            raw = self.client.get(self._key(key))
+            return pickle.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Redis cache get failed: {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self.client.set(self._key(key), pickle.dumps(value), ex=int(ttl) if ttl else None)
+        except Exception as e:
+            logger.warning(f"Redis cache set failed: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete(self._key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed: {str(e)}")
+
+    def get_counter(self, key: str) -> int:
+        try:
+            return int(self.client.get(self._key(key)) or 0)
+        except Exception as e:
+            logger.warning(f"Redis cache get_counter failed: {str(e)}")
+            return 0
+
+    def incr(self, key: str) -> int:
+        try:
+            return int(self.client.incr(self._key(key)))
+        except Exception as e:
+            logger.warning(f"Redis cache incr failed: {str(e)}")
+            return 0
+
+    def clear(self) -> None:
+        try:
+            keys = list(self.client.scan_iter(match=self._key("*")))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Redis cache clear failed: {str(e)}")
+
+
+def build_cache(backend: str, namespace: str, max_entries: int, ttl: Optional[float], redis_url: str = None):
+    """
+    Create a cache for the configured backend ("memory", "redis" or "none")
+    """
+    if backend == "none":
+        return None
+    if backend == "redis":
+        try:
+            return RedisCache(redis_url, namespace=namespace, ttl=ttl)
+        except Exception as e:
+            logger.warning(f"Could not create Redis cache ({str(e)}), using in-memory cache")
+    return LRUCache(max_entries=max_entries, ttl=ttl)
+
+
+def make_key(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class GenerationalCache:
+    """
+    Base for caches whose entries depend on documents.
+
+    Keys embed a per-document generation number; bumping it with
+    invalidate_document() orphans every cached entry for that document
+    (and for unfiltered searches) without having to enumerate keys.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def _generation(self, document_id):
+        # A tuple of ids (multi-document search) depends on each document's generation
+        if isinstance(document_id, tuple):
+            return tuple(self.cache.get_counter(f"gen:{scope}") for scope in document_id)
+        scope = document_id if document_id is not None else "*"
+        return self.cache.get_counter(f"gen:{scope}")
+
+    def invalidate_document(self, document_id) -> None:
+        self.cache.incr(f"gen:{document_id}")
+        # Unfiltered searches may include this document's chunks too
+        self.cache.incr("gen:*")
+
+
+class RetrievalCache(GenerationalCache):
+    """
+    Caches query embeddings and per-document retrieval results
+    """
+
+    def get_query_embedding(self, model_name: str, query: str):
+        return self.cache.get(f"qemb:{make_key(model_name, query)}")
+
+    def set_query_embedding(self, model_name: str, query: str, embedding) -> None:
+        self.cache.set(f"qemb:{make_key(model_name, query)}", embedding)
+
+    def _results_key(self, document_id, query: str, n_results: int, mode: str) -> str:
+        return "results:" + make_key(document_id, self._generation(document_id), query, n_results, mode)
+
+    def get_results(self, document_id, query: str, n_results: int, mode: str = "dense"):
+        return self.cache.get(self._results_key(document_id, query, n_results, mode))
+
+    def set_results(self, document_id, query: str, n_results: int, results, mode: str = "dense") -> None:
+        self.cache.set(self._results_key(document_id, query, n_results, mode), results)
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r'\s+', ' ', question).strip().lower().rstrip("?!. ")
+
+
+class AnswerCache(GenerationalCache):
+    """
+    Caches generated answers per document (or document set).
+
+    Exact entries are keyed by the documents, the retrieval mode, the ids of
+    the chunks the answer was generated from and the normalized question.
+    For semantic reuse each document scope and mode also keeps a bounded list
+    of recent question embeddings; a new question whose embedding is at least
+    `similarity_threshold` (cosine) close to one of them reuses its answer.
+    """
+
+    def __init__(self, cache, similarity_threshold: Optional[float] = 0.95, max_questions: int = 200):
+        super().__init__(cache)
+        self.similarity_threshold = similarity_threshold
+        self.max_questions = max_questions
+
+    def _answer_key(self, document_id, chunk_ids, question: str, mode: str) -> str:
+        return "answer:" + make_key(
+            document_id, self._generation(document_id), mode, ",".join(chunk_ids), normalize_question(question)
+        )
+
+    def _questions_key(self, document_id, mode: str) -> str:
+        return "questions:" + make_key(document_id, self._generation(document_id), mode)
+
+    def get(self, document_id, chunk_ids, question: str, mode: str = ""):
+        return self.cache.get(self._answer_key(document_id, chunk_ids, question, mode))
+
+    def find_similar(self, document_id, question_embedding, mode: str = ""):
+        """
+        Return (entry, similarity) for the closest cached question at or above the threshold
+        """
+        if not self.similarity_threshold:
+            return None, 0.0
+        questions = self.cache.get(self._questions_key(document_id, mode))
+        if not questions:
+            return None, 0.0
+
+        vector = np.asarray(question_embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        matrix = np.stack([embedding for embedding, _ in questions]).astype(np.float32)
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None, float(similarities[best])
+
+        entry = self.cache.get(questions[best][1])
+        return entry, float(similarities[best])
+
+    def set(self, document_id, chunk_ids, question: str, entry, question_embedding=None, mode: str = "") -> None:
+        key = self._answer_key(document_id, chunk_ids, question, mode)
+        self.cache.set(key, entry)
+        if question_embedding is None or not self.similarity_threshold:
+            return
+
+        vector = np.asarray(question_embedding, dtype=np.float32)
+        vector = (vector / (np.linalg.norm(vector) or 1.0)).astype(np.float16)
+        # Read-modify-write: concurrent writers may drop an entry, which only costs a future miss
+        questions_key = self._questions_key(document_id, mode)
+        questions = [item for item in (self.cache.get(questions_key) or []) if item[1] != key]
+        questions.append((vector, key))
+        self.cache.set(questions_key, questions[-self.max_questions:])
@@ -1,8 +1,23 @@
 from __future__ import absolute_import
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'docgpt.settings')
 app = Celery('docgpt')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def preload_embedding_model(**kwargs):
+    # Runs once in the worker master before the prefork pool is created,
+    # so every pool process shares the already-loaded model pages
+    from .registry import warm_up
+    warm_up(include_client=False)
+
+
+@worker_process_init.connect
+def open_vector_store(**kwargs):
+    from .registry import warm_up
+    warm_up(include_client=True)
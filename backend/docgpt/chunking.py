@@ -0,0 +1,147 @@
+import re
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sentence-like segments: text up to and including terminal punctuation or a line break
+_SEGMENT_RE = re.compile(r'[^.!?\n]+(?:[.!?]+|\n|$)')
+_WORD_RE = re.compile(r'\S+')
+_APPROX_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+
+def approximate_token_count(texts: List[str]) -> List[int]:
+    """
+    Rough WordPiece-style token count used when no tokenizer is available
+    """
+    return [len(_APPROX_TOKEN_RE.findall(text)) for text in texts]
+
+
+class TokenChunker:
+    """
+    Single-pass chunker over a stream of (page_number, text) pages.
+
+    Chunks are sized by tokenizer token count so they fit the embedding
+    model's window, break on sentence boundaries where possible, overlap by
+    roughly `overlap_tokens`, and record page numbers and character offsets
+    into the document's full text (pages joined with one newline each, the
+    same layout as DocumentPage.start_offset).
+    """
+
+    def __init__(
+        self,
+        tokenizer=None,
+        max_tokens: int = 256,
+        overlap_tokens: int = 32,
+        special_tokens: int = 2
+    ):
+        # Leave room for [CLS] / [SEP]
+        self.budget = max(1, max_tokens - special_tokens)
+        self.overlap_tokens = min(overlap_tokens, self.budget // 2)
+        self._count_tokens = self._tokenizer_counter(tokenizer) if tokenizer is not None else approximate_token_count
+
+    @staticmethod
+    def _tokenizer_counter(tokenizer) -> Callable[[List[str]], List[int]]:
+        def count(texts: List[str]) -> List[int]:
+            if not texts:
+                return []
+            encoded = tokenizer(texts, add_special_tokens=False)["input_ids"]
+            return [len(ids) for ids in encoded]
+        return count
+
+    def count_tokens(self, text: str) -> int:
+        return self._count_tokens([text])[0]
+
+    def _segments(self, page_number: int, page_text: str, page_offset: int) -> List[Tuple[int, int, int, str]]:
+        """
+        Split a page into (page_number, char_start, char_end, text) segments
+        """
+        segments = []
+        for match in _SEGMENT_RE.finditer(page_text):
+            text = match.group().strip()
+            if text:
+                segments.append((page_number, page_offset + match.start(), page_offset + match.end(), text))
+        return segments
+
+    def _split_long_segment(self, segment, token_count: int):
+        """
+        Break a segment longer than the budget into word windows that fit
+        """
+        page_number, char_start, _, text = segment
+        words = list(_WORD_RE.finditer(text))
+        word_counts = self._count_tokens([word.group() for word in words])
+
+        pieces = []
+        piece_start = 0
+        piece_tokens = 0
+        for i, count in enumerate(word_counts):
+            if piece_tokens + count > self.budget and i > piece_start:
+                pieces.append((piece_start, i, piece_tokens))
+                piece_start, piece_tokens = i, 0
+            piece_tokens += count
+        pieces.append((piece_start, len(words), piece_tokens))
+
+        for start, end, tokens in pieces:
+            span_start = words[start].start()
+            span_end = words[end - 1].end()
+            yield (page_number, char_start + span_start, char_start + span_end, text[span_start:span_end]), tokens
+
+    def _make_chunk(self, window) -> Dict[str, Any]:
+        return {
+            "text": " ".join(re.sub(r'\s+', ' ', segment[3]) for segment, _ in window),
+            "page_start": window[0][0][0],
+            "page_end": window[-1][0][0],
+            "char_start": window[0][0][1],
+            "char_end": window[-1][0][2],
+            "token_count": sum(tokens for _, tokens in window)
+        }
+
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield chunk dicts (text, page_start, page_end, char_start, char_end, token_count)
+        """
+        window: List[Tuple[tuple, int]] = []
+        window_tokens = 0
+        page_offset = 0
+
+        for page_number, page_text in pages:
+            segments = self._segments(page_number, page_text, page_offset)
+            page_offset += len(page_text) + 1
+
+            # Token counts for a whole page in one tokenizer call
+            counts = self._count_tokens([segment[3] for segment in segments])
+
+            for segment, count in zip(segments, counts):
+                pieces = [(segment, count)] if count <= self.budget else list(self._split_long_segment(segment, count))
+
+                for piece, tokens in pieces:
+                    if window and window_tokens + tokens > self.budget:
+                        yield self._make_chunk(window)
+
+                        # Carry trailing segments into the next chunk as overlap
+                        overlap = []
+                        overlap_tokens = 0
+                        for item in reversed(window):
+                            if overlap_tokens + item[1] > self.overlap_tokens or overlap_tokens + item[1] + tokens > self.budget:
+                                break
+                            overlap.insert(0, item)
+                            overlap_tokens += item[1]
+                        window, window_tokens = overlap, overlap_tokens
+
+                    window.append((piece, tokens))
+                    window_tokens += tokens
+
+        if window:
+            yield self._make_chunk(window)
+
+
+def build_chunker(embedding_model=None, max_tokens: Optional[int] = None, overlap_tokens: int = 32) -> TokenChunker:
+    """
+    Create a TokenChunker that counts tokens with the embedding model's own tokenizer
+    """
+    tokenizer = getattr(embedding_model, "tokenizer", None) if embedding_model is not None else None
+    if max_tokens is None:
+        max_tokens = getattr(embedding_model, "max_seq_length", None) or 256
+    if tokenizer is None:
+        logger.warning("No tokenizer available, chunk sizes are approximate")
+    return TokenChunker(tokenizer=tokenizer, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
@@ -0,0 +1,188 @@
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from .chunking import approximate_token_count
+from .lexical import tokenize, split_sentences
+
+
+def count_tokens(text: str) -> int:
+    # Approximate LLM token count; the LLM's own tokenizer is not available in-process
+    return approximate_token_count([text])[0]
+
+
+def _normalize(sentence: str) -> str:
+    return re.sub(r'\s+', ' ', sentence).strip().lower()
+
+
+class ContextBuilder:
+    """
+    Packs passages into an LLM prompt context under a token budget.
+
+    Passages are taken in the order given (most relevant first). Sentences a
+    passage shares with an already packed passage of the same document, i.e.
+    the overlap between neighbouring chunks, are dropped; a passage that
+    does not fit the remaining budget is cut at a sentence boundary, and
+    anything after the budget is exhausted is left out.
+    """
+
+    def __init__(self, token_budget: int, count: Callable[[str], int] = count_tokens, min_passage_tokens: int = 20):
+        self.token_budget = max(0, token_budget)
+        self.count = count
+        self.min_passage_tokens = min_passage_tokens
+
+    def _truncate(self, text: str, max_tokens: int):
+        words = text.split()
+        kept = []
+        tokens = 0
+        for word in words:
+            word_tokens = self.count(word)
+            if tokens + word_tokens > max_tokens:
+                break
+            kept.append(word)
+            tokens += word_tokens
+        return " ".join(kept), tokens
+
+    def pack(self, passages: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        `passages` are dicts with 'text' and 'document_id' (plus anything else,
+        passed through). Returns {"passages", "tokens", "budget", "dropped", "deduplicated"}.
+        """
+        seen = set()
+        packed = []
+        used = 0
+        dropped = 0
+        deduplicated = 0
+
+        for passage in passages:
+            remaining = self.token_budget - used
+            if remaining < self.min_passage_tokens:
+                dropped += 1
+                continue
+
+            sentences = []
+            tokens = 0
+            for sentence in split_sentences(passage['text']):
+                key = (passage.get('document_id'), _normalize(sentence))
+                if key in seen:
+                    deduplicated += 1
+                    continue
+                sentence_tokens = self.count(sentence)
+                if tokens + sentence_tokens > remaining:
+                    if not sentences:
+                        # A single over-long "sentence" (text without punctuation): keep its start
+                        sentence, sentence_tokens = self._truncate(sentence, remaining)
+                        seen.add(key)
+                        sentences.append(sentence)
+                        tokens += sentence_tokens
+                    break
+                seen.add(key)
+                sentences.append(sentence)
+                tokens += sentence_tokens
+
+            if not sentences:
+                dropped += 1
+                continue
+            packed.append(dict(passage, text=" ".join(sentences), tokens=tokens))
+            used += tokens
+
+        return {
+            "passages": packed,
+            "tokens": used,
+            "budget": self.token_budget,
+            "dropped": dropped,
+            "deduplicated": deduplicated
+        }
+
+
+def context_token_budget(context_window: int, max_tokens: int, reserve: int, question: str) -> int:
+    """
+    Tokens left for retrieved context once the answer, template and question are accounted for
+    """
+    return context_window - max_tokens - reserve - count_tokens(question)
+
+
+def _lexical_pages(document_ids: List[int], question: str, max_pages: int) -> List[tuple]:
+    """
+    (document_id, page_number) of the pages holding the best BM25 chunks, best first
+    """
+    from . import registry
+    from .models import DocumentChunk
+
+    lexical_index = registry.get_lexical_index()
+    if lexical_index is None:
+        return []
+    hits = lexical_index.search(question, document_ids=document_ids, limit=max_pages)
+    if not hits:
+        return []
+    spans = {
+        chunk_id: (document_id, page_start, page_end)
+        for chunk_id, document_id, page_start, page_end in DocumentChunk.objects.filter(
+            chunk_id__in=[chunk_id for chunk_id, _ in hits]
+        ).values_list('chunk_id', 'document_id', 'page_start', 'page_end')
+        if page_start is not None
+    }
+    pages = {}
+    for chunk_id, _ in hits:
+        if chunk_id in spans:
+            document_id, page_start, page_end = spans[chunk_id]
+            for page_number in range(page_start, (page_end or page_start) + 1):
+                pages.setdefault((document_id, page_number), len(pages))
+    return sorted(pages, key=pages.get)[:max_pages]
+
+
+def page_passages(documents, question: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Stored pages of the documents most relevant to the question; used when
+    there are no retrieved chunks so that a bounded, relevant slice of the
+    text goes into the prompt rather than the whole document.
+
+    Pages are picked through the BM25 index (those holding the best
+    matching chunks) when it can answer; otherwise only the first
+    CONTEXT_MAX_PAGES pages (split across the documents) are read and ranked by how many question terms
+    they contain (ties keep page order), so the cost doesn't grow with the
+    size of the documents.
+    """
+    from django.conf import settings
+    from .models import DocumentPage
+    from .extraction import get_document_text
+
+    max_pages = limit or settings.CONTEXT_MAX_PAGES
+    titles = {document.id: document.title for document in documents}
+    with_pages = set(
+        DocumentPage.objects.filter(document_id__in=list(titles)).values_list('document_id', flat=True).distinct()
+    )
+    for document in documents:
+        if document.id not in with_pages:
+            # Documents ingested before pages were stored
+            get_document_text(document)
+
+    def passage(document_id, page_number, text):
+        return {"document_id": document_id, "title": titles[document_id], "page": page_number, "text": text}
+
+    ranked_pages = _lexical_pages(list(titles), question, max_pages)
+    if ranked_pages:
+        rank = {key: position for position, key in enumerate(ranked_pages)}
+        pages = DocumentPage.objects.filter(
+            document_id__in={document_id for document_id, _ in ranked_pages},
+            page_number__in={page_number for _, page_number in ranked_pages}
+        ).values_list('document_id', 'page_number', 'text')
+        found = sorted(
+            (rank[(document_id, page_number)], passage(document_id, page_number, text))
+            for document_id, page_number, text in pages
+            if (document_id, page_number) in rank and text.strip()
+        )
+        if found:
+            return [item for _, item in found]
+
+    query_terms = set(tokenize(question))
+    passages = []
+    pages = DocumentPage.objects.filter(
+        document_id__in=list(titles), page_number__lte=max(1, max_pages // len(titles))
+    ).values_list('document_id', 'page_number', 'text')
+    for position, (document_id, page_number, text) in enumerate(pages.iterator()):
+        if not text.strip():
+            continue
+        overlap = len(query_terms & set(tokenize(text)))
+        passages.append((-overlap, position, passage(document_id, page_number, text)))
+
+    passages.sort(key=lambda item: item[:2])
+    return [item for _, _, item in passages]
@@ -0,0 +1,165 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_chunk_text(text: str) -> str:
+    """
+    Normalize chunk text so trivially different copies share a cache entry
+    """
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def chunk_text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_chunk_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded LRU cache of chunk embeddings.
+
+    Entries are keyed by (model name, hash of the normalized chunk text) and
+    stored as float32 blobs in SQLite so they survive restarts and are shared
+    between the web and Celery worker processes. Hit/miss counters and the
+    entry count (so the size bound is checked without counting the table on
+    every write) live in the same database for the same reason.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0)")
+            # Counted once, for caches created before the entry count was kept
+            conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) SELECT 'entries', COUNT(*) FROM embeddings"
+            )
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up embeddings for a list of texts; missing entries are returned as None
+        """
+        hashes = [chunk_text_hash(text) for text in texts]
+        found = {}
+        conn = self._connection()
+
+        unique_hashes = list(set(hashes))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique_hashes), 500):
+            batch = unique_hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model_name] + batch
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+
+        results = [found.get(text_hash) for text_hash in hashes]
+        hits = sum(1 for result in results if result is not None)
+
+        with conn:
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model_name, text_hash) for text_hash in found]
+                )
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'hits'", (hits,))
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'misses'", (len(results) - hits,))
+
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], embeddings) -> None:
+        """
+        Store embeddings for texts and evict least recently used entries over the size bound
+        """
+        now = time.time()
+        rows = {}
+        for text, embedding in zip(texts, embeddings):
+            text_hash = chunk_text_hash(text)
+            rows[text_hash] = (model_name, text_hash, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+        hashes = list(rows)
+        conn = self._connection()
+        with conn:
+            # Replaced entries don't grow the cache; primary key lookups, not a table scan
+            existing = 0
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                existing += conn.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model_name] + batch
+                ).fetchone()[0]
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                list(rows.values())
+            )
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'entries'", (len(rows) - existing,))
+            count = conn.execute("SELECT value FROM counters WHERE name = 'entries'").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                evicted = conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                ).rowcount
+                conn.execute("UPDATE counters SET value = value - ? WHERE name = 'entries'", (evicted,))
+                logger.info(f"Evicted {evicted} entries from embedding cache")
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = counters.get("entries", 0)
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+    def clear(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM embeddings")
+            conn.execute("UPDATE counters SET value = 0")
@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# (page_number starting at 1, extracted text)
+Page = Tuple[int, str]
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    # Runs in a worker process: open the PDF independently and extract a slice of pages
+    reader = PdfReader(file_path)
+    return [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def get_process_pool(workers: int):
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                # spawn, not fork: the parent may hold torch / SQLite state that is not fork-safe
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def can_use_process_pool() -> bool:
+    # Celery prefork workers are daemonic and may not start child processes
+    return not multiprocessing.current_process().daemon
+
+
+def iter_pages(file_path: str, workers: int = 1, min_pages_for_pool: int = 20, pages_per_task: int = 8) -> Iterator[Page]:
+    """
+    Yield (page_number, text) for every page of a PDF, in order.
+
+    Large PDFs are split into page ranges extracted in a process pool;
+    pages are yielded as soon as their range is done so callers can start
+    chunking before the whole document has been parsed.
+    """
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+
+    if workers <= 1 or page_count < min_pages_for_pool or not can_use_process_pool():
+        for i, page in enumerate(reader.pages):
+            yield i + 1, page.extract_text() or ""
+        return
+
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    pool = get_process_pool(workers)
+    futures = [pool.submit(_extract_page_range, file_path, start, end) for start, end in ranges]
+
+    for (start, _), future in zip(ranges, futures):
+        for offset, text in enumerate(future.result()):
+            yield start + offset + 1, text
+
+
+def extract_pages_timed(file_path: str) -> Tuple[List[Page], float]:
+    """
+    Extract all pages of one PDF serially; used as a process-pool task when
+    many PDFs are extracted side by side (bulk ingestion)
+    """
+    start = time.time()
+    return list(iter_pages(file_path)), time.time() - start
+
+
+def extract_text(file_path: str, workers: int = 1, min_pages_for_pool: int = 20) -> str:
+    """
+    Extract the whole text of a PDF, one line break after each page
+    """
+    pages = iter_pages(file_path, workers=workers, min_pages_for_pool=min_pages_for_pool)
+    return "".join(text + "\n" for _, text in pages)
+
+
+def store_pages(document, pages: Iterator[Page]) -> Iterator[Page]:
+    """
+    Persist extracted pages (with their character offsets in the full text)
+    for a document while passing them through to the caller. Once the
+    stream has been fully consumed the old pages are replaced by the new
+    ones in one transaction, so concurrent readers never see none.
+    """
+    from django.db import transaction
+    from .models import DocumentPage
+
+    offset = 0
+    batch = []
+    for page_number, text in pages:
+        batch.append(DocumentPage(document=document, page_number=page_number, text=text, start_offset=offset))
+        offset += len(text) + 1
+        yield page_number, text
+    with transaction.atomic():
+        document.pages.all().delete()
+        DocumentPage.objects.bulk_create(batch, batch_size=500)
+
+
+def get_document_text(document, workers: int = 1) -> str:
+    """
+    Return the full text of a document from the page store, extracting and
+    storing it first for documents ingested before pages were stored
+    """
+    pages = list(document.pages.order_by("page_number").values_list("text", flat=True))
+    if not pages:
+        logger.info(f"No stored pages for document {document.id}, extracting from PDF")
+        pages = [text for _, text in store_pages(document, iter_pages(document.file.path, workers=workers))]
+    return "".join(text + "\n" for text in pages)
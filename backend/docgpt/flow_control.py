@@ -0,0 +1,231 @@
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request can't be admitted; `retry_after` is a suggested wait in seconds
+    """
+
+    def __init__(self, retry_after: int, message: str = "Too many requests in progress"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    """
+    Lets concurrent calls with the same key share one execution.
+
+    The first caller for a key (the leader) runs the computation; callers
+    arriving while it is in flight wait for and receive the same result, or
+    the same exception. Nothing is kept once the call completes, so this is
+    coalescing, not caching. Callers may be threads or asyncio tasks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def begin(self, key: Hashable) -> Tuple[Future, bool]:
+        """
+        Join the call in flight for `key`, or start one; returns (future, is_leader).
+        A leader must call finish().
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def run(self, key: Hashable, function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Call `function` unless an identical call is in flight; returns (result, coalesced)
+        """
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = function()
+        except Exception as e:
+            self.finish(key, future, error=e)
+            raise
+        except BaseException:
+            self.finish(key, future, error=RuntimeError("Coalesced request was interrupted"))
+            raise
+        self.finish(key, future, result)
+        return result, False
+
+    async def arun(self, key: Hashable, function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Async version of run(); `function` returns an awaitable
+        """
+        future, leader = self.begin(key)
+        if not leader:
+            return await asyncio.wrap_future(future), True
+        try:
+            result = await function()
+        except Exception as e:
+            self.finish(key, future, error=e)
+            raise
+        except BaseException:
+            # The leader's client went away (cancelled); waiters get an error rather than hang
+            self.finish(key, future, error=RuntimeError("Coalesced request was cancelled"))
+            raise
+        self.finish(key, future, result)
+        return result, False
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+
+
+class AdmissionLimiter:
+    """
+    Bounds how many calls run at once, with a bounded FIFO queue in front.
+
+    At most `max_concurrent` holders run; up to `max_queue` more wait, each
+    for at most `queue_timeout` seconds. A request that finds the queue full,
+    or times out in it, gets Overloaded with a Retry-After estimate (queue
+    position x average call duration / slots) instead of piling onto a busy
+    backend. Slots are handed to waiters directly, so threads and asyncio
+    tasks share one queue in arrival order. Limits are per process.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int = 0, queue_timeout: float = 10.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        # Moving average of how long a slot is held, for Retry-After
+        self._average_seconds = 1.0
+        self.rejected = 0
+
+    def retry_after(self, position: int = None) -> int:
+        position = len(self._waiters) if position is None else position
+        return max(1, math.ceil(self._average_seconds * (position + 1) / self.max_concurrent))
+
+    def _reject(self) -> Overloaded:
+        self.rejected += 1
+        return Overloaded(self.retry_after())
+
+    def _enter(self, waiter: _Waiter) -> bool:
+        """
+        Take a free slot (True) or queue `waiter` (False); raise Overloaded if the queue is full
+        """
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject()
+            self._waiters.append(waiter)
+            return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Leave the queue after a timeout; returns True if the slot was granted meanwhile
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self, seconds: float = None) -> None:
+        with self._lock:
+            if seconds is not None:
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+            if self._waiters:
+                # Hand the slot over; the active count stays the same
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._active -= 1
+
+    def acquire(self) -> None:
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        if self._enter(waiter):
+            return
+        if event.wait(self.queue_timeout) or self._abandon(waiter):
+            return
+        with self._lock:
+            raise self._reject()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(True))
+
+        waiter = _Waiter(wake)
+        if self._enter(waiter):
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                with self._lock:
+                    raise self._reject()
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                # Granted just as we were cancelled: pass the slot on
+                self.release()
+            raise
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.release(time.time() - start)
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.release(time.time() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "average_seconds": round(self._average_seconds, 2)
+            }
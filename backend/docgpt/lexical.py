@@ -0,0 +1,261 @@
+import os
+import re
+import math
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+')
+_SENTENCE_RE = re.compile(r'[^.!?\n]+[.!?]*')
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can did do does for from had has have how i if in into is it its
+me my no not of on or our so than that the their them then there these they this to was we
+were what when where which who whom why will with would you your about after before over under
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens without stopwords, shared by indexing and querying
+    """
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if token not in STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_RE.findall(text) if sentence.strip()]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk text, kept next to the Chroma collection.
+
+    Postings are stored in SQLite keyed by (term, document_id, chunk_id), so a
+    query reads only the posting lists of its own terms, restricted to the
+    requested documents through the primary key. Document frequencies and
+    corpus totals are maintained incrementally on add/remove, so scoring never
+    scans the corpus. Chunk texts are kept too, for the extractive fallback answer.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    document_id INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (term, document_id, chunk_id)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_document ON postings (document_id, chunk_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    document_id INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document_id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('chunks', 0), ('tokens', 0)")
+
+    def _remove(self, conn: sqlite3.Connection, where: str, params: list) -> int:
+        """
+        Remove chunks matching `where` (on document_id / chunk_id), keeping
+        document frequencies and corpus totals in step
+        """
+        term_counts = conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE {where} GROUP BY term", params
+        ).fetchall()
+        removed_chunks, removed_tokens = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE {where}", params
+        ).fetchone()
+        if not removed_chunks:
+            return 0
+
+        conn.executemany("UPDATE terms SET df = df - ? WHERE term = ?", [(count, term) for term, count in term_counts])
+        conn.execute("DELETE FROM terms WHERE df <= 0")
+        conn.execute(f"DELETE FROM postings WHERE {where}", params)
+        conn.execute(f"DELETE FROM chunks WHERE {where}", params)
+        conn.execute("UPDATE counters SET value = value - ? WHERE name = 'chunks'", (removed_chunks,))
+        conn.execute("UPDATE counters SET value = value - ? WHERE name = 'tokens'", (removed_tokens,))
+        return removed_chunks
+
+    def add_chunks(self, document_id: int, chunk_ids: List[str], texts: List[str]) -> None:
+        """
+        Index chunks of one document, replacing any existing entries with the same ids
+        """
+        postings = []
+        chunk_rows = []
+        document_frequencies = Counter()
+        total_tokens = 0
+        for chunk_id, text in zip(chunk_ids, texts):
+            term_frequencies = Counter(tokenize(text))
+            length = sum(term_frequencies.values())
+            total_tokens += length
+            chunk_rows.append((chunk_id, document_id, length, text))
+            document_frequencies.update(term_frequencies.keys())
+            postings.extend((term, document_id, chunk_id, tf, length) for term, tf in term_frequencies.items())
+
+        conn = self._connection()
+        with conn:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                self._remove(
+                    conn,
+                    f"document_id = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                    [document_id] + batch
+                )
+            conn.executemany(
+                "INSERT INTO postings (term, document_id, chunk_id, tf, length) VALUES (?, ?, ?, ?, ?)",
+                postings
+            )
+            conn.executemany("INSERT INTO chunks (chunk_id, document_id, length, text) VALUES (?, ?, ?, ?)", chunk_rows)
+            conn.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                document_frequencies.items()
+            )
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'chunks'", (len(chunk_rows),))
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'tokens'", (total_tokens,))
+
+    def remove_chunks(self, document_id: int, chunk_ids: List[str]) -> int:
+        removed = 0
+        conn = self._connection()
+        with conn:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                removed += self._remove(
+                    conn,
+                    f"document_id = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                    [document_id] + batch
+                )
+        return removed
+
+    def remove_document(self, document_id: int) -> int:
+        conn = self._connection()
+        with conn:
+            return self._remove(conn, "document_id = ?", [document_id])
+
+    def _corpus(self, conn: sqlite3.Connection) -> Tuple[int, float]:
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        chunks = counters.get("chunks", 0)
+        return chunks, (counters.get("tokens", 0) / chunks if chunks else 0.0)
+
+    def idf(self, terms: Iterable[str]) -> Dict[str, float]:
+        terms = list(set(terms))
+        if not terms:
+            return {}
+        conn = self._connection()
+        n_chunks, _ = self._corpus(conn)
+        placeholders = ",".join("?" * len(terms))
+        df = dict(conn.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms).fetchall())
+        return {
+            term: math.log(1 + (n_chunks - df[term] + 0.5) / (df[term] + 0.5))
+            for term in terms if term in df
+        }
+
+    def search(self, query: str, document_ids: Optional[Iterable[int]] = None, limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        Return up to `limit` (chunk_id, bm25 score) pairs, best first
+        """
+        query_terms = Counter(tokenize(query))
+        idf = self.idf(query_terms)
+        if not idf:
+            return []
+
+        conn = self._connection()
+        _, avg_length = self._corpus(conn)
+        terms = list(idf)
+        sql = f"SELECT term, chunk_id, tf, length FROM postings WHERE term IN ({','.join('?' * len(terms))})"
+        params: list = terms
+        if document_ids is not None:
+            document_ids = list(document_ids)
+            if not document_ids:
+                return []
+            sql += f" AND document_id IN ({','.join('?' * len(document_ids))})"
+            params = terms + document_ids
+
+        scores: Dict[str, float] = {}
+        k1, b = self.k1, self.b
+        for term, chunk_id, tf, length in conn.execute(sql, params):
+            norm = k1 * (1 - b + b * length / avg_length) if avg_length else k1
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + (
+                query_terms[term] * idf[term] * tf * (k1 + 1) / (tf + norm)
+            )
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def chunk_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        if not chunk_ids:
+            return {}
+        conn = self._connection()
+        placeholders = ",".join("?" * len(chunk_ids))
+        return dict(conn.execute(
+            f"SELECT chunk_id, text FROM chunks WHERE chunk_id IN ({placeholders})", chunk_ids
+        ).fetchall())
+
+    def best_sentences(self, question: str, document_ids: Optional[Iterable[int]] = None, limit: int = 3,
+                       chunks: int = 5) -> List[str]:
+        """
+        Extract the sentences that best match a question from its top BM25 chunks
+        """
+        hits = self.search(question, document_ids=document_ids, limit=chunks)
+        if not hits:
+            return []
+        texts = self.chunk_texts([chunk_id for chunk_id, _ in hits])
+        idf = self.idf(tokenize(question))
+
+        scored = {}
+        for chunk_id, _ in hits:
+            for sentence in split_sentences(texts.get(chunk_id, "")):
+                if len(sentence) <= 20 or sentence in scored:
+                    continue
+                score = sum(idf.get(term, 0.0) for term in set(tokenize(sentence)))
+                if score > 0:
+                    scored[sentence] = score
+
+        return [sentence for sentence, _ in sorted(scored.items(), key=lambda item: item[1], reverse=True)[:limit]]
+
+    def stats(self) -> Dict[str, float]:
+        conn = self._connection()
+        n_chunks, avg_length = self._corpus(conn)
+        terms = conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+        return {"chunks": n_chunks, "terms": terms, "avg_chunk_tokens": round(avg_length, 1)}
+
+    def clear(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM terms")
+            conn.execute("UPDATE counters SET value = 0")
@@ -0,0 +1,406 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Remembers which models are failing so requests stop probing them.
+
+    After `failure_threshold` consecutive failures a model is skipped for
+    `cooldown` seconds; requests after that probe it again and either close
+    the breaker (success) or re-open it for another cooldown (failure).
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, model: str) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(model)
+            return opened_at is None or time.time() - opened_at >= self.cooldown
+
+    def record_success(self, model: str) -> None:
+        with self._lock:
+            self._failures.pop(model, None)
+            if self._opened_at.pop(model, None) is not None:
+                logger.info(f"LLM model {model} is available again")
+
+    def record_failure(self, model: str) -> None:
+        with self._lock:
+            self._failures[model] = self._failures.get(model, 0) + 1
+            if self._failures[model] >= self.failure_threshold:
+                if model not in self._opened_at:
+                    logger.warning(f"LLM model {model} marked down for {self.cooldown}s")
+                self._opened_at[model] = time.time()
+
+    def state(self) -> Dict[str, str]:
+        with self._lock:
+            return {model: "open" for model in self._opened_at}
+
+
+class LLMClient:
+    """
+    Ollama client shared by the whole process.
+
+    Keeps a pooled keep-alive requests.Session, applies per-model timeouts,
+    skips models the circuit breaker has marked down and, when `hedge_after`
+    is set, fires a backup request to the next model if the current one has
+    not answered within that latency budget.
+
+    agenerate() is the asyncio counterpart of generate() for the ASGI ask view:
+    it uses an httpx.AsyncClient (at most `pool_size` connections) so waiting
+    on the model doesn't hold a thread. On a long-lived loop (ASGI) the client
+    is shared; with a loop per request (the async view under WSGI) each call
+    opens and closes its own.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        models: List[str],
+        timeouts: Optional[Dict[str, float]] = None,
+        context_tokens: Optional[Dict[str, int]] = None,
+        default_context_tokens: int = 2048,
+        default_timeout: float = 30.0,
+        connect_timeout: float = 3.0,
+        pool_size: int = 10,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_after: Optional[float] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.models = list(models)
+        self.timeouts = timeouts or {}
+        self.context_tokens = context_tokens or {}
+        self.default_context_tokens = default_context_tokens
+        self.default_timeout = default_timeout
+        self.connect_timeout = connect_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_after = hedge_after or None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm-hedge")
+        self.pool_size = pool_size
+        self._async_client = None
+        self._async_client_loop = None
+        self._async_client_lock = threading.Lock()
+
+    def timeout_for(self, model: str) -> float:
+        return self.timeouts.get(model, self.default_timeout)
+
+    def context_for(self, model: str) -> int:
+        return self.context_tokens.get(model, self.default_context_tokens)
+
+    def context_window(self) -> int:
+        """
+        Context size a prompt must fit so that any model it may fall back to can take it
+        """
+        models = self.available_models() or self.models
+        return min(self.context_for(model) for model in models) if models else self.default_context_tokens
+
+    def available_models(self) -> List[str]:
+        return [model for model in self.models if self.breaker.allow(model)]
+
+    def _payload(self, model: str, prompt: str, max_tokens: int, temperature: float, stream: bool) -> dict:
+        options = {
+            "temperature": temperature,
+            "num_predict": max_tokens
+        }
+        # Only override the model's own num_ctx when a window was configured for it
+        if model in self.context_tokens:
+            options["num_ctx"] = self.context_tokens[model]
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options
+        }
+
+    def _attempt(self, model: str, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
+        """
+        One non-streaming generate call; returns the answer or None on failure
+        """
+        try:
+            logger.info(f"Trying Ollama model: {model}")
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json=self._payload(model, prompt, max_tokens, temperature, stream=False),
+                timeout=(self.connect_timeout, self.timeout_for(model))
+            )
+
+            if response.status_code == 200:
+                answer = response.json().get("response", "")
+                if answer.strip():
+                    logger.info(f"Successfully got response from {model}")
+                    self.breaker.record_success(model)
+                    return answer
+                logger.warning(f"Ollama model {model} returned an empty answer")
+                return None
+
+            logger.warning(f"Ollama model {model} error: {response.status_code}")
+
+        except requests.exceptions.Timeout:
+            logger.warning(f"Ollama model {model} timed out")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Ollama model {model} connection error: {str(e)}")
+        except Exception as e:
+            logger.warning(f"Ollama model {model} error: {str(e)}")
+
+        self.breaker.record_failure(model)
+        return None
+
+    def _new_async_client(self):
+        import httpx
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            # Requests beyond the pool size wait for a free connection instead of failing
+            timeout=httpx.Timeout(self.default_timeout, connect=self.connect_timeout, pool=None)
+        )
+
+    @asynccontextmanager
+    async def _async_session(self, persistent_loop: bool = True):
+        """
+        The httpx.AsyncClient to use on the running loop (clients can't be shared across loops).
+
+        With `persistent_loop` the loop's shared client is reused, and a client
+        left from an earlier loop is closed when it is replaced. Otherwise the
+        client only lives for this block, so per-request loops don't leak pools.
+        """
+        loop = asyncio.get_running_loop()
+        if not persistent_loop:
+            async with self._new_async_client() as client:
+                yield client
+            return
+
+        with self._async_client_lock:
+            previous, previous_loop = None, None
+            if self._async_client is None or self._async_client_loop is not loop:
+                previous, previous_loop = self._async_client, self._async_client_loop
+                self._async_client = self._new_async_client()
+                self._async_client_loop = loop
+            client = self._async_client
+        if previous is not None:
+            await self._close_async_client(previous, previous_loop)
+        yield client
+
+    async def _close_async_client(self, client, client_loop) -> None:
+        try:
+            if client_loop is not None and client_loop.is_running():
+                # Its connections belong to that loop
+                asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+            else:
+                await client.aclose()
+        except Exception as e:
+            logger.debug(f"Could not close the previous async LLM client: {str(e)}")
+
+    async def _aattempt(self, client, model: str, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
+        """
+        Async version of _attempt, over `client`
+        """
+        import httpx
+
+        try:
+            logger.info(f"Trying Ollama model: {model}")
+            response = await client.post(
+                "/api/generate",
+                json=self._payload(model, prompt, max_tokens, temperature, stream=False),
+                timeout=httpx.Timeout(self.timeout_for(model), connect=self.connect_timeout, pool=None)
+            )
+
+            if response.status_code == 200:
+                answer = response.json().get("response", "")
+                if answer.strip():
+                    logger.info(f"Successfully got response from {model}")
+                    self.breaker.record_success(model)
+                    return answer
+                logger.warning(f"Ollama model {model} returned an empty answer")
+                return None
+
+            logger.warning(f"Ollama model {model} error: {response.status_code}")
+
+        except httpx.TimeoutException:
+            logger.warning(f"Ollama model {model} timed out")
+        except httpx.HTTPError as e:
+            logger.warning(f"Ollama model {model} connection error: {str(e)}")
+        except Exception as e:
+            logger.warning(f"Ollama model {model} error: {str(e)}")
+
+        self.breaker.record_failure(model)
+        return None
+
+    async def agenerate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.3,
+                        info: Optional[dict] = None, persistent_loop: bool = True) -> Optional[str]:
+        """
+        Async version of generate(), with the same model fallback, circuit breaker and hedging.
+        Pass persistent_loop=False when the event loop only lives for this request.
+        """
+        info = info if info is not None else {}
+        models = self.available_models()
+        if not models:
+            logger.warning("All LLM models are marked down, skipping LLM call")
+            return None
+
+        async with self._async_session(persistent_loop) as client:
+            if self.hedge_after:
+                return await self._agenerate_hedged(client, models, prompt, max_tokens, temperature, info)
+
+            for model in models:
+                answer = await self._aattempt(client, model, prompt, max_tokens, temperature)
+                if answer is not None:
+                    info["model"] = model
+                    return answer
+            return None
+
+    async def _agenerate_hedged(self, client, models: List[str], prompt: str, max_tokens: int, temperature: float,
+                                info: dict) -> Optional[str]:
+        remaining = iter(models)
+        pending = {}
+
+        def launch():
+            model = next(remaining, None)
+            if model is not None:
+                pending[asyncio.ensure_future(self._aattempt(client, model, prompt, max_tokens, temperature))] = model
+            return model is not None
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(list(pending), timeout=self.hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Latency budget exceeded: race the next model against the slow one
+                    if launch():
+                        logger.info(f"Hedging LLM request after {self.hedge_after}s")
+                    continue
+
+                for task in done:
+                    model = pending.pop(task)
+                    answer = task.result()
+                    if answer is not None:
+                        info["model"] = model
+                        return answer
+                    if not pending:
+                        launch()
+            return None
+        finally:
+            # Unlike threads, slower requests still in flight can be cancelled
+            for task in pending:
+                task.cancel()
+
+    def generate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.3, info: Optional[dict] = None) -> Optional[str]:
+        """
+        Generate an answer, falling back across models; returns None if every model fails.
+        The model that answered is written to info["model"] when a dict is passed.
+        """
+        info = info if info is not None else {}
+        models = self.available_models()
+        if not models:
+            logger.warning("All LLM models are marked down, skipping LLM call")
+            return None
+
+        if self.hedge_after:
+            return self._generate_hedged(models, prompt, max_tokens, temperature, info)
+
+        for model in models:
+            answer = self._attempt(model, prompt, max_tokens, temperature)
+            if answer is not None:
+                info["model"] = model
+                return answer
+        return None
+
+    def _generate_hedged(self, models: List[str], prompt: str, max_tokens: int, temperature: float, info: dict) -> Optional[str]:
+        remaining = iter(models)
+        pending = {}
+
+        def launch():
+            model = next(remaining, None)
+            if model is not None:
+                pending[self._executor.submit(self._attempt, model, prompt, max_tokens, temperature)] = model
+            return model is not None
+
+        launch()
+        while pending:
+            done, _ = wait(list(pending), timeout=self.hedge_after, return_when=FIRST_COMPLETED)
+            if not done:
+                # Latency budget exceeded: race the next model against the slow one
+                if launch():
+                    logger.info(f"Hedging LLM request after {self.hedge_after}s")
+                continue
+
+            for future in done:
+                model = pending.pop(future)
+                answer = future.result()
+                if answer is not None:
+                    # Slower requests still in flight finish in the background and are ignored
+                    info["model"] = model
+                    return answer
+                if not pending:
+                    launch()
+        return None
+
+    def stream(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.3, info: Optional[dict] = None):
+        """
+        Stream an answer token by token, falling back across models.
+
+        A model is only abandoned before it has produced output; once tokens
+        have been yielded we stay with that model. Yields nothing if every
+        model fails. The model used is written to info["model"].
+        """
+        info = info if info is not None else {}
+        for model in self.available_models():
+            produced = False
+            try:
+                logger.info(f"Streaming from Ollama model: {model}")
+                with self.session.post(
+                    f"{self.base_url}/api/generate",
+                    json=self._payload(model, prompt, max_tokens, temperature, stream=True),
+                    stream=True,
+                    # The read timeout applies between streamed chunks, not to the whole answer
+                    timeout=(self.connect_timeout, self.timeout_for(model))
+                ) as response:
+                    if response.status_code != 200:
+                        logger.warning(f"Ollama model {model} error: {response.status_code}")
+                        self.breaker.record_failure(model)
+                        continue
+
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        token = chunk.get("response", "")
+                        if token:
+                            if not produced:
+                                info["model"] = model
+                            produced = True
+                            yield token
+                        if chunk.get("done"):
+                            break
+
+                if produced:
+                    logger.info(f"Successfully streamed response from {model}")
+                    self.breaker.record_success(model)
+                    return
+
+            except Exception as e:
+                self.breaker.record_failure(model)
+                if produced:
+                    raise
+                logger.warning(f"Ollama model {model} error: {str(e)}")
+                continue
@@ -1,8 +1,5 @@
-import openai
+from .registry import get_llm_client
 
 def query_llm(prompt):
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[{"role":"user", "content": prompt}]
-    )
-    return response.choices[0].message['content']
+    # Goes through the shared, connection-pooled Ollama client
+    return get_llm_client().generate(prompt)
@@ -0,0 +1,115 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from docgpt.models import Document
+from docgpt.bulk_ingest import BulkIngestor, IngestManifest, create_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Ingest every PDF in a directory. Progress is recorded in a manifest "
+        "so an interrupted run can be resumed by running the command again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument("--recursive", action="store_true", help="also ingest PDFs in subdirectories")
+        parser.add_argument("--workers", type=int, default=settings.PDF_EXTRACTION_WORKERS, help="PDF extraction processes")
+        parser.add_argument("--batch-chunks", type=int, default=settings.BULK_INGEST_BATCH_CHUNKS, help="chunks embedded and indexed per batch")
+        parser.add_argument("--files-per-round", type=int, default=500, help="documents created and ingested per round")
+        parser.add_argument("--manifest", help="progress manifest (default: <directory>/.docgpt_manifest.jsonl)")
+        parser.add_argument("--retry-failed", action="store_true", help="retry files that failed in an earlier run")
+        parser.add_argument("--limit", type=int, help="ingest at most this many files")
+        parser.add_argument("--collection", default="", help="tag the documents with this collection")
+
+    def find_pdfs(self, directory, recursive):
+        if recursive:
+            for root, dirs, files in os.walk(directory):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.abspath(os.path.join(root, name))
+        else:
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if name.lower().endswith(".pdf") and os.path.isfile(path):
+                    yield os.path.abspath(path)
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+
+        manifest = IngestManifest(options["manifest"] or os.path.join(directory, ".docgpt_manifest.jsonl"))
+        skip = {"indexed"} if options["retry_failed"] else {"indexed", "failed"}
+        paths = [path for path in self.find_pdfs(directory, options["recursive"]) if manifest.status(path) not in skip]
+        if options["limit"] is not None:
+            paths = paths[:options["limit"]]
+
+        if not paths:
+            self.stdout.write("Nothing to ingest")
+            manifest.close()
+            return
+
+        self.stdout.write(f"Ingesting {len(paths)} PDFs from {directory}")
+        started = time.time()
+        totals = {"indexed": 0, "failed": 0, "chunks": 0}
+
+        def on_indexed(document):
+            manifest.record(source_paths[document.id], status="indexed", document_id=document.id, chunks=document.chunk_count)
+
+        def on_failed(document, error):
+            manifest.record(source_paths[document.id], status="failed", document_id=document.id, error=error)
+
+        try:
+            files_per_round = max(1, options["files_per_round"])
+            for start in range(0, len(paths), files_per_round):
+                round_paths = paths[start:start + files_per_round]
+
+                # Documents created by an interrupted run are reused rather than duplicated
+                existing = Document.objects.in_bulk(
+                    [manifest.document_id(path) for path in round_paths if manifest.document_id(path)]
+                )
+                documents = []
+                new_paths = []
+                for path in round_paths:
+                    document = existing.get(manifest.document_id(path))
+                    if document is not None:
+                        documents.append((path, document))
+                    else:
+                        new_paths.append(path)
+
+                created = create_documents(
+                    ((os.path.basename(path), path) for path in new_paths),
+                    collection=options["collection"]
+                )
+                for path, document in zip(new_paths, created):
+                    manifest.record(path, status="created", document_id=document.id)
+                    documents.append((path, document))
+
+                source_paths = {document.id: path for path, document in documents}
+                ingestor = BulkIngestor(
+                    workers=options["workers"],
+                    batch_chunks=options["batch_chunks"],
+                    on_indexed=on_indexed,
+                    on_failed=on_failed
+                )
+                summary = ingestor.ingest([document for _, document in documents])
+                for key in totals:
+                    totals[key] += summary[key]
+
+                elapsed = time.time() - started
+                done = totals["indexed"] + totals["failed"]
+                self.stdout.write(
+                    f"{done}/{len(paths)} files, {totals['chunks']} chunks, "
+                    f"{done / max(elapsed, 1e-6):.2f} files/sec"
+                )
+        finally:
+            manifest.close()
+
+        elapsed = time.time() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {totals['indexed']} documents ({totals['chunks']} chunks), "
+            f"{totals['failed']} failed, in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from docgpt.models import DocumentChunk
+from docgpt.registry import get_vector_store
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DocumentChunk table from the chunks stored in every vector store collection (e.g. for documents ingested before it existed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=5000, help="chunks read from the vector store per request")
+
+    def handle(self, *args, **options):
+        vector_store = get_vector_store()
+        collections = vector_store.collections()
+        DocumentChunk.objects.all().delete()
+        total = 0
+        for collection in collections:
+            offset = 0
+            while True:
+                page = collection.get(include=["metadatas"], limit=options["page_size"], offset=offset)
+                if not page["ids"]:
+                    break
+                by_document = {}
+                for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                    chunk_ids, metadatas = by_document.setdefault(metadata["document_id"], ([], []))
+                    chunk_ids.append(chunk_id)
+                    metadatas.append(metadata)
+                # A document can span pages, so nothing is pruned here
+                total += vector_store.record_chunks(
+                    [(document_id, chunk_ids, metadatas) for document_id, (chunk_ids, metadatas) in by_document.items()],
+                    prune=False
+                )
+                offset += len(page["ids"])
+                self.stdout.write(f"{collection.name}: {offset} chunks read, {total} recorded")
+
+        self.stdout.write(self.style.SUCCESS(f"DocumentChunk table rebuilt: {total} chunks"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from docgpt.registry import get_lexical_index, get_vector_store
+
+
+class Command(BaseCommand):
+    help = "Rebuild the BM25 index from the chunks stored in every vector store collection (e.g. for documents ingested before it existed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=5000, help="chunks read from the vector store per request")
+
+    def handle(self, *args, **options):
+        lexical_index = get_lexical_index()
+        if lexical_index is None:
+            raise CommandError("The lexical index is disabled (LEXICAL_INDEX_ENABLED)")
+
+        collections = get_vector_store().collections()
+        lexical_index.clear()
+        total = 0
+        for collection in collections:
+            offset = 0
+            while True:
+                page = collection.get(include=["documents", "metadatas"], limit=options["page_size"], offset=offset)
+                if not page["ids"]:
+                    break
+                by_document = {}
+                for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    chunk_ids, texts = by_document.setdefault(metadata["document_id"], ([], []))
+                    chunk_ids.append(chunk_id)
+                    texts.append(text)
+                for document_id, (chunk_ids, texts) in by_document.items():
+                    lexical_index.add_chunks(document_id, chunk_ids, texts)
+                total += len(page["ids"])
+                offset += len(page["ids"])
+                self.stdout.write(f"{total} chunks indexed")
+
+        self.stdout.write(self.style.SUCCESS(f"Lexical index rebuilt: {lexical_index.stats()}"))
@@ -0,0 +1,60 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from docgpt.registry import get_vector_store
+from docgpt.vector_store import to_chroma_embeddings
+from docgpt.sharding import SHARDING_STRATEGIES, ShardRouter, chunk_document_id
+
+
+class Command(BaseCommand):
+    help = "Move stored chunks (with their embeddings) from another sharding layout into the configured one (VECTOR_SHARDING)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from-sharding", default="none", choices=SHARDING_STRATEGIES, help="layout the chunks are in now")
+        parser.add_argument("--from-shards", type=int, default=settings.VECTOR_SHARDS, help="shard count of a hash layout")
+        parser.add_argument("--page-size", type=int, default=5000, help="chunks read from the vector store per request")
+        parser.add_argument("--keep", action="store_true", help="keep the old collections")
+
+    def handle(self, *args, **options):
+        vector_store = get_vector_store()
+        source = ShardRouter(options["from_sharding"], options["from_shards"], vector_store.collection_name)
+        if source.strategy == vector_store.router.strategy and source.shards == vector_store.router.shards:
+            raise CommandError("The source layout is the configured one")
+        targets = set(vector_store.router.all_shards(vector_store.client))
+        sources = source.all_shards(vector_store.client)
+        if targets.intersection(sources):
+            # e.g. hash layouts with different shard counts; go through "none" in two steps
+            raise CommandError("The source and target layouts share collections")
+
+        total = 0
+        for name in sources:
+            collection = vector_store.get_collection(name, create=False)
+            if collection is None:
+                continue
+            offset = 0
+            while True:
+                # Moving by offset is safe: the source collection is only read until it is dropped
+                page = collection.get(
+                    include=["documents", "metadatas", "embeddings"], limit=options["page_size"], offset=offset
+                )
+                if not page["ids"]:
+                    break
+                by_shard = {}
+                for row in zip(page["ids"], page["documents"], page["metadatas"], page["embeddings"]):
+                    document_id = row[2].get("document_id", chunk_document_id(row[0]))
+                    by_shard.setdefault(vector_store.router.shard(document_id), []).append(row)
+                for shard, rows in by_shard.items():
+                    ids, texts, metadatas, embeddings = (list(column) for column in zip(*rows))
+                    vector_store.get_collection(shard).upsert(
+                        ids=ids, documents=texts, metadatas=metadatas,
+                        embeddings=to_chroma_embeddings(np.asarray(embeddings, dtype=np.float32))
+                    )
+                offset += len(page["ids"])
+                total += len(page["ids"])
+                self.stdout.write(f"{name}: {offset} chunks moved")
+            if not options["keep"]:
+                vector_store.drop_collection(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} chunks resharded into {len(vector_store.router.all_shards(vector_store.client))} collection(s)"
+        ))
@@ -0,0 +1,159 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import sync_and_async_middleware
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# Pipeline stages are timed with stage(name) (or observe() for an already measured
+# duration) into the docgpt_stage_seconds histogram, and into the current request's
+# breakdown while one is being collected (collect_timings). With several processes
+# (gunicorn / uvicorn workers, Celery) set PROMETHEUS_MULTIPROC_DIR to a shared empty
+# directory so /metrics aggregates them. Without prometheus_client only the
+# per-request breakdowns are collected.
+
+# Seconds; spans query encoding (milliseconds) to LLM generation (minutes)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+if prometheus_client is not None:
+    STAGE_SECONDS = prometheus_client.Histogram(
+        "docgpt_stage_seconds", "Time spent in each pipeline stage", ["stage"], buckets=BUCKETS
+    )
+    REQUEST_SECONDS = prometheus_client.Histogram(
+        "docgpt_request_seconds", "API request latency until the response is returned",
+        ["view", "method", "status"], buckets=BUCKETS
+    )
+else:
+    STAGE_SECONDS = REQUEST_SECONDS = None
+
+# The breakdown being collected for the current request, if any
+_timings: contextvars.ContextVar = contextvars.ContextVar("docgpt_timings", default=None)
+
+
+def observe(name: str, seconds: float, timings: Optional[Dict[str, float]] = None) -> None:
+    """
+    Record `seconds` spent in stage `name`; repeated stages add up in the breakdown
+    """
+    if STAGE_SECONDS is not None and settings.METRICS_ENABLED:
+        STAGE_SECONDS.labels(stage=name).observe(seconds)
+    timings = timings if timings is not None else _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def observe_stages(timings: Dict[str, float], names: Iterable[str]) -> None:
+    """
+    Record the stages of an already measured breakdown (e.g. ingestion stage_timings)
+    """
+    if STAGE_SECONDS is None or not settings.METRICS_ENABLED:
+        return
+    for name in names:
+        if isinstance(timings.get(name), (int, float)):
+            STAGE_SECONDS.labels(stage=name).observe(timings[name])
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the stages timed in this context into a dict of seconds per stage.
+    Threads only contribute when they run in a copy of the context (see `in_context`).
+    """
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def timing_context(timings: Dict[str, float]) -> contextvars.Context:
+    """
+    A context collecting into `timings`, for work done later or elsewhere
+    (e.g. a streamed response body): `context.run(function, ...)`
+    """
+    context = contextvars.copy_context()
+    context.run(_timings.set, timings)
+    return context
+
+
+def in_context(function):
+    """
+    Wrap `function` to run in a copy of the caller's context, so it reports
+    into the caller's breakdown when run on an executor thread
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+
+def rounded(timings: Dict[str, float]) -> Dict[str, float]:
+    return {name: round(seconds, 4) for name, seconds in timings.items()}
+
+
+def _observe_request(request, response, seconds: float) -> None:
+    match = request.resolver_match
+    REQUEST_SECONDS.labels(
+        view=(match.url_name or match.view_name) if match else "unmatched",
+        method=request.method,
+        status=str(response.status_code)
+    ).observe(seconds)
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """
+    Time every request into docgpt_request_seconds, labelled by URL name (not
+    path, so document ids don't multiply the series). Streamed responses are
+    timed until the response starts, not until the stream ends.
+    """
+    if REQUEST_SECONDS is None or not settings.METRICS_ENABLED:
+        return get_response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            response = await get_response(request)
+            _observe_request(request, response, time.perf_counter() - start)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            response = get_response(request)
+            _observe_request(request, response, time.perf_counter() - start)
+            return response
+    return middleware
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint
+    """
+    if not settings.METRICS_ENABLED:
+        return JsonResponse({"error": "Metrics are disabled"}, status=404)
+    if prometheus_client is None:
+        return JsonResponse({"error": "prometheus_client is not installed"}, status=503)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
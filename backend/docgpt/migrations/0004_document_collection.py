@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docgpt', '0003_document_page'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='collection',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-18 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docgpt', '0004_document_collection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_index', models.PositiveIntegerField()),
+                ('chunk_id', models.CharField(db_index=True, max_length=100)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('page_start', models.PositiveIntegerField(blank=True, null=True)),
+                ('page_end', models.PositiveIntegerField(blank=True, null=True)),
+                ('token_count', models.PositiveIntegerField(default=0)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='docgpt.document')),
+            ],
+            options={
+                'ordering': ['document', 'chunk_index'],
+                'unique_together': {('document', 'chunk_index')},
+            },
+        ),
+    ]
@@ -1,9 +1,66 @@
 from django.db import models
 
 class Document(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_EXTRACTING = 'extracting'
+    STATUS_EMBEDDING = 'embedding'
+    STATUS_INDEXED = 'indexed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_EXTRACTING, 'Extracting'),
+        (STATUS_EMBEDDING, 'Embedding'),
+        (STATUS_INDEXED, 'Indexed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to='uploads/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Optional tag grouping documents that can be queried together
+    collection = models.CharField(max_length=100, blank=True, default='', db_index=True)
+
+    # Ingestion pipeline state (see tasks.process_document)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    task_id = models.CharField(max_length=255, blank=True, default='')
+    chunk_count = models.PositiveIntegerField(default=0)
+    stage_timings = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='')
+    processed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.title
+
+
+class DocumentPage(models.Model):
+    """Extracted text of one PDF page, stored once at ingestion"""
+    document = models.ForeignKey(Document, related_name='pages', on_delete=models.CASCADE)
+    page_number = models.PositiveIntegerField()
+    text = models.TextField()
+    # Character offset of this page within the document's full text
+    start_offset = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['document', 'page_number']
+        unique_together = [('document', 'page_number')]
+
+    def __str__(self):
+        return f"{self.document.title} p.{self.page_number}"
+
+
+class DocumentChunk(models.Model):
+    """One chunk stored in the vector store; lets stats be answered from the database"""
+    document = models.ForeignKey(Document, related_name='chunks', on_delete=models.CASCADE)
+    chunk_index = models.PositiveIntegerField()
+    chunk_id = models.CharField(max_length=100, db_index=True)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    page_start = models.PositiveIntegerField(null=True, blank=True)
+    page_end = models.PositiveIntegerField(null=True, blank=True)
+    token_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['document', 'chunk_index']
+        unique_together = [('document', 'chunk_index')]
+
+    def __str__(self):
+        return self.chunk_id
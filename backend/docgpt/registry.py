@@ -0,0 +1,354 @@
+import os
+import time
+import resource
+import logging
+import threading
+import multiprocessing
+from typing import Any, Dict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Process-wide singletons. The embedding model is safe to load in a parent
+# process and share with forked workers (copy-on-write); the Chroma client
+# holds SQLite connections and is always opened in the process that uses it.
+_lock = threading.RLock()
+_embedding_model = None
+_chroma_client = None
+_chroma_client_pid = None
+_numpy_client = None
+_numpy_client_pid = None
+_vector_store = None
+_embedding_cache = None
+_lexical_index = None
+_reranker = None
+_retrieval_cache = None
+_answer_cache = None
+_llm_client = None
+_embedding_pool = None
+_embedding_pool_pid = None
+_retrieval_executor = None
+_single_flight = None
+_llm_limiter = None
+_retrieval_executor_pid = None
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def get_embedding_model():
+    """
+    Return the shared SentenceTransformer, loading it on first use
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _lock:
+            if _embedding_model is None:
+                from sentence_transformers import SentenceTransformer
+
+                start = time.time()
+                _embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+                logger.info(
+                    f"Loaded embedding model {settings.EMBEDDING_MODEL_NAME} in "
+                    f"{time.time() - start:.2f}s (max RSS {_rss_mb()} MB)"
+                )
+    return _embedding_model
+
+
+def get_reranker():
+    """
+    Return the shared cross-encoder reranker, or None when reranking is disabled
+    """
+    global _reranker
+    if not settings.RERANK_ENABLED:
+        return None
+    if _reranker is None:
+        with _lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                from .rerank import Reranker
+
+                start = time.time()
+                model = CrossEncoder(settings.RERANK_MODEL_NAME, device="cpu")
+                _reranker = Reranker(
+                    model,
+                    batch_size=settings.RERANK_BATCH_SIZE,
+                    time_budget=settings.RERANK_TIME_BUDGET
+                )
+                logger.info(
+                    f"Loaded rerank model {settings.RERANK_MODEL_NAME} in "
+                    f"{time.time() - start:.2f}s (max RSS {_rss_mb()} MB)"
+                )
+    return _reranker
+
+
+def get_embedding_pool():
+    """
+    Return the sentence-transformers multi-process encode pool, or None when
+    it is disabled or this process may not start children (Celery prefork)
+    """
+    global _embedding_pool, _embedding_pool_pid
+    if settings.EMBEDDING_POOL_PROCESSES <= 1 or multiprocessing.current_process().daemon:
+        return None
+    if _embedding_pool is None or _embedding_pool_pid != os.getpid():
+        with _lock:
+            if _embedding_pool is None or _embedding_pool_pid != os.getpid():
+                start = time.time()
+                _embedding_pool = get_embedding_model().start_multi_process_pool(
+                    target_devices=["cpu"] * settings.EMBEDDING_POOL_PROCESSES
+                )
+                _embedding_pool_pid = os.getpid()
+                logger.info(
+                    f"Started embedding pool with {settings.EMBEDDING_POOL_PROCESSES} processes "
+                    f"in {time.time() - start:.2f}s"
+                )
+    return _embedding_pool
+
+
+def get_chroma_client():
+    """
+    Return the shared Chroma PersistentClient for this process, opening it on first use
+    """
+    global _chroma_client, _chroma_client_pid
+    if _chroma_client is None or _chroma_client_pid != os.getpid():
+        with _lock:
+            if _chroma_client is None or _chroma_client_pid != os.getpid():
+                import chromadb
+                from chromadb.config import Settings
+
+                start = time.time()
+                _chroma_client = chromadb.PersistentClient(
+                    path=settings.CHROMA_DB_PATH,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+                _chroma_client_pid = os.getpid()
+                logger.info(f"Opened Chroma client at {settings.CHROMA_DB_PATH} in {time.time() - start:.2f}s")
+    return _chroma_client
+
+
+def get_numpy_client():
+    """
+    Return the shared client of the in-process NumPy vector index for this
+    process; a client inherited across fork (with its memory maps and locks)
+    is replaced
+    """
+    global _numpy_client, _numpy_client_pid
+    if _numpy_client is None or _numpy_client_pid != os.getpid():
+        with _lock:
+            if _numpy_client is None or _numpy_client_pid != os.getpid():
+                from .vector_backends import NumpyVectorClient
+                _numpy_client = NumpyVectorClient(
+                    settings.VECTOR_INDEX_PATH,
+                    index=settings.VECTOR_INDEX_TYPE,
+                    ivf_lists=settings.VECTOR_IVF_LISTS,
+                    ivf_probes=settings.VECTOR_IVF_PROBES,
+                    ivf_min_train=settings.VECTOR_IVF_MIN_TRAIN,
+                    quantization=settings.VECTOR_QUANTIZATION,
+                    rescore_factor=settings.VECTOR_RESCORE_FACTOR
+                )
+                _numpy_client_pid = os.getpid()
+    return _numpy_client
+
+
+def get_vector_client():
+    """
+    Return the client of the configured vector backend (VECTOR_BACKEND)
+    """
+    if settings.VECTOR_BACKEND == "numpy":
+        return get_numpy_client()
+    if settings.VECTOR_BACKEND != "chroma":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+    return get_chroma_client()
+
+
+def get_embedding_cache():
+    """
+    Return the shared persistent embedding cache, or None when it is disabled
+    """
+    global _embedding_cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _embedding_cache is None:
+        with _lock:
+            if _embedding_cache is None:
+                from .embedding_cache import EmbeddingCache
+                _embedding_cache = EmbeddingCache(
+                    settings.EMBEDDING_CACHE_PATH,
+                    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+                )
+    return _embedding_cache
+
+
+def get_lexical_index():
+    """
+    Return the shared BM25 inverted index, or None when it is disabled
+    """
+    global _lexical_index
+    if not settings.LEXICAL_INDEX_ENABLED:
+        return None
+    if _lexical_index is None:
+        with _lock:
+            if _lexical_index is None:
+                from .lexical import LexicalIndex
+                _lexical_index = LexicalIndex(settings.LEXICAL_INDEX_PATH)
+    return _lexical_index
+
+
+def get_retrieval_cache():
+    """
+    Return the shared query embedding / retrieval result cache, or None when disabled
+    """
+    global _retrieval_cache
+    if settings.QUERY_CACHE_BACKEND == "none":
+        return None
+    if _retrieval_cache is None:
+        with _lock:
+            if _retrieval_cache is None:
+                from .cache import build_cache, RetrievalCache
+                _retrieval_cache = RetrievalCache(build_cache(
+                    settings.QUERY_CACHE_BACKEND,
+                    namespace="docgpt:retrieval",
+                    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+                    ttl=settings.QUERY_CACHE_TTL,
+                    redis_url=settings.QUERY_CACHE_REDIS_URL
+                ))
+    return _retrieval_cache
+
+
+def get_answer_cache():
+    """
+    Return the shared generated-answer cache, or None when disabled
+    """
+    global _answer_cache
+    if not settings.ANSWER_CACHE_ENABLED or settings.QUERY_CACHE_BACKEND == "none":
+        return None
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                from .cache import build_cache, AnswerCache
+                _answer_cache = AnswerCache(
+                    build_cache(
+                        settings.QUERY_CACHE_BACKEND,
+                        namespace="docgpt:answers",
+                        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                        ttl=settings.ANSWER_CACHE_TTL,
+                        redis_url=settings.QUERY_CACHE_REDIS_URL
+                    ),
+                    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+                    max_questions=settings.ANSWER_CACHE_MAX_QUESTIONS
+                )
+    return _answer_cache
+
+
+def get_llm_client():
+    """
+    Return the shared, connection-pooled LLM client
+    """
+    global _llm_client
+    if _llm_client is None:
+        with _lock:
+            if _llm_client is None:
+                from .llm_client import LLMClient, CircuitBreaker
+                _llm_client = LLMClient(
+                    base_url=settings.OLLAMA_BASE_URL,
+                    models=settings.OLLAMA_MODELS,
+                    timeouts=settings.LLM_MODEL_TIMEOUTS,
+                    context_tokens=settings.LLM_MODEL_CONTEXT_TOKENS,
+                    default_context_tokens=settings.LLM_CONTEXT_TOKENS,
+                    default_timeout=settings.LLM_DEFAULT_TIMEOUT,
+                    connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+                    pool_size=settings.LLM_POOL_SIZE,
+                    breaker=CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_COOLDOWN),
+                    hedge_after=settings.LLM_HEDGE_AFTER
+                )
+    return _llm_client
+
+
+def get_retrieval_executor():
+    """
+    Return the bounded thread pool the async ask view runs retrieval on
+    (query encoding, vector search, prompt building), so CPU-bound work stays
+    off the event loop and at most ASK_RETRIEVAL_WORKERS questions encode at once
+    """
+    global _retrieval_executor, _retrieval_executor_pid
+    if _retrieval_executor is None or _retrieval_executor_pid != os.getpid():
+        with _lock:
+            if _retrieval_executor is None or _retrieval_executor_pid != os.getpid():
+                from concurrent.futures import ThreadPoolExecutor
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=settings.ASK_RETRIEVAL_WORKERS, thread_name_prefix="docgpt-retrieval"
+                )
+                _retrieval_executor_pid = os.getpid()
+    return _retrieval_executor
+
+
+def get_single_flight():
+    """
+    Return the shared coalescer for identical in-flight questions, or None when disabled
+    """
+    global _single_flight
+    if not settings.ASK_COALESCING_ENABLED:
+        return None
+    if _single_flight is None:
+        with _lock:
+            if _single_flight is None:
+                from .flow_control import SingleFlight
+                _single_flight = SingleFlight()
+    return _single_flight
+
+
+def get_llm_limiter():
+    """
+    Return the admission limiter in front of LLM generation, or None when unlimited
+    """
+    global _llm_limiter
+    if settings.LLM_MAX_CONCURRENT <= 0:
+        return None
+    if _llm_limiter is None:
+        with _lock:
+            if _llm_limiter is None:
+                from .flow_control import AdmissionLimiter
+                _llm_limiter = AdmissionLimiter(
+                    settings.LLM_MAX_CONCURRENT,
+                    max_queue=settings.LLM_MAX_QUEUE,
+                    queue_timeout=settings.LLM_QUEUE_TIMEOUT
+                )
+    return _llm_limiter
+
+
+def get_vector_store():
+    """
+    Return the process-wide DocumentVectorStore
+    """
+    global _vector_store
+    if _vector_store is None:
+        with _lock:
+            if _vector_store is None:
+                from .vector_store import DocumentVectorStore
+                _vector_store = DocumentVectorStore()
+    return _vector_store
+
+
+def warm_up(include_client: bool = True) -> Dict[str, Any]:
+    """
+    Eagerly load shared resources so the first request doesn't pay for them.
+
+    Call with include_client=False in a pre-fork master (gunicorn --preload,
+    celery worker_init) so children inherit the model but open their own client.
+    """
+    start = time.time()
+    get_embedding_model()
+    get_reranker()
+    if include_client:
+        get_vector_store().collections()
+
+    result = {
+        "seconds": round(time.time() - start, 2),
+        "max_rss_mb": _rss_mb(),
+        "pid": os.getpid(),
+        "client_loaded": include_client
+    }
+    logger.info(f"DocGPT warm-up finished: {result}")
+    return result
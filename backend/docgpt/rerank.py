@@ -0,0 +1,110 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """
+    Second-stage reranking of retrieved chunks with a CPU cross-encoder.
+
+    Candidates are scored in batches, best first-stage candidates first. The
+    reranker keeps a running estimate of its per-pair cost; when the whole
+    candidate list is not expected to fit the time budget it only scores the
+    prefix that does (or skips reranking entirely), and it stops early if a
+    batch pushes it over budget. Unscored candidates keep their first-stage
+    order after the reranked ones.
+
+    An estimate that says "skip" is never refreshed by skipping, so once it
+    is `probe_interval` seconds old the next request scores just its top_k
+    candidates as a probe and the estimate restarts from that measurement; a
+    single slow outlier can't disable reranking for good.
+    """
+
+    def __init__(self, model, batch_size: int = 16, time_budget: Optional[float] = 0.5, probe_interval: float = 30.0):
+        self.model = model
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.probe_interval = probe_interval
+        # Exponential moving average of seconds per (query, chunk) pair, and when it was last measured
+        self._pair_seconds: Optional[float] = None
+        self._measured_at = 0.0
+        self._lock = threading.Lock()
+
+    def _record(self, pairs: int, seconds: float, reset: bool = False) -> None:
+        with self._lock:
+            per_pair = seconds / pairs
+            if self._pair_seconds is None or reset:
+                self._pair_seconds = per_pair
+            else:
+                self._pair_seconds = 0.8 * self._pair_seconds + 0.2 * per_pair
+            self._measured_at = time.monotonic()
+
+    def _claim_probe(self) -> bool:
+        # At most one probe per interval across concurrent requests
+        with self._lock:
+            if time.monotonic() - self._measured_at < self.probe_interval:
+                return False
+            self._measured_at = time.monotonic()
+            return True
+
+    def estimate(self, pairs: int) -> Optional[float]:
+        """
+        Expected seconds to score `pairs` pairs, None until the first measurement
+        """
+        return self._pair_seconds * pairs if self._pair_seconds is not None else None
+
+    def rerank(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        time_budget: Optional[float] = None,
+        info: Optional[dict] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank search results (dicts with 'text') and return the top_k.
+        Reranked results get a 'rerank_score'. What happened is written to
+        info (reranked, scored, seconds) when a dict is passed.
+        """
+        info = info if info is not None else {}
+        budget = time_budget if time_budget is not None else self.time_budget
+        start = time.perf_counter()
+
+        # Only score as many candidates as the budget is expected to allow
+        limit = len(results)
+        probe = False
+        if budget and self._pair_seconds:
+            limit = min(limit, int(budget / self._pair_seconds))
+        if limit < min(top_k, len(results)):
+            if not self._claim_probe():
+                logger.info(f"Skipping rerank: {len(results)} candidates would exceed the {budget}s budget")
+                info.update(reranked=False, scored=0, seconds=0.0)
+                return results[:top_k]
+            probe = True
+            limit = min(top_k, len(results))
+
+        scores: List[float] = []
+        for batch_start in range(0, limit, self.batch_size):
+            batch = results[batch_start:min(batch_start + self.batch_size, limit)]
+            batch_begin = time.perf_counter()
+            batch_scores = self.model.predict(
+                [(query, result['text']) for result in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            self._record(len(batch), time.perf_counter() - batch_begin, reset=probe and batch_start == 0)
+            scores.extend(float(score) for score in batch_scores)
+            if budget and time.perf_counter() - start > budget:
+                break
+
+        scored = sorted(
+            (dict(result, rerank_score=round(score, 4)) for result, score in zip(results, scores)),
+            key=lambda result: result['rerank_score'],
+            reverse=True
+        )
+        seconds = time.perf_counter() - start
+        info.update(reranked=True, scored=len(scores), seconds=round(seconds, 4), probe=probe)
+        return (scored + results[len(scores):])[:top_k]
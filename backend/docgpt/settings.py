@@ -113,6 +113,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'docgpt.metrics.request_metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -160,4 +161,145 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
-SECRET_KEY = 'k11z=u)b6_bo%x^-aml(b+1vq=!yp%*7ifp1fc#$rz9qls%je8'
\ No newline at end of file
+SECRET_KEY = 'k11z=u)b6_bo%x^-aml(b+1vq=!yp%*7ifp1fc#$rz9qls%je8'
+
+# Celery (document ingestion)
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_TASK_IGNORE_RESULT = True
+# Run tasks in-process instead of through the broker (tests / local development)
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "False").lower() == "true"
+CELERY_TASK_EAGER_PROPAGATES = False
+
+# Embeddings / vector store
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+# Vector index backend: "chroma" (HNSW in a Chroma database) or "numpy"
+# (in-process, memory-mapped; VECTOR_INDEX_TYPE "flat" = exact, "ivf" = clustered approximate)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", str(BASE_DIR / "vector_index"))
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+# IVF lists (0 = about 4 * sqrt(vectors)), lists probed per query, and vectors needed before clustering
+VECTOR_IVF_LISTS = int(os.getenv("VECTOR_IVF_LISTS", "0"))
+VECTOR_IVF_PROBES = int(os.getenv("VECTOR_IVF_PROBES", "8"))
+VECTOR_IVF_MIN_TRAIN = int(os.getenv("VECTOR_IVF_MIN_TRAIN", "10000"))
+# Compact codes scanned by the numpy backend: "none", "int8" (~4x smaller) or "binary" (32x);
+# the best VECTOR_RESCORE_FACTOR x n_results candidates are rescored with the float vectors.
+# Applies to new collections; existing ones keep the mode they were created with
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "8"))
+# Split chunks over several collections: "none", "hash" (VECTOR_SHARDS collections, by document id)
+# or "document" (one collection per document); multi-collection searches run on VECTOR_SHARD_WORKERS threads
+VECTOR_SHARDING = os.getenv("VECTOR_SHARDING", "none")
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "8"))
+VECTOR_SHARD_WORKERS = int(os.getenv("VECTOR_SHARD_WORKERS", "8"))
+# Load the embedding model and Chroma client at startup instead of on the first request
+DOCGPT_PRELOAD_MODELS = os.getenv("DOCGPT_PRELOAD_MODELS", "False").lower() == "true"
+# Persistent cache of chunk embeddings, keyed by model name + chunk text hash
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# BM25 inverted index built at ingestion next to the Chroma collection
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "True").lower() == "true"
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", str(BASE_DIR / "lexical_index.sqlite3"))
+
+# Retrieval: "dense", "lexical" or "hybrid" (reciprocal-rank fusion of both).
+# Hybrid fuses the top HYBRID_CANDIDATES of each ranking.
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# Cross-encoder reranking of RERANK_CANDIDATES retrieved chunks; skipped (or cut
+# short) when it would take longer than RERANK_TIME_BUDGET seconds per request
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "False").lower() == "true"
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_TIME_BUDGET = float(os.getenv("RERANK_TIME_BUDGET", "0.5"))
+
+# Query embedding / retrieval result cache: "memory", "redis" or "none".
+# The in-memory backend is per process, so re-ingests done by a Celery worker
+# only reach web processes through the TTL; use "redis" to share invalidations.
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "memory")
+QUERY_CACHE_REDIS_URL = os.getenv("QUERY_CACHE_REDIS_URL", "redis://localhost:6379/1")
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "600"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+
+# Generated answers, on the same backend. A question whose embedding has at least
+# ANSWER_CACHE_SIMILARITY cosine similarity to one of the last ANSWER_CACHE_MAX_QUESTIONS
+# questions cached for the same document(s) reuses that answer (0 disables semantic reuse).
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_MAX_QUESTIONS = int(os.getenv("ANSWER_CACHE_MAX_QUESTIONS", "200"))
+
+# LLM (Ollama)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# Fallback order
+OLLAMA_MODELS = os.getenv("OLLAMA_MODELS", "llama3:latest,llama3.2:latest,phi3:latest,gemma2:2b").split(",")
+LLM_DEFAULT_TIMEOUT = float(os.getenv("LLM_DEFAULT_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+# Per-model read timeouts, e.g. "llama3:latest=60,gemma2:2b=20"
+LLM_MODEL_TIMEOUTS = {
+    name: float(value)
+    for name, value in (item.rsplit("=", 1) for item in os.getenv("LLM_MODEL_TIMEOUTS", "").split(",") if item)
+}
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+# Context window in tokens (Ollama's default num_ctx is 2048). Per-model values,
+# e.g. "llama3:latest=8192", are also sent to Ollama as num_ctx.
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "2048"))
+LLM_MODEL_CONTEXT_TOKENS = {
+    name: int(value)
+    for name, value in (item.rsplit("=", 1) for item in os.getenv("LLM_MODEL_CONTEXT_TOKENS", "").split(",") if item)
+}
+# Answer length, and tokens kept free for the prompt template and question on top of it
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1000"))
+LLM_PROMPT_RESERVE_TOKENS = int(os.getenv("LLM_PROMPT_RESERVE_TOKENS", "100"))
+# Retrieved chunks considered for the prompt context (packed until the token budget is used)
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "8"))
+# Pages considered for the prompt context when there are no retrieved chunks (full-text asks, fallback)
+CONTEXT_MAX_PAGES = int(os.getenv("CONTEXT_MAX_PAGES", "20"))
+# Consecutive failures before a model is skipped, and for how long
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+# Send a backup request to the next model after this many seconds (0 disables hedging)
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+# Async ask view (ASGI): threads running retrieval (embedding, vector search, prompt building)
+ASK_RETRIEVAL_WORKERS = int(os.getenv("ASK_RETRIEVAL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Concurrent identical questions (same document(s) and normalized question) share one computation
+ASK_COALESCING_ENABLED = os.getenv("ASK_COALESCING_ENABLED", "True").lower() == "true"
+# Admission control per process: LLM generations running at once (0 = unlimited), requests
+# allowed to wait for one, and how long they wait before getting 429 with Retry-After
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+
+# Metrics: per-stage and per-request latency histograms served at /metrics (Prometheus format;
+# set PROMETHEUS_MULTIPROC_DIR when running several worker processes). Ask requests sent with
+# "debug": true get a per-stage "timings" breakdown in the response when ASK_DEBUG_TIMINGS is on.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+ASK_DEBUG_TIMINGS = os.getenv("ASK_DEBUG_TIMINGS", "True").lower() == "true"
+
+# PDF extraction: PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted in a process pool
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "20"))
+
+# Chunking: chunk size in embedding-model tokens (all-MiniLM-L6-v2 has a 256 token window)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Embedding: encode batch size, unit-length vectors, and an optional multi-process encode
+# pool (sentence-transformers) used for inputs of at least EMBEDDING_POOL_MIN_CHUNKS chunks
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_NORMALIZE = os.getenv("EMBEDDING_NORMALIZE", "True").lower() == "true"
+EMBEDDING_POOL_PROCESSES = int(os.getenv("EMBEDDING_POOL_PROCESSES", "0"))
+EMBEDDING_POOL_MIN_CHUNKS = int(os.getenv("EMBEDDING_POOL_MIN_CHUNKS", "256"))
+# Query micro-batching: search queries arriving within QUERY_BATCH_MAX_WAIT_MS of each other
+# are encoded in one call, up to QUERY_BATCH_MAX_SIZE at a time (1 encodes each query on its own)
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "2"))
+
+# Bulk ingestion: chunks embedded / written to Chroma per batch, and files per batch upload request
+BULK_INGEST_BATCH_CHUNKS = int(os.getenv("BULK_INGEST_BATCH_CHUNKS", "2048"))
+BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "50"))
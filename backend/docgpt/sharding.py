@@ -0,0 +1,71 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+SHARDING_STRATEGIES = ("none", "hash", "document")
+
+_CHUNK_ID_RE = re.compile(r'^doc_(\d+)_chunk_\d+$')
+
+
+def chunk_document_id(chunk_id: str) -> Optional[int]:
+    """
+    Document id encoded in a chunk id (doc_{id}_chunk_{i})
+    """
+    match = _CHUNK_ID_RE.match(chunk_id)
+    return int(match.group(1)) if match else None
+
+
+class ShardRouter:
+    """
+    Decides which vector collection holds a document's chunks.
+
+    "none" keeps everything in one collection named `base`. "hash" spreads
+    documents over `shards` collections by document id, so each filtered
+    search runs against a graph a fraction of the corpus' size. "document"
+    gives every document its own collection: per-document searches need no
+    filter at all, and a search over the whole corpus fans out to every
+    collection.
+    """
+
+    def __init__(self, strategy: str = "none", shards: int = 1, base: str = "documents"):
+        if strategy not in SHARDING_STRATEGIES:
+            raise ValueError(f"Unknown sharding strategy: {strategy}")
+        self.strategy = strategy
+        self.shards = max(1, shards) if strategy == "hash" else 1
+        self.base = base
+
+    @property
+    def shared(self) -> bool:
+        # Whether a collection can hold several documents (and searches need a document filter)
+        return self.strategy != "document"
+
+    def shard(self, document_id: int) -> str:
+        if self.strategy == "hash":
+            return f"{self.base}_shard{int(document_id) % self.shards:03d}"
+        if self.strategy == "document":
+            return f"{self.base}_doc{int(document_id)}"
+        return self.base
+
+    def group(self, document_ids: Iterable[int]) -> Dict[str, List[int]]:
+        """
+        Document ids grouped by the collection that holds them
+        """
+        groups: Dict[str, List[int]] = {}
+        for document_id in document_ids:
+            groups.setdefault(self.shard(document_id), []).append(document_id)
+        return groups
+
+    def all_shards(self, client) -> List[str]:
+        """
+        Every collection of this layout; for per-document collections, the ones that exist
+        """
+        if self.strategy == "hash":
+            return [f"{self.base}_shard{i:03d}" for i in range(self.shards)]
+        if self.strategy == "document":
+            prefix = f"{self.base}_doc"
+            # Chroma < 0.6 returns collection objects, later versions return names (str subclasses)
+            names = [
+                collection if isinstance(collection, str) else collection.name
+                for collection in client.list_collections()
+            ]
+            return sorted(name for name in names if name.startswith(prefix) and name[len(prefix):].isdigit())
+        return [self.base]
@@ -1,6 +1,158 @@
+import time
+import logging
 from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from .models import Document
+from .registry import get_vector_store
+from .extraction import iter_pages, store_pages
+from .metrics import observe_stages
+
+logger = logging.getLogger(__name__)
+
+# stage_timings entries also recorded in the docgpt_stage_seconds histogram
+INGESTION_STAGES = ("extraction", "chunking", "embedding", "indexing")
+
+
+class QueueUnavailable(Exception):
+    """
+    Raised when an ingestion job could not be handed to the broker
+    """
+
+
+def _update_document(doc_id, **fields):
+    # Use a queryset update so concurrent status reads never see a half-saved row
+    Document.objects.filter(id=doc_id).update(**fields)
+
+
+def ingest_document(doc_id):
+    """
+    Run the full ingestion pipeline for one document:
+    extract text -> chunk -> embed -> index, recording status and stage timings
+    """
+    vector_store = get_vector_store()
+
+    try:
+        document = Document.objects.get(id=doc_id)
+    except Document.DoesNotExist:
+        logger.warning(f"Document {doc_id} was deleted before ingestion started")
+        return {"document_id": doc_id, "status": Document.STATUS_FAILED}
+
+    timings = {}
+    pipeline_start = time.time()
+
+    try:
+        _update_document(doc_id, status=Document.STATUS_EXTRACTING, error='')
+
+        start = time.time()
+        pages = iter_pages(
+            document.file.path,
+            workers=settings.PDF_EXTRACTION_WORKERS,
+            min_pages_for_pool=settings.PDF_PARALLEL_MIN_PAGES
+        )
+        pages = list(store_pages(document, pages))
+        timings["extraction"] = round(time.time() - start, 3)
+
+        if not any(page_text.strip() for _, page_text in pages):
+            raise ValueError("No text could be extracted from the PDF")
+
+        start = time.time()
+        chunks = vector_store.chunk_pages(pages)
+        timings["chunking"] = round(time.time() - start, 3)
+
+        _update_document(doc_id, status=Document.STATUS_EMBEDDING, chunk_count=len(chunks), stage_timings=timings)
+
+        # Re-ingesting only embeds chunks whose text is not stored yet
+        start = time.time()
+        plans = vector_store.plan_index([(doc_id, document.title, chunks)])
+        planning_seconds = time.time() - start
+
+        start = time.time()
+        texts_to_embed = plans[0].texts_to_embed
+        embeddings = vector_store.embed_chunks(texts_to_embed)
+        embedding_seconds = time.time() - start
+        timings["embedding"] = round(embedding_seconds, 3)
+        timings["embedding_chunks_per_sec"] = round(len(texts_to_embed) / max(embedding_seconds, 1e-6), 1)
+
+        start = time.time()
+        timings["index_changes"] = vector_store.apply_index(plans, embeddings)
+        timings["indexing"] = round(time.time() - start + planning_seconds, 3)
+
+        timings["total"] = round(time.time() - pipeline_start, 3)
+        observe_stages(timings, INGESTION_STAGES)
+        _update_document(
+            doc_id,
+            status=Document.STATUS_INDEXED,
+            chunk_count=len(chunks),
+            stage_timings=timings,
+            processed_at=timezone.now()
+        )
+        logger.info(f"Indexed document {doc_id} with {len(chunks)} chunks in {timings['total']}s")
+        return {"document_id": doc_id, "status": Document.STATUS_INDEXED, "chunk_count": len(chunks)}
+
+    except Exception as e:
+        timings["total"] = round(time.time() - pipeline_start, 3)
+        logger.error(f"Error ingesting document {doc_id}: {str(e)}")
+        _update_document(
+            doc_id,
+            status=Document.STATUS_FAILED,
+            stage_timings=timings,
+            error=str(e),
+            processed_at=timezone.now()
+        )
+        return {"document_id": doc_id, "status": Document.STATUS_FAILED, "error": str(e)}
+
 
 @shared_task
 def process_document(doc_id):
     # Extract text, store embeddings
-    pass
+    return ingest_document(doc_id)
+
+
+@shared_task
+def process_document_batch(doc_ids):
+    """
+    Ingest several documents through the pipelined bulk ingestor
+    """
+    from .bulk_ingest import BulkIngestor
+
+    documents = list(Document.objects.filter(id__in=doc_ids))
+    return BulkIngestor().ingest(documents)
+
+
+QUEUE_UNAVAILABLE = "Could not queue the document for processing; please upload it again"
+
+
+def _enqueue(task, doc_ids, *args):
+    # Ingestion never runs inside the upload request unless CELERY_TASK_ALWAYS_EAGER is set;
+    # documents that could not be queued are marked failed so they can be uploaded again
+    try:
+        return task.delay(*args).id
+    except Exception as e:
+        logger.error(f"Could not queue {task.name}: {str(e)}")
+        Document.objects.filter(id__in=doc_ids).update(
+            status=Document.STATUS_FAILED, error=QUEUE_UNAVAILABLE, processed_at=timezone.now()
+        )
+        raise QueueUnavailable(str(e)) from e
+
+
+def enqueue_document(document):
+    """
+    Queue a document for ingestion and return the job id.
+    Raises QueueUnavailable (with the document marked failed) when no broker is reachable.
+    """
+    job_id = _enqueue(process_document, [document.id], document.id)
+    _update_document(document.id, task_id=job_id)
+    document.task_id = job_id
+    return job_id
+
+
+def enqueue_documents(documents):
+    """
+    Queue a batch of documents for ingestion as one job and return the job id
+    (raises QueueUnavailable like enqueue_document)
+    """
+    doc_ids = [document.id for document in documents]
+    job_id = _enqueue(process_document_batch, doc_ids, doc_ids)
+    Document.objects.filter(id__in=doc_ids).update(task_id=job_id)
+    return job_id
@@ -25,10 +25,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from docgpt.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('docgpt.api_urls')),  # include api_urls here, not docgpt.urls
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,765 @@
+import os
+import json
+import math
+import mmap
+import shutil
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorCollection:
+    """
+    The part of the Chroma collection API that DocumentVectorStore relies on.
+
+    A vector backend provides a client with get_or_create_collection(name, metadata),
+    get_collection(name), list_collections(), delete_collection(name) and get_max_batch_size(),
+    returning collections with these methods. Chroma
+    collections satisfy it as they are; NumpyCollection implements it in-process.
+    Similarities are cosine and reported as distances (1 - similarity). `where`
+    filters use Chroma syntax: {"key": value}, {"key": {"$in": [...]}}, $eq,
+    $ne, $nin, and $and / $or over a list of filters.
+    """
+
+    name: str
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        raise NotImplementedError
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        raise NotImplementedError
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids=None, where=None) -> None:
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=10, where=None,
+              include=("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Set bits per byte value, for Hamming distances between packed sign codes
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def quantize(vectors: np.ndarray, mode: str):
+    """
+    Compress unit vectors: "int8" scales each vector by its largest component
+    (codes plus one float32 scale per vector, ~4x smaller), "binary" keeps one
+    sign bit per dimension (32x smaller). Returns (codes, scales or None).
+    """
+    if mode == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    if mode == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    raise ValueError(f"Unknown quantization: {mode}")
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _where_sql(where: Dict[str, Any]):
+    """
+    Translate a Chroma-style where filter into an SQL condition on the records
+    table; document_id is a real (indexed) column, other keys are read from the
+    JSON metadata
+    """
+    if "$and" in where or "$or" in where:
+        operator = "$and" if "$and" in where else "$or"
+        parts = [_where_sql(clause) for clause in where[operator]]
+        joiner = " AND " if operator == "$and" else " OR "
+        return "(" + joiner.join(sql for sql, _ in parts) + ")", [param for _, params in parts for param in params]
+
+    conditions, params = [], []
+    for key, condition in where.items():
+        column = "document_id" if key == "document_id" else f"json_extract(metadata, '$.{key}')"
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                values = list(value)
+                if not values:
+                    conditions.append("0" if operator == "$in" else "1")
+                    continue
+                negate = "NOT " if operator == "$nin" else ""
+                conditions.append(f"{column} {negate}IN ({','.join('?' * len(values))})")
+                params.extend(values)
+            elif operator in ("$eq", "$ne"):
+                conditions.append(f"{column} {'=' if operator == '$eq' else '!='} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+    return "(" + " AND ".join(conditions or ["1"]) + ")", params
+
+
+class _IndexState:
+    """Read-side view of the index files at one version, swapped as a whole on change"""
+
+    def __init__(self, version: int, rows: int, dim: int, vectors, live, lists, centroids, inverted,
+                 codes=None, scales=None):
+        self.version = version
+        self.rows = rows
+        self.dim = dim
+        self.vectors = vectors
+        self.live = live
+        self.lists = lists
+        self.centroids = centroids
+        self.inverted = inverted
+        self.codes = codes
+        self.scales = scales
+
+
+class NumpyCollection(VectorCollection):
+    """
+    In-process vector index over memory-mapped float32 vectors.
+
+    Vectors are stored L2-normalized, one row per chunk, in `vectors.f32`;
+    `live.u8` marks rows in use and `lists.i32` holds each row's IVF list.
+    Ids, texts and metadata live in SQLite, which also serializes writers
+    across processes (BEGIN IMMEDIATE) and carries a version counter that
+    readers check to pick up new rows. Deleted rows are reused by later writes.
+
+    index="flat" scores the query against every live row (exact). With
+    index="ivf", once the collection holds `ivf_min_train` vectors they are
+    clustered with spherical k-means and a query only scores the rows of the
+    `ivf_probes` closest clusters (approximate). Filtered queries always score
+    exactly the rows that match the filter.
+
+    With quantization="int8" or "binary", searches scan compact codes instead
+    of the float vectors and only the best `rescore_factor` x n_results
+    candidates are rescored against the full-precision vectors, which stay
+    on disk and are paged in row by row. The mode is stored with the
+    collection when it is created, and an existing collection keeps its
+    stored mode whatever `quantization` says (with a warning), so processes
+    configured differently don't re-encode it back and forth; pass
+    requantize=True (or call requantize()) to re-encode it deliberately.
+    """
+
+    def __init__(self, path: str, index: str = "flat", ivf_lists: int = 0, ivf_probes: int = 8,
+                 ivf_min_train: int = 10000, quantization: str = "none", rescore_factor: int = 8,
+                 requantize: bool = False):
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown index type: {index}")
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        self.index = index
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.ivf_min_train = ivf_min_train
+        os.makedirs(path, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._state: Optional[_IndexState] = None
+        self._init_schema()
+        if requantize:
+            self._sync_quantization(quantization)
+        else:
+            stored = self._stored_quantization(self._meta(self._connection()))
+            if stored != quantization:
+                logger.warning(
+                    f"Collection {path} is quantized as {stored}, not {quantization}; "
+                    f"keeping {stored} (requantize to change it)"
+                )
+
+    # -- storage ----------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._file("records.sqlite3"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document_id INTEGER,
+                document TEXT,
+                metadata TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS records_document ON records (document_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES "
+            "('version', 0), ('rows', 0), ('capacity', 0), ('dim', 0), ('trained_rows', 0), ('quantization', ?)",
+            (QUANTIZATION_MODES.index(self.quantization),)
+        )
+
+    def _meta(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _stored_quantization(self, meta: Dict[str, int]) -> str:
+        # The stored mode wins: another process may have re-encoded the collection
+        self.quantization = QUANTIZATION_MODES[meta["quantization"]]
+        return self.quantization
+
+    def _set_meta(self, conn: sqlite3.Connection, **values) -> None:
+        conn.executemany("UPDATE meta SET value = ? WHERE key = ?", [(value, key) for key, value in values.items()])
+
+    def _open(self, name: str, dtype, shape, mode: str = "r"):
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _code_width(self, dim: int) -> int:
+        return dim if self.quantization == "int8" else (dim + 7) // 8
+
+    def _row_files(self, dim: int):
+        # (file name, bytes per row, fill value for new rows)
+        files = [("vectors.f32", 4 * dim, None), ("live.u8", 1, None), ("lists.i32", 4, -1)]
+        if self.quantization == "int8":
+            files += [("codes.i8", dim, None), ("scales.f32", 4, None)]
+        elif self.quantization == "binary":
+            files += [("codes.u8", self._code_width(dim), None)]
+        return files
+
+    def _grow(self, capacity: int, needed: int, dim: int) -> int:
+        """
+        Extend the row files to hold at least `needed` rows (growing by half
+        the current capacity at a time so appends don't resize every write)
+        """
+        if needed <= capacity:
+            return capacity
+        new_capacity = max(needed, int(capacity * 1.5), 1024)
+        for name, row_bytes, fill in self._row_files(dim):
+            with open(self._file(name), "ab") as f:
+                f.truncate(new_capacity * row_bytes)
+            if fill is not None:
+                lists = np.memmap(self._file(name), dtype=np.int32, mode="r+", shape=(new_capacity,))
+                lists[capacity:] = fill
+                lists.flush()
+                del lists
+        return new_capacity
+
+    def _write_codes(self, capacity: int, dim: int, rows, vectors: np.ndarray) -> None:
+        codes, scales = quantize(vectors, self.quantization)
+        if self.quantization == "int8":
+            stored = self._open("codes.i8", np.int8, (capacity, dim), mode="r+")
+            stored_scales = self._open("scales.f32", np.float32, (capacity,), mode="r+")
+            stored_scales[rows] = scales
+            stored_scales.flush()
+        else:
+            stored = self._open("codes.u8", np.uint8, (capacity, self._code_width(dim)), mode="r+")
+        stored[rows] = codes
+        stored.flush()
+
+    def _sync_quantization(self, quantization: str) -> None:
+        """
+        Bring the compact codes in line with `quantization`, re-encoding
+        every stored vector when the mode of the collection changed
+        """
+        mode = QUANTIZATION_MODES.index(quantization)
+        conn = self._connection()
+        if self._meta(conn)["quantization"] == mode:
+            self.quantization = quantization
+            return
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.quantization = quantization
+                meta = self._meta(conn)
+                capacity, dim, rows = meta["capacity"], meta["dim"], meta["rows"]
+                if self.quantization != "none" and capacity:
+                    for name, row_bytes, _ in self._row_files(dim)[3:]:
+                        with open(self._file(name), "ab") as f:
+                            f.truncate(capacity * row_bytes)
+                    vectors = self._open("vectors.f32", np.float32, (capacity, dim))
+                    for start in range(0, rows, 65536):
+                        end = min(start + 65536, rows)
+                        self._write_codes(capacity, dim, slice(start, end), np.asarray(vectors[start:end]))
+                # Drop codes of the previous mode
+                kept = {name for name, _, _ in self._row_files(dim)}
+                for name in ("codes.i8", "scales.f32", "codes.u8"):
+                    if name not in kept and os.path.exists(self._file(name)):
+                        os.remove(self._file(name))
+                self._set_meta(conn, version=meta["version"] + 1, quantization=mode)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self._stored_quantization(self._meta(conn))
+                raise
+        logger.info(f"Re-encoded {self._meta(conn)['rows']} vectors in {self.path} as {self.quantization}")
+
+    def requantize(self, quantization: str) -> None:
+        """
+        Switch the collection to another quantization, re-encoding its codes from the stored vectors
+        """
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        with self._state_lock:
+            self._sync_quantization(quantization)
+
+    def _current(self) -> _IndexState:
+        """
+        Memory maps for the current version, reopened after any write
+        """
+        version = self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        state = self._state
+        if state is not None and state.version == version:
+            return state
+        with self._state_lock:
+            state = self._state
+            if state is not None and state.version == version:
+                return state
+            meta = self._meta(self._connection())
+            rows, capacity, dim = meta["rows"], meta["capacity"], meta["dim"]
+            self._stored_quantization(meta)
+            vectors = self._open("vectors.f32", np.float32, (capacity, dim))
+            if self.quantization != "none" and isinstance(vectors, np.memmap) and hasattr(mmap, "MADV_RANDOM"):
+                # Only rescored rows are read; readahead would page in their neighbours too
+                vectors._mmap.madvise(mmap.MADV_RANDOM)
+            vectors = vectors[:rows]
+            live = self._open("live.u8", np.uint8, (capacity,))[:rows]
+            lists = self._open("lists.i32", np.int32, (capacity,))[:rows]
+            codes, scales = None, None
+            if self.quantization == "int8":
+                codes = self._open("codes.i8", np.int8, (capacity, dim))[:rows]
+                scales = self._open("scales.f32", np.float32, (capacity,))[:rows]
+            elif self.quantization == "binary":
+                codes = self._open("codes.u8", np.uint8, (capacity, self._code_width(dim)))[:rows]
+            centroids, inverted = None, None
+            if self.index == "ivf" and os.path.exists(self._file("centroids.npy")):
+                centroids = np.load(self._file("centroids.npy"))
+                # Inverted lists: rows grouped by cluster, built once per version
+                order = np.argsort(lists, kind="stable")
+                bounds = np.searchsorted(lists[order], np.arange(len(centroids) + 1))
+                inverted = (order, bounds)
+            self._state = _IndexState(meta["version"], rows, dim, vectors, live, lists, centroids, inverted, codes, scales)
+            return self._state
+
+    # -- writes -----------------------------------------------------------
+
+    def _write(self, mode: str, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        ids = list(ids)
+        if not ids:
+            return
+        vectors = _normalize_rows(embeddings) if embeddings is not None else None
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._meta(conn)
+                self._stored_quantization(meta)
+                dim = meta["dim"] or (vectors.shape[1] if vectors is not None else 0)
+                if vectors is not None and vectors.shape[1] != dim:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the collection ({dim})")
+
+                existing = {}
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    existing.update(conn.execute(
+                        f"SELECT id, row FROM records WHERE id IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall())
+
+                free = [row for (row,) in conn.execute("SELECT row FROM free_rows ORDER BY row")]
+                rows = meta["rows"]
+                written_rows, written_vectors = [], []
+                for i, chunk_id in enumerate(ids):
+                    row = existing.get(chunk_id)
+                    if (row is None and mode == "update") or (row is not None and mode == "add"):
+                        continue
+                    metadata = metadatas[i] if metadatas is not None else None
+                    document = documents[i] if documents is not None else None
+                    if row is None:
+                        if vectors is None:
+                            raise ValueError("Embeddings are required for new records")
+                        if free:
+                            row = free.pop(0)
+                            conn.execute("DELETE FROM free_rows WHERE row = ?", (row,))
+                        else:
+                            row, rows = rows, rows + 1
+                        existing[chunk_id] = row
+                        metadata = metadata or {}
+                        conn.execute(
+                            "INSERT INTO records (row, id, document_id, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                            (row, chunk_id, metadata.get("document_id"), document, json.dumps(metadata))
+                        )
+                    else:
+                        if metadata is not None:
+                            if mode == "update":
+                                # Like Chroma, update merges the given keys into the stored metadata
+                                stored = json.loads(conn.execute("SELECT metadata FROM records WHERE row = ?", (row,)).fetchone()[0])
+                                metadata = {**stored, **metadata}
+                            conn.execute(
+                                "UPDATE records SET metadata = ?, document_id = ? WHERE row = ?",
+                                (json.dumps(metadata), metadata.get("document_id"), row)
+                            )
+                        if document is not None:
+                            conn.execute("UPDATE records SET document = ? WHERE row = ?", (document, row))
+                    if vectors is not None:
+                        written_rows.append(row)
+                        written_vectors.append(vectors[i])
+
+                capacity = self._grow(meta["capacity"], rows, dim)
+                if written_rows:
+                    self._write_rows(capacity, dim, np.asarray(written_rows), np.vstack(written_vectors))
+                self._set_meta(conn, version=meta["version"] + 1, rows=rows, capacity=capacity, dim=dim)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if self.index == "ivf":
+            self._maybe_train()
+
+    def _write_rows(self, capacity: int, dim: int, rows: np.ndarray, vectors: np.ndarray) -> None:
+        stored = self._open("vectors.f32", np.float32, (capacity, dim), mode="r+")
+        stored[rows] = vectors
+        stored.flush()
+        live = self._open("live.u8", np.uint8, (capacity,), mode="r+")
+        live[rows] = 1
+        live.flush()
+        if self.quantization != "none":
+            self._write_codes(capacity, dim, rows, vectors)
+        if self.index == "ivf" and os.path.exists(self._file("centroids.npy")):
+            lists = self._open("lists.i32", np.int32, (capacity,), mode="r+")
+            lists[rows] = np.argmax(vectors @ np.load(self._file("centroids.npy")).T, axis=1)
+            lists.flush()
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        # Existing ids are left untouched, as in Chroma
+        self._write("add", ids, embeddings, metadatas, documents)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        self._write("upsert", ids, embeddings, metadatas, documents)
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        self._write("update", ids, embeddings, metadatas, documents)
+
+    def delete(self, ids=None, where=None) -> None:
+        if ids is None and not where:
+            raise ValueError("delete needs ids or a where filter")
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._select_rows(conn, ids, where)
+                if rows:
+                    meta = self._meta(conn)
+                    live = self._open("live.u8", np.uint8, (meta["capacity"],), mode="r+")
+                    live[np.asarray(rows)] = 0
+                    live.flush()
+                    for start in range(0, len(rows), 500):
+                        batch = rows[start:start + 500]
+                        conn.execute(f"DELETE FROM records WHERE row IN ({','.join('?' * len(batch))})", batch)
+                    conn.executemany("INSERT OR IGNORE INTO free_rows (row) VALUES (?)", [(row,) for row in rows])
+                    self._set_meta(conn, version=meta["version"] + 1)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # -- IVF --------------------------------------------------------------
+
+    def _maybe_train(self) -> None:
+        # Train once enough vectors exist, and again whenever the collection has grown 4x since
+        meta = self._meta(self._connection())
+        live = self.count()
+        if live >= self.ivf_min_train and (not meta["trained_rows"] or live >= 4 * meta["trained_rows"]):
+            self.train()
+
+    def train(self, lists: Optional[int] = None, iterations: int = 10, seed: int = 0) -> int:
+        """
+        Cluster the stored vectors (spherical k-means) and assign every row to
+        its closest centroid. Returns the number of lists.
+        """
+        state = self._current()
+        live_rows = np.flatnonzero(state.live)
+        if not len(live_rows):
+            return 0
+        n_lists = lists or self.ivf_lists or max(1, min(int(4 * math.sqrt(len(live_rows))), len(live_rows) // 39))
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(live_rows, min(len(live_rows), 256 * n_lists), replace=False))
+        sample = np.asarray(state.vectors[sample_rows])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            # Re-seed empty clusters with random sample points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize_rows(sums)
+
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._meta(conn)
+                capacity, dim, rows = meta["capacity"], meta["dim"], meta["rows"]
+                vectors = self._open("vectors.f32", np.float32, (capacity, dim))
+                assignments = self._open("lists.i32", np.int32, (capacity,), mode="r+")
+                for start in range(0, rows, 65536):
+                    block = np.asarray(vectors[start:min(start + 65536, rows)])
+                    assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+                assignments.flush()
+                np.save(self._file("centroids.npy"), centroids)
+                self._set_meta(conn, version=meta["version"] + 1, trained_rows=len(live_rows))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Trained IVF index with {n_lists} lists on {len(sample_rows)} of {len(live_rows)} vectors")
+        return n_lists
+
+    # -- reads ------------------------------------------------------------
+
+    def _select_rows(self, conn: sqlite3.Connection, ids=None, where=None) -> List[int]:
+        sql, params = "SELECT row FROM records", []
+        conditions = []
+        if where:
+            condition, params = _where_sql(where)
+            conditions.append(condition)
+        if ids is not None:
+            ids = list(ids)
+            if not ids:
+                return []
+            rows = []
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                batch_sql = sql + " WHERE " + " AND ".join(conditions + [f"id IN ({','.join('?' * len(batch))})"])
+                rows.extend(row for (row,) in conn.execute(batch_sql, params + batch))
+            return rows
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return [row for (row,) in conn.execute(sql, params)]
+
+    def _records(self, conn: sqlite3.Connection, rows: List[int]) -> Dict[int, tuple]:
+        records = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            for row, chunk_id, document, metadata in conn.execute(
+                f"SELECT row, id, document, metadata FROM records WHERE row IN ({','.join('?' * len(batch))})", batch
+            ):
+                records[row] = (chunk_id, document, json.loads(metadata))
+        return records
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")) -> Dict[str, Any]:
+        conn = self._connection()
+        if ids is None:
+            sql, params = "SELECT row FROM records", []
+            if where:
+                condition, params = _where_sql(where)
+                sql += " WHERE " + condition
+            sql += " ORDER BY row"
+            if limit is not None or offset:
+                sql += " LIMIT ? OFFSET ?"
+                params = params + [limit if limit is not None else -1, offset or 0]
+            rows = [row for (row,) in conn.execute(sql, params)]
+        else:
+            rows = self._select_rows(conn, ids, where)
+
+        records = self._records(conn, rows)
+        rows = [row for row in rows if row in records]
+        state = self._current()
+        return {
+            "ids": [records[row][0] for row in rows],
+            "documents": [records[row][1] for row in rows] if "documents" in include else None,
+            "metadatas": [records[row][2] for row in rows] if "metadatas" in include else None,
+            "embeddings": np.asarray(state.vectors[np.asarray(rows, dtype=np.int64)]) if "embeddings" in include else None
+        }
+
+    def _candidates(self, state: _IndexState, query: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Rows to score for an unfiltered query: None (all) for flat search,
+        the rows of the closest lists for a trained IVF index
+        """
+        if state.centroids is None:
+            return None
+        probes = np.argsort(-(state.centroids @ query))[:self.ivf_probes]
+        order, bounds = state.inverted
+        return np.concatenate([order[bounds[probe]:bounds[probe + 1]] for probe in probes])
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        # Positions of the k highest finite scores, best first
+        k = min(k, int(np.isfinite(scores).sum()))
+        top = np.argpartition(-scores, k - 1)[:k] if 0 < k < len(scores) else np.arange(k)
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _coarse_scores(self, state: _IndexState, rows: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        """
+        Approximate similarities from the compact codes, scanned in blocks so
+        only one small block at a time is expanded to float32
+        """
+        n = state.rows if rows is None else len(rows)
+        scores = np.empty(n, dtype=np.float32)
+        query_bits = np.packbits(query > 0) if state.scales is None else None
+        # Small blocks keep the expanded codes in CPU cache
+        for start in range(0, n, 4096):
+            end = min(start + 4096, n)
+            block = slice(start, end) if rows is None else rows[start:end]
+            codes = np.asarray(state.codes[block])
+            if state.scales is not None:
+                scores[start:end] = (codes.astype(np.float32) @ query) * state.scales[block]
+            else:
+                # Matching minus differing sign bits
+                scores[start:end] = state.dim - 2.0 * _POPCOUNT[codes ^ query_bits].sum(axis=1)
+        return scores
+
+    def _search(self, state: _IndexState, rows: Optional[np.ndarray], query: np.ndarray, k: int):
+        """
+        The k most similar live rows among `rows` (None = all): (rows, similarities)
+        """
+        if rows is not None:
+            rows = np.sort(rows[rows < state.rows])
+            rows = rows[state.live[rows] == 1]
+        # The snapshot's codes, not self.quantization: a concurrent requantize may have moved on
+        if state.codes is None:
+            scores = np.asarray(state.vectors @ query if rows is None else state.vectors[rows] @ query)
+        else:
+            scores = self._coarse_scores(state, rows, query)
+        if rows is None:
+            scores[state.live == 0] = -np.inf
+            rows = np.arange(state.rows)
+
+        if state.codes is None:
+            top = self._top(scores, k)
+            return rows[top], scores[top]
+        # Rescore the best candidates against the full-precision vectors
+        candidates = np.sort(rows[self._top(scores, k * self.rescore_factor)])
+        exact = np.asarray(state.vectors[candidates] @ query)
+        top = self._top(exact, k)
+        return candidates[top], exact[top]
+
+    def query(self, query_embeddings, n_results=10, where=None,
+              include=("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        state = self._current()
+        conn = self._connection()
+        queries = _normalize_rows(query_embeddings)
+        filtered = np.asarray(self._select_rows(conn, where=where), dtype=np.int64) if where else None
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": None}
+        for query in queries:
+            if not state.rows:
+                top_rows, top_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            else:
+                if query.shape[0] != state.dim:
+                    raise ValueError(f"Query dimension {query.shape[0]} does not match the collection ({state.dim})")
+                rows = filtered if filtered is not None else self._candidates(state, query)
+                top_rows, top_scores = self._search(state, rows, query, n_results)
+
+            records = self._records(conn, top_rows.tolist())
+            kept = [(row, score) for row, score in zip(top_rows.tolist(), top_scores.tolist()) if row in records]
+            result["ids"].append([records[row][0] for row, _ in kept])
+            result["documents"].append([records[row][1] for row, _ in kept])
+            result["metadatas"].append([records[row][2] for row, _ in kept])
+            result["distances"].append([1.0 - score for _, score in kept])
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                result[key] = None
+        return result
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def nbytes(self) -> Dict[str, int]:
+        """
+        On-disk size of the index files (vectors are memory-mapped, so this is
+        also what the page cache holds when the whole index is hot)
+        """
+        return {
+            name: os.path.getsize(self._file(name))
+            for name in ("vectors.f32", "live.u8", "lists.i32", "codes.i8", "codes.u8", "scales.f32", "centroids.npy",
+                         "records.sqlite3")
+            if os.path.exists(self._file(name))
+        }
+
+
+class NumpyVectorClient:
+    """
+    Client for NumpyCollection with the Chroma client methods DocumentVectorStore uses;
+    each collection is a directory under `path`
+    """
+
+    def __init__(self, path: str, index: str = "flat", ivf_lists: int = 0, ivf_probes: int = 8,
+                 ivf_min_train: int = 10000, quantization: str = "none", rescore_factor: int = 8):
+        self.path = path
+        self.options = dict(
+            index=index, ivf_lists=ivf_lists, ivf_probes=ivf_probes, ivf_min_train=ivf_min_train,
+            quantization=quantization, rescore_factor=rescore_factor
+        )
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str, metadata: Optional[dict] = None) -> NumpyCollection:
+        """
+        Open a collection. New collections are created with the client's
+        quantization; an existing one keeps the mode stored with it unless
+        `metadata` has a "quantization" key, which re-encodes it to that mode
+        (only cosine similarity is supported, so hnsw:space is ignored)
+        """
+        with self._lock:
+            if name not in self._collections:
+                options = dict(self.options)
+                if metadata and "quantization" in metadata:
+                    options.update(quantization=metadata["quantization"], requantize=True)
+                self._collections[name] = NumpyCollection(os.path.join(self.path, name), **options)
+            return self._collections[name]
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        """
+        Open an existing collection; raises ValueError (like Chroma) if there is none
+        """
+        with self._lock:
+            if name not in self._collections:
+                path = os.path.join(self.path, name)
+                if not os.path.exists(os.path.join(path, "records.sqlite3")):
+                    raise ValueError(f"Collection {name} does not exist.")
+                self._collections[name] = NumpyCollection(path, **self.options)
+            return self._collections[name]
+
+    def list_collections(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, "records.sqlite3"))
+        )
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def get_max_batch_size(self) -> int:
+        return 10000
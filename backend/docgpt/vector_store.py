@@ -1,42 +1,245 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Iterable, Tuple
 import os
-from typing import List, Dict, Any
-import uuid
-from django.conf import settings
 import logging
-from PyPDF2 import PdfReader
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from django.conf import settings
+from . import registry, extraction
+from .batching import MicroBatcher
+from .metrics import stage
+from .chunking import TokenChunker, build_chunker
+from .embedding_cache import chunk_text_hash
+from .sharding import ShardRouter, chunk_document_id
 
 logger = logging.getLogger(__name__)
 
+# Chunk fields copied into Chroma metadata when the chunker provides them
+PROVENANCE_FIELDS = ("page_start", "page_end", "char_start", "char_end", "token_count")
+
+def _chroma_accepts_numpy() -> bool:
+    # chromadb < 0.5 validates embeddings as Python lists only
+    try:
+        import chromadb
+        major, minor = (int(part) for part in chromadb.__version__.split(".")[:2])
+        return (major, minor) >= (0, 5)
+    except Exception:
+        return False
+
+
+CHROMA_ACCEPTS_NUMPY = _chroma_accepts_numpy()
+
+
+def _collection_missing(error: Exception) -> bool:
+    # get_collection on a missing collection: ValueError in chromadb < 0.6 (and the numpy
+    # backend), InvalidCollectionException in 0.6, NotFoundError from 1.0
+    return isinstance(error, ValueError) or type(error).__name__ in ("InvalidCollectionException", "NotFoundError")
+
+
+def to_chroma_embeddings(embeddings):
+    """
+    Hand embeddings to Chroma without the .tolist() copy when the installed version allows it
+    """
+    if isinstance(embeddings, np.ndarray) and not CHROMA_ACCEPTS_NUMPY:
+        return embeddings.tolist()
+    return embeddings
+
+
+class IndexPlan:
+    """
+    What it takes to bring one document's stored chunks in line with a new chunk set.
+
+    Chunks keep positional ids (doc_{id}_chunk_{i}) and carry a content hash.
+    A chunk whose id and metadata are unchanged is left alone; one whose text
+    is unchanged but whose metadata moved only gets a metadata update; the rest
+    are upserted, reusing the stored vector of any chunk with the same text
+    (e.g. after an insertion shifted positions) and embedding only new text.
+    Stored ids beyond the new chunk set are deleted.
+    """
+
+    def __init__(self, document_id: int, ids: List[str], texts: List[str], metadatas: List[dict], stored: Dict[str, dict]):
+        self.document_id = document_id
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+
+        stored_by_hash = {}
+        for chunk_id, metadata in stored.items():
+            if metadata.get("content_hash"):
+                stored_by_hash.setdefault(metadata["content_hash"], chunk_id)
+
+        self.unchanged: List[int] = []
+        self.metadata_only: List[int] = []
+        self.write: List[int] = []
+        # index into this plan -> stored chunk id whose vector can be copied
+        self.reuse: Dict[int, str] = {}
+        for i, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+            previous = stored.get(chunk_id)
+            if previous == metadata:
+                self.unchanged.append(i)
+            elif previous is not None and previous.get("content_hash") == metadata["content_hash"]:
+                self.metadata_only.append(i)
+            else:
+                self.write.append(i)
+                if metadata["content_hash"] in stored_by_hash:
+                    self.reuse[i] = stored_by_hash[metadata["content_hash"]]
+
+        new_ids = set(ids)
+        self.removed: List[str] = [chunk_id for chunk_id in stored if chunk_id not in new_ids]
+
+    @property
+    def texts_to_embed(self) -> List[str]:
+        return [self.texts[i] for i in self.write if i not in self.reuse]
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.write or self.metadata_only or self.removed)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "chunks": len(self.ids),
+            "unchanged": len(self.unchanged),
+            "upserted": len(self.write),
+            "metadata_updated": len(self.metadata_only),
+            "deleted": len(self.removed)
+        }
+
+
 class DocumentVectorStore:
     """
-    ChromaDB-based vector store for document embeddings and semantic search
+    Vector store for document embeddings and semantic search.
+    
+    The embedding model and vector backend client (Chroma, or the in-process
+    NumPy index; see VECTOR_BACKEND) come from the process-wide registry and
+    are only loaded the first time they are needed.
+    
+    Chunks are spread over one or more collections by a ShardRouter
+    (VECTOR_SHARDING); searches that span several collections query them in
+    parallel and merge the results by similarity. Query embeddings requested
+    concurrently are encoded together by a MicroBatcher (QUERY_BATCH_MAX_SIZE).
     """
     
-    def __init__(self):
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path="./chroma_db",
-            settings=Settings(anonymized_telemetry=False)
-        )
-        
-        # Initialize sentence transformer for embeddings
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
-        
-        logger.info("DocumentVectorStore initialized successfully")
+    def __init__(self, client=None, embedding_model=None, collection_name: str = "documents", router: ShardRouter = None):
+        self._client = client
+        self._embedding_model = embedding_model
+        self._collections = {}
+        self._collections_pid = os.getpid()
+        self._collections_lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._chunker = None
+        self._query_batcher = None
+        self.collection_name = collection_name
+        self.router = router or ShardRouter(settings.VECTOR_SHARDING, settings.VECTOR_SHARDS, collection_name)
+    
+    @property
+    def client(self):
+        if self._client is not None:
+            return self._client
+        return registry.get_vector_client()
+    
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            self._embedding_model = registry.get_embedding_model()
+        return self._embedding_model
+    
+    def get_collection(self, name: str, create: bool = True):
+        """
+        Open a collection; with create=False (read paths) a collection that
+        doesn't exist yet is returned as None instead of being created empty
+        """
+        if self._collections_pid != os.getpid():
+            # Collections opened before a fork belong to the parent's client
+            with self._collections_lock:
+                if self._collections_pid != os.getpid():
+                    self._collections = {}
+                    self._collections_pid = os.getpid()
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._collections_lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    if create:
+                        collection = self.client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+                    else:
+                        try:
+                            collection = self.client.get_collection(name=name)
+                        except Exception as e:
+                            if not _collection_missing(e):
+                                raise
+                            return None
+                    self._collections[name] = collection
+                    logger.info(f"DocumentVectorStore collection '{name}' ready")
+        return collection
+    
+    def collection_for(self, document_id: int, create: bool = True):
+        return self.get_collection(self.router.shard(document_id), create=create)
+    
+    def collections(self) -> List[Any]:
+        """
+        Every existing collection holding chunks under the configured sharding
+        """
+        collections = [self.get_collection(name, create=False) for name in self.router.all_shards(self.client)]
+        return [collection for collection in collections if collection is not None]
+    
+    def drop_collection(self, name: str) -> None:
+        with self._collections_lock:
+            self._collections.pop(name, None)
+        try:
+            self.client.delete_collection(name)
+        except Exception as e:
+            # Never created: the document had no chunks
+            logger.debug(f"Collection '{name}' not dropped: {e}")
+    
+    def count(self) -> int:
+        return sum(collection.count() for collection in self.collections())
+    
+    def _where(self, document_ids: List[int]):
+        # Collections holding a single document need no filter
+        if not self.router.shared:
+            return None
+        if len(document_ids) == 1:
+            return {"document_id": document_ids[0]}
+        return {"document_id": {"$in": list(document_ids)}}
+    
+    def _fan_out(self, function, items: List[Any]) -> List[Any]:
+        """
+        Apply `function` to every item, in parallel threads when there are several
+        """
+        if len(items) <= 1:
+            return [function(item) for item in items]
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._collections_lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.VECTOR_SHARD_WORKERS, thread_name_prefix="docgpt-shard"
+                    )
+                    self._executor_pid = os.getpid()
+        return list(self._executor.map(function, items))
+    
+    @property
+    def chunker(self) -> TokenChunker:
+        if self._chunker is None:
+            self._chunker = build_chunker(
+                self.embedding_model,
+                max_tokens=settings.CHUNK_MAX_TOKENS,
+                overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+            )
+        return self._chunker
+    
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]]) -> List[Dict[str, Any]]:
+        """
+        Split a stream of (page_number, text) pages into token-sized chunks
+        with page and character-offset provenance
+        """
+        return list(self.chunker.chunk_pages(pages))
     
     def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """
-        Split text into overlapping chunks for better semantic search
+        Split text into overlapping character-sized chunks (legacy chunker,
+        kept for comparison; ingestion uses chunk_pages)
         """
         # Clean text
         text = re.sub(r'\s+', ' ', text).strip()
@@ -67,50 +270,312 @@ class DocumentVectorStore:
         
         return chunks
     
+    def extract_text(self, file_path: str) -> str:
+        """
+        Extract the raw text of every page of a PDF
+        """
+        return extraction.extract_text(
+            file_path,
+            workers=settings.PDF_EXTRACTION_WORKERS,
+            min_pages_for_pool=settings.PDF_PARALLEL_MIN_PAGES
+        )
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts into a float32 (n, dim) array with explicit batching,
+        using the multi-process encode pool for large inputs when enabled
+        """
+        pool = registry.get_embedding_pool() if len(texts) >= settings.EMBEDDING_POOL_MIN_CHUNKS else None
+        if pool is not None:
+            embeddings = self.embedding_model.encode_multi_process(
+                texts, pool, batch_size=settings.EMBEDDING_BATCH_SIZE
+            )
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if settings.EMBEDDING_NORMALIZE:
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                embeddings /= np.maximum(norms, 1e-12)
+            return embeddings
+        
+        return np.asarray(self.embedding_model.encode(
+            texts,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=settings.EMBEDDING_NORMALIZE,
+            show_progress_bar=False
+        ), dtype=np.float32)
+    
+    @property
+    def query_batcher(self) -> MicroBatcher:
+        """
+        Batcher encoding concurrent search queries in one call, or None when disabled
+        """
+        if settings.QUERY_BATCH_MAX_SIZE <= 1:
+            return None
+        if self._query_batcher is None:
+            with self._collections_lock:
+                if self._query_batcher is None:
+                    self._query_batcher = MicroBatcher(
+                        self.encode,
+                        max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+                        max_wait=settings.QUERY_BATCH_MAX_WAIT_MS / 1000,
+                        name="docgpt-query-batcher"
+                    )
+        return self._query_batcher
+    
+    @staticmethod
+    def model_key() -> str:
+        # Everything that changes encode() output: normalized and raw vectors must not share cache entries
+        return settings.EMBEDDING_MODEL_NAME + ("|normalized" if settings.EMBEDDING_NORMALIZE else "")
+    
+    def embed_chunks(self, chunk_texts: List[str]) -> np.ndarray:
+        """
+        Create embeddings for a list of chunk texts, reusing cached embeddings
+        for chunks whose text has been seen before
+        """
+        if not chunk_texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        cache = registry.get_embedding_cache()
+        if cache is None:
+            return self.encode(chunk_texts)
+        
+        model_key = self.model_key()
+        embeddings = cache.get_many(model_key, chunk_texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        if missing:
+            missing_texts = [chunk_texts[i] for i in missing]
+            encoded = self.encode(missing_texts)
+            cache.put_many(model_key, missing_texts, encoded)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+        
+        logger.info(f"Embedding cache: {len(chunk_texts) - len(missing)} hits, {len(missing)} misses")
+        return np.vstack(embeddings).astype(np.float32, copy=False)
+    
+    def _chunk_records(self, document_id: int, title: str, chunks: List[Any]):
+        """
+        Build Chroma ids, documents and metadatas for one document's chunks.
+        Chunks are either plain strings or chunk dicts from chunk_pages.
+        """
+        chunk_ids = []
+        chunk_texts = []
+        chunk_metadatas = []
+        
+        for i, chunk in enumerate(chunks):
+            if isinstance(chunk, str):
+                chunk = {"text": chunk}
+            chunk_ids.append(f"doc_{document_id}_chunk_{i}")
+            chunk_texts.append(chunk["text"])
+            metadata = {
+                "document_id": document_id,
+                "title": title,
+                "chunk_index": i,
+                "total_chunks": len(chunks),
+                "content_hash": chunk_text_hash(chunk["text"])
+            }
+            for key in PROVENANCE_FIELDS:
+                if key in chunk:
+                    metadata[key] = chunk[key]
+            chunk_metadatas.append(metadata)
+        
+        return chunk_ids, chunk_texts, chunk_metadatas
+    
+    def max_batch_size(self) -> int:
+        """
+        Largest number of records the backend accepts in one add call
+        """
+        client = self.client
+        if hasattr(client, "get_max_batch_size"):
+            return client.get_max_batch_size()
+        return getattr(client, "max_batch_size", 5000)
+    
+    def plan_index(self, documents: List[Tuple[int, str, List[Any]]]) -> List[IndexPlan]:
+        """
+        Diff new chunk sets against what is stored for each document.
+        `documents` is a list of (document_id, title, chunks); the stored
+        chunks of all of them are read with a single get per collection.
+        """
+        records = [(document_id, self._chunk_records(document_id, title, chunks)) for document_id, title, chunks in documents]
+        document_ids = [document_id for document_id, _ in records]
+        
+        def fetch(group):
+            name, shard_document_ids = group
+            collection = self.get_collection(name, create=False)
+            if collection is None:
+                return {'ids': [], 'metadatas': []}
+            return collection.get(where=self._where(shard_document_ids), include=["metadatas"])
+        
+        stored = {document_id: {} for document_id in document_ids}
+        for existing in self._fan_out(fetch, list(self.router.group(document_ids).items())):
+            for chunk_id, metadata in zip(existing['ids'], existing['metadatas']):
+                stored.setdefault(metadata.get("document_id"), {})[chunk_id] = metadata
+        
+        return [
+            IndexPlan(document_id, ids, texts, metadatas, stored.get(document_id, {}))
+            for document_id, (ids, texts, metadatas) in records
+        ]
+    
+    def apply_index(self, plans: List[IndexPlan], embeddings: np.ndarray) -> Dict[str, int]:
+        """
+        Carry out index plans with as few (large) calls per collection as possible:
+        upsert new and changed chunks, update metadata of moved-but-identical
+        ones, delete chunks that no longer exist. `embeddings` holds one row
+        per text in each plan's texts_to_embed, plans in order. Changes are
+        mirrored into the BM25 index when it is enabled.
+        """
+        # Vectors of chunks whose text is already stored under another id are copied, not recomputed
+        reused_ids = sorted({chunk_id for plan in plans for chunk_id in plan.reuse.values()})
+        reused = {}
+        by_shard = {}
+        for chunk_id in reused_ids:
+            by_shard.setdefault(self.router.shard(chunk_document_id(chunk_id)), []).append(chunk_id)
+        for name, shard_ids in by_shard.items():
+            collection = self.get_collection(name, create=False)
+            if collection is None:
+                continue
+            existing = collection.get(ids=shard_ids, include=["embeddings"])
+            reused.update(
+                (chunk_id, np.asarray(vector, dtype=np.float32)) for chunk_id, vector in zip(existing['ids'], existing['embeddings'])
+            )
+        
+        # A stored vector that vanished in the meantime is recomputed after all
+        missing = [(plan, i) for plan in plans for i, chunk_id in plan.reuse.items() if chunk_id not in reused]
+        recomputed = {}
+        if missing:
+            vectors = self.embed_chunks([plan.texts[i] for plan, i in missing])
+            recomputed = {(plan.document_id, i): vector for (plan, i), vector in zip(missing, vectors)}
+        
+        # Per collection: upserts (ids, texts, metadatas, vectors), metadata updates and deletions
+        changes = {}
+        row = 0
+        for plan in plans:
+            shard = changes.setdefault(self.router.shard(plan.document_id), ([], [], [], [], [], [], []))
+            ids, texts, metadatas, vectors, update_ids, update_metadatas, removed_ids = shard
+            for i in plan.write:
+                if i in plan.reuse:
+                    vector = reused.get(plan.reuse[i])
+                    if vector is None:
+                        vector = recomputed[(plan.document_id, i)]
+                else:
+                    vector = embeddings[row]
+                    row += 1
+                ids.append(plan.ids[i])
+                texts.append(plan.texts[i])
+                metadatas.append(plan.metadatas[i])
+                vectors.append(vector)
+            update_ids.extend(plan.ids[i] for i in plan.metadata_only)
+            update_metadatas.extend(plan.metadatas[i] for i in plan.metadata_only)
+            removed_ids.extend(plan.removed)
+        
+        batch_size = self.max_batch_size()
+        for name, (ids, texts, metadatas, vectors, update_ids, update_metadatas, removed_ids) in changes.items():
+            if not (ids or update_ids or removed_ids):
+                continue
+            collection = self.get_collection(name)
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                collection.upsert(
+                    ids=ids[start:end],
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end],
+                    embeddings=to_chroma_embeddings(np.asarray(vectors[start:end], dtype=np.float32))
+                )
+            for start in range(0, len(update_ids), batch_size):
+                collection.update(
+                    ids=update_ids[start:start + batch_size],
+                    metadatas=update_metadatas[start:start + batch_size]
+                )
+            for start in range(0, len(removed_ids), batch_size):
+                collection.delete(ids=removed_ids[start:start + batch_size])
+        
+        self.record_chunks([(plan.document_id, plan.ids, plan.metadatas) for plan in plans])
+        
+        lexical_index = registry.get_lexical_index()
+        for plan in plans:
+            if not plan.changed:
+                continue
+            if lexical_index is not None:
+                lexical_index.remove_chunks(plan.document_id, plan.removed)
+                lexical_index.add_chunks(
+                    plan.document_id, [plan.ids[i] for i in plan.write], [plan.texts[i] for i in plan.write]
+                )
+            self.invalidate_document_cache(plan.document_id)
+        
+        summary = {key: 0 for key in ("chunks", "unchanged", "upserted", "embedded", "reused", "metadata_updated", "deleted")}
+        for plan in plans:
+            for key, value in plan.summary().items():
+                summary[key] += value
+        summary["reused"] = sum(len(plan.reuse) for plan in plans) - len(missing)
+        summary["embedded"] = row + len(missing)
+        return summary
+    
+    def record_chunks(self, entries: List[Tuple[int, List[str], List[dict]]], prune: bool = True) -> int:
+        """
+        Mirror stored chunks into the DocumentChunk table, which stats are served from.
+        `entries` is a list of (document_id, chunk ids, chunk metadatas) covering
+        each document's full chunk set; with `prune`, rows past its end are removed.
+        Documents without a database row are skipped.
+        """
+        from django.db import transaction
+        from .models import Document, DocumentChunk
+        
+        known = set(Document.objects.filter(id__in=[document_id for document_id, _, _ in entries]).values_list('id', flat=True))
+        rows = []
+        with transaction.atomic():
+            for document_id, ids, metadatas in entries:
+                if document_id not in known:
+                    continue
+                if prune:
+                    DocumentChunk.objects.filter(document_id=document_id, chunk_index__gte=len(ids)).delete()
+                rows.extend(
+                    DocumentChunk(
+                        document_id=document_id,
+                        chunk_index=metadata["chunk_index"],
+                        chunk_id=chunk_id,
+                        content_hash=metadata.get("content_hash", ""),
+                        page_start=metadata.get("page_start"),
+                        page_end=metadata.get("page_end"),
+                        token_count=metadata.get("token_count", 0)
+                    )
+                    for chunk_id, metadata in zip(ids, metadatas)
+                )
+            DocumentChunk.objects.bulk_create(
+                rows,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["document", "chunk_index"],
+                update_fields=["chunk_id", "content_hash", "page_start", "page_end", "token_count"]
+            )
+        return len(rows)
+    
+    def index_chunks(self, document_id: int, title: str, chunks: List[Any]) -> Dict[str, int]:
+        """
+        Incrementally (re-)index one document's chunks, embedding only new or changed text
+        """
+        plans = self.plan_index([(document_id, title, chunks)])
+        embeddings = self.embed_chunks([text for plan in plans for text in plan.texts_to_embed])
+        return self.apply_index(plans, embeddings)
+    
     def add_document(self, document_id: int, file_path: str, title: str) -> bool:
         """
         Process document, create embeddings, and store in vector database
         """
         try:
             # Extract text from PDF
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+            pages = list(extraction.iter_pages(
+                file_path,
+                workers=settings.PDF_EXTRACTION_WORKERS,
+                min_pages_for_pool=settings.PDF_PARALLEL_MIN_PAGES
+            ))
             
-            if not text.strip():
+            if not any(text.strip() for _, text in pages):
                 logger.warning(f"No text extracted from document {document_id}")
                 return False
             
-            # Chunk the text
-            chunks = self.chunk_text(text)
-            
-            # Create embeddings and store
-            chunk_ids = []
-            chunk_texts = []
-            chunk_metadatas = []
-            
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"doc_{document_id}_chunk_{i}"
-                chunk_ids.append(chunk_id)
-                chunk_texts.append(chunk)
-                chunk_metadatas.append({
-                    "document_id": document_id,
-                    "title": title,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks)
-                })
-            
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(chunk_texts).tolist()
-            
-            # Add to ChromaDB
-            self.collection.add(
-                ids=chunk_ids,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas,
-                embeddings=embeddings
-            )
+            # Chunk, embed and store
+            chunks = self.chunk_pages(pages)
+            self.index_chunks(document_id, title, chunks)
             
             logger.info(f"Successfully added document {document_id} with {len(chunks)} chunks")
             return True
@@ -119,36 +584,209 @@ class DocumentVectorStore:
             logger.error(f"Error adding document {document_id}: {str(e)}")
             return False
     
-    def search_documents(self, query: str, document_id: int = None, n_results: int = 5) -> List[Dict[str, Any]]:
+    def embed_query(self, query: str) -> List[float]:
         """
-        Search for relevant document chunks based on query
+        Create the embedding for a search query, reusing a cached one when available
         """
-        try:
-            # Create query embedding
-            query_embedding = self.embedding_model.encode([query]).tolist()[0]
-            
-            # Prepare where clause for filtering by document_id
-            where_clause = None
-            if document_id:
-                where_clause = {"document_id": document_id}
-            
-            # Search in ChromaDB
-            results = self.collection.query(
+        cache = registry.get_retrieval_cache()
+        if cache is not None:
+            cached = cache.get_query_embedding(self.model_key(), query)
+            if cached is not None:
+                return cached
+        
+        with stage("query_embedding"):
+            batcher = self.query_batcher
+            if batcher is not None:
+                query_embedding = batcher.run(query).tolist()
+            else:
+                query_embedding = self.encode([query])[0].tolist()
+        
+        if cache is not None:
+            cache.set_query_embedding(self.model_key(), query, query_embedding)
+        return query_embedding
+    
+    def invalidate_document_cache(self, document_id: int) -> None:
+        """
+        Drop cached retrieval results and answers that may include this document
+        """
+        for cache in (registry.get_retrieval_cache(), registry.get_answer_cache()):
+            if cache is not None:
+                cache.invalidate_document(document_id)
+    
+    def _dense_search(self, query_embedding: List[float], scope, n_results: int) -> List[Dict[str, Any]]:
+        """
+        Nearest chunks within `scope` (None, a document id or a tuple of ids),
+        querying each collection involved in parallel and merging by similarity
+        """
+        if scope is None:
+            targets = [(name, None) for name in self.router.all_shards(self.client)]
+        else:
+            targets = [
+                (name, self._where(shard_document_ids))
+                for name, shard_document_ids in self.router.group(scope if isinstance(scope, tuple) else (scope,)).items()
+            ]
+        
+        def query(target):
+            name, where = target
+            collection = self.get_collection(name, create=False)
+            if collection is None:
+                return []
+            results = collection.query(
                 query_embeddings=[query_embedding],
                 n_results=n_results,
-                where=where_clause,
+                where=where,
                 include=["documents", "metadatas", "distances"]
             )
+            return [{
+                'id': results['ids'][0][i],
+                'text': results['documents'][0][i],
+                'metadata': results['metadatas'][0][i],
+                'similarity': 1 - results['distances'][0][i]  # Convert distance to similarity
+            } for i in range(len(results['ids'][0]))]
+        
+        shard_results = self._fan_out(query, targets)
+        if len(shard_results) == 1:
+            return shard_results[0]
+        merged = [result for results in shard_results for result in results]
+        merged.sort(key=lambda result: result['similarity'], reverse=True)
+        return merged[:n_results]
+    
+    def _fetch_chunks(self, chunk_ids: List[str], query_embedding: List[float]) -> Dict[str, Dict[str, Any]]:
+        """
+        Load lexical-only hits from their collections and score them against the query embedding
+        """
+        if not chunk_ids:
+            return {}
+        by_shard = {}
+        for chunk_id in chunk_ids:
+            by_shard.setdefault(self.router.shard(chunk_document_id(chunk_id)), []).append(chunk_id)
+        
+        def fetch(item):
+            name, shard_chunk_ids = item
+            collection = self.get_collection(name, create=False)
+            if collection is None:
+                return {'ids': [], 'documents': [], 'metadatas': [], 'embeddings': []}
+            return collection.get(ids=shard_chunk_ids, include=["documents", "metadatas", "embeddings"])
+        
+        shard_results = self._fan_out(fetch, list(by_shard.items()))
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector) or 1.0
+        fetched = {}
+        for chunk_id, text, metadata, embedding in (
+            row for results in shard_results
+            for row in zip(results['ids'], results['documents'], results['metadatas'], results['embeddings'])
+        ):
+            vector = np.asarray(embedding, dtype=np.float32)
+            fetched[chunk_id] = {
+                'id': chunk_id,
+                'text': text,
+                'metadata': metadata,
+                'similarity': float(vector @ query_vector / ((np.linalg.norm(vector) or 1.0) * query_norm))
+            }
+        return fetched
+    
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+        """
+        Fuse several rankings of chunk ids: score = sum of 1 / (k + rank) over the rankings
+        """
+        scores: Dict[str, float] = {}
+        for ranking in rankings:
+            for rank, chunk_id in enumerate(ranking, start=1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    
+    def search_documents(
+        self,
+        query: str,
+        document_id: int = None,
+        n_results: int = 5,
+        document_ids: Iterable[int] = None,
+        mode: str = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for relevant document chunks based on query.
+        
+        Pass `document_id` for one document or `document_ids` to search a set
+        of documents (one query per collection involved); results are ranked by
+        similarity across all of them.
+        
+        `mode` is "dense" (embeddings only), "lexical" (BM25 only) or "hybrid"
+        (reciprocal-rank fusion of both, the SEARCH_MODE default). Fused
+        results carry their fusion score in 'score'.
+        """
+        try:
+            if document_ids is not None:
+                scope = tuple(sorted(set(int(doc_id) for doc_id in document_ids)))
+                if not scope:
+                    return []
+                if len(scope) == 1:
+                    scope = scope[0]
+            else:
+                scope = document_id or None
+            
+            mode = mode or settings.SEARCH_MODE
+            lexical_index = registry.get_lexical_index() if mode != "dense" else None
+            if lexical_index is None:
+                mode = "dense"
+            
+            cache = registry.get_retrieval_cache()
+            if cache is not None:
+                cached_results = cache.get_results(scope, query, n_results, mode=mode)
+                if cached_results is not None:
+                    return cached_results
+            
+            # Create query embedding
+            query_embedding = self.embed_query(query)
+            
+            multi_document = isinstance(scope, tuple)
+            
+            # Over-fetch across documents so duplicates can be dropped
+            n_candidates = n_results * 2 if multi_document else n_results
+            if mode != "dense":
+                n_candidates = max(n_candidates, settings.HYBRID_CANDIDATES)
+            
+            candidates = []
+            if mode != "lexical":
+                # Search the vector collection(s) holding the scope
+                with stage("vector_query"):
+                    candidates = self._dense_search(query_embedding, scope, n_candidates)
+            
+            if mode != "dense":
+                with stage("lexical_query"):
+                    lexical_hits = lexical_index.search(
+                        query,
+                        document_ids=scope if multi_document else (scope,) if scope else None,
+                        limit=n_candidates
+                    )
+                by_id = {result['id']: result for result in candidates}
+                fused = self.reciprocal_rank_fusion(
+                    [[result['id'] for result in candidates], [chunk_id for chunk_id, _ in lexical_hits]],
+                    k=settings.HYBRID_RRF_K
+                )
+                by_id.update(self._fetch_chunks(
+                    [chunk_id for chunk_id, _ in fused if chunk_id not in by_id], query_embedding
+                ))
+                candidates = [
+                    dict(by_id[chunk_id], score=round(score, 6))
+                    for chunk_id, score in fused if chunk_id in by_id
+                ]
             
             # Format results
             formatted_results = []
-            for i in range(len(results['ids'][0])):
-                formatted_results.append({
-                    'id': results['ids'][0][i],
-                    'text': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'similarity': 1 - results['distances'][0][i]  # Convert distance to similarity
-                })
+            seen_texts = set()
+            for result in candidates:
+                # The same passage in several documents (e.g. re-uploads) is kept once, at its best score
+                if multi_document:
+                    if result['text'] in seen_texts:
+                        continue
+                    seen_texts.add(result['text'])
+                formatted_results.append(result)
+            formatted_results = formatted_results[:n_results]
+            
+            # Empty results are not cached: the document may still be ingesting
+            if cache is not None and formatted_results:
+                cache.set_results(scope, query, n_results, formatted_results, mode=mode)
             
             return formatted_results
             
@@ -160,19 +798,25 @@ class DocumentVectorStore:
         """
         Delete all chunks for a specific document
         """
+        from .models import DocumentChunk
+        
         try:
-            # Get all chunk IDs for this document
-            results = self.collection.get(
-                where={"document_id": document_id},
-                include=["metadatas"]
-            )
+            self.invalidate_document_cache(document_id)
             
-            if results['ids']:
-                self.collection.delete(ids=results['ids'])
-                logger.info(f"Deleted {len(results['ids'])} chunks for document {document_id}")
-                return True
+            lexical_index = registry.get_lexical_index()
+            if lexical_index is not None:
+                lexical_index.remove_document(document_id)
             
-            return False
+            if self.router.shared:
+                # Filtered delete: one round trip, no id listing first
+                collection = self.collection_for(document_id, create=False)
+                if collection is not None:
+                    collection.delete(where={"document_id": document_id})
+            else:
+                self.drop_collection(self.router.shard(document_id))
+            DocumentChunk.objects.filter(document_id=document_id).delete()
+            logger.info(f"Deleted chunks for document {document_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Error deleting document {document_id}: {str(e)}")
@@ -180,46 +824,44 @@ class DocumentVectorStore:
     
     def get_document_stats(self, document_id: int = None) -> Dict[str, Any]:
         """
-        Get statistics about stored documents
+        Get statistics about stored documents, from the DocumentChunk table
         """
+        from django.db.models import Count
+        from .models import DocumentChunk
+        
         try:
-            where_clause = None
-            if document_id:
-                where_clause = {"document_id": document_id}
-            
-            results = self.collection.get(
-                where=where_clause,
-                include=["metadatas"]
-            )
-            
             if document_id:
+                chunks = list(
+                    DocumentChunk.objects.filter(document_id=document_id).values(
+                        "chunk_id", "chunk_index", "page_start", "page_end", "token_count"
+                    )
+                )
                 return {
                     "document_id": document_id,
-                    "total_chunks": len(results['ids']),
-                    "chunks": results['metadatas'] if results['metadatas'] else []
+                    "total_chunks": len(chunks),
+                    "chunks": chunks
                 }
             else:
-                # Get stats for all documents
-                doc_stats = {}
-                for metadata in results['metadatas']:
-                    doc_id = metadata['document_id']
-                    if doc_id not in doc_stats:
-                        doc_stats[doc_id] = {
-                            "document_id": doc_id,
-                            "title": metadata['title'],
-                            "chunk_count": 0
-                        }
-                    doc_stats[doc_id]["chunk_count"] += 1
-                
+                # One grouped query over the document_id index
+                documents = list(
+                    DocumentChunk.objects.values("document_id")
+                    .annotate(chunk_count=Count("id"))
+                    .values("document_id", "document__title", "chunk_count")
+                    .order_by("document_id")
+                )
                 return {
-                    "total_documents": len(doc_stats),
-                    "total_chunks": len(results['ids']),
-                    "documents": list(doc_stats.values())
+                    "total_documents": len(documents),
+                    "total_chunks": sum(document["chunk_count"] for document in documents),
+                    "documents": [
+                        {
+                            "document_id": document["document_id"],
+                            "title": document["document__title"],
+                            "chunk_count": document["chunk_count"]
+                        }
+                        for document in documents
+                    ]
                 }
                 
         except Exception as e:
             logger.error(f"Error getting document stats: {str(e)}")
             return {}
-
-# Global instance
-vector_store = DocumentVectorStore()
\ No newline at end of file
@@ -1,9 +1,15 @@
 import os
 import time
-import logging
-import requests
 import json
-from django.http import JsonResponse
+import asyncio
+import logging
+import functools
+from contextlib import nullcontext
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
@@ -11,107 +17,71 @@ from rest_framework.views import APIView
 from rest_framework import viewsets
 from .models import Document
 from .serializers import DocumentSerializer
-from PyPDF2 import PdfReader
-from .vector_store import DocumentVectorStore
+from .tasks import QueueUnavailable, enqueue_document, enqueue_documents
+from .bulk_ingest import create_documents
+from .context import ContextBuilder, context_token_budget, count_tokens, page_passages
+from .registry import (
+    get_vector_store, get_embedding_cache, get_lexical_index, get_llm_client, get_reranker, get_answer_cache,
+    get_retrieval_executor, get_single_flight, get_llm_limiter
+)
+from .cache import normalize_question
+from .flow_control import Overloaded
+from .metrics import collect_timings, in_context, observe, rounded, stage, timing_context
 
 logger = logging.getLogger(__name__)
 
-# Initialize vector store
-vector_store = DocumentVectorStore()
-
-# LLM Configuration - Multiple options for reliability
-OLLAMA_BASE_URL = "http://localhost:11434"
-OLLAMA_MODELS = ["llama3:latest", "llama3.2:latest", "phi3:latest", "gemma2:2b"]  # Fallback models
-
-def call_ollama(prompt, max_tokens=1000, temperature=0.3):
+def call_ollama(prompt, max_tokens=1000, temperature=0.3, info=None, question=None, document_ids=None):
     """
-    Call Ollama API with fallback models for reliability
+    Call Ollama through the shared LLM client (pooled connections, model
+    fallback, circuit breaker) and fall back to an extractive answer from the
+    lexical index for `question` over `document_ids`. Generation waits for an
+    LLM admission slot and raises Overloaded when none frees up in time.
     """
-    for model in OLLAMA_MODELS:
-        try:
-            logger.info(f"Trying Ollama model: {model}")
-            response = requests.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": temperature,
-                        "num_predict": max_tokens
-                    }
-                },
-                timeout=30  # Reduced timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                answer = result.get("response", "")
-                if answer.strip():
-                    logger.info(f"Successfully got response from {model}")
-                    return answer
-            else:
-                logger.warning(f"Ollama model {model} error: {response.status_code}")
-                continue
-                
-        except requests.exceptions.Timeout:
-            logger.warning(f"Ollama model {model} timed out, trying next model")
-            continue
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Ollama model {model} connection error: {str(e)}")
-            continue
-        except Exception as e:
-            logger.warning(f"Ollama model {model} error: {str(e)}")
-            continue
+    with llm_slot():
+        with stage("llm_generate"):
+            answer = get_llm_client().generate(prompt, max_tokens=max_tokens, temperature=temperature, info=info)
+    if answer is not None:
+        return answer
     
     # If all Ollama models fail, use simple text processing fallback
     logger.warning("All Ollama models failed, using simple text processing fallback")
-    return generate_simple_answer(prompt)
+    if info is not None:
+        info["model"] = "simple-text-fallback"
+    return generate_simple_answer(question, document_ids)
 
-def generate_simple_answer(prompt):
+def call_ollama_stream(prompt, max_tokens=1000, temperature=0.3, info=None, question=None, document_ids=None):
     """
-    Simple text processing fallback when Ollama is unavailable
+    Stream an answer from Ollama token by token, falling back to the simple
+    text answer (as a single chunk) when every model fails
     """
+    info = info if info is not None else {}
+    produced = False
+    start = time.perf_counter()
+    for token in get_llm_client().stream(prompt, max_tokens=max_tokens, temperature=temperature, info=info):
+        produced = True
+        yield token
+    observe("llm_generate", time.perf_counter() - start)
+    
+    if not produced:
+        logger.warning("All Ollama models failed, using simple text processing fallback")
+        info["model"] = "simple-text-fallback"
+        yield generate_simple_answer(question, document_ids)
+
+def generate_simple_answer(question, document_ids=None):
+    """
+    Simple text processing fallback when Ollama is unavailable: the best
+    matching sentences from the top BM25 chunks of the documents
+    """
+    with stage("fallback"):
+        return _simple_answer(question, document_ids)
+
+def _simple_answer(question, document_ids):
     try:
-        # Extract question and context from prompt
-        lines = prompt.split('\n')
-        question = ""
-        context = ""
-        
-        for line in lines:
-            if line.startswith("Question:"):
-                question = line.replace("Question:", "").strip()
-            elif "Context from document" in line:
-                # Find context section
-                context_start = prompt.find("Context from document")
-                question_start = prompt.find("Question:")
-                if context_start != -1 and question_start != -1:
-                    context = prompt[context_start:question_start].strip()
-        
         if not question:
             return "I apologize, but I couldn't process your question. Please try again."
         
-        # Simple keyword-based response generation
-        context_lower = context.lower()
-        question_lower = question.lower()
-        
-        # Extract key terms from question
-        question_words = [word.strip('.,?!') for word in question_lower.split() if len(word) > 3]
-        
-        # Find relevant sentences from context
-        relevant_sentences = []
-        for sentence in context.split('.'):
-            sentence = sentence.strip()
-            if len(sentence) > 20:  # Ignore very short sentences
-                sentence_lower = sentence.lower()
-                # Check if sentence contains question keywords
-                relevance_score = sum(1 for word in question_words if word in sentence_lower)
-                if relevance_score > 0:
-                    relevant_sentences.append((sentence, relevance_score))
-        
-        # Sort by relevance and take top sentences
-        relevant_sentences.sort(key=lambda x: x[1], reverse=True)
-        top_sentences = [sent[0] for sent in relevant_sentences[:3]]
+        lexical_index = get_lexical_index()
+        top_sentences = lexical_index.best_sentences(question, document_ids=document_ids) if lexical_index else []
         
         if top_sentences:
             answer = f"Based on the document, here's what I found regarding your question:\n\n"
@@ -129,93 +99,652 @@ class TestView(APIView):
     def get(self, request):
         return Response({"message": "Hello from DocGPT! Now powered by Ollama (Free LLM)"})
 
-class AskDocumentView(APIView):
-    def post(self, request):
-        doc_id = request.data.get("document_id")
-        question = request.data.get("question")
-        use_semantic_search = request.data.get("use_semantic_search", True)
+def parse_flag(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("0", "false", "no", "off")
 
-        if not question:
-            return Response({"error": "Question is required"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if not doc_id:
-            return Response({"error": "Document ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+def parse_ask_request(data):
+    """
+    Validate an ask request; returns (documents, question, use_semantic_search, rerank, error_response).
+
+    The question can target one document ("document_id"), a set of documents
+    ("document_ids") or every document tagged with a collection ("collection").
+    """
+    doc_id = data.get("document_id")
+    doc_ids = data.get("document_ids")
+    collection = data.get("collection")
+    question = data.get("question")
+    # Flags may come from form posts as strings ("false", "0")
+    use_semantic_search = parse_flag(data.get("use_semantic_search"), default=True)
+    rerank = parse_flag(data.get("rerank"), default=True)
 
+    if not question:
+        return None, None, None, None, Response({"error": "Question is required"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not (doc_id or doc_ids or collection):
+        return None, None, None, None, Response(
+            {"error": "Document ID, document IDs or collection is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if doc_id:
         try:
-            document = Document.objects.get(id=doc_id)
-        except Document.DoesNotExist:
-            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+            documents = [Document.objects.get(id=doc_id)]
+        except (Document.DoesNotExist, ValueError):
+            return None, None, None, None, Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+        return documents, question, use_semantic_search, rerank, None
 
-        # Process with Ollama (Free LLM)
-        
+    if doc_ids:
+        if not isinstance(doc_ids, list):
+            return None, None, None, None, Response({"error": "document_ids must be a list"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            context_text = ""
-            sources = []
-            
-            if use_semantic_search:
-                # Use vector store for semantic search
-                search_results = vector_store.search_documents(
-                    query=question,
-                    document_id=doc_id,
-                    n_results=3
-                )
-                
-                if search_results:
-                    context_text = "\n\n".join([result['text'] for result in search_results])
-                    sources = [{
-                        "chunk_id": result['id'],
-                        "similarity": round(result['similarity'], 3),
-                        "text_preview": result['text'][:200] + "..." if len(result['text']) > 200 else result['text']
-                    } for result in search_results]
-                else:
-                    # Fallback to full document text
-                    file_path = document.file.path
-                    reader = PdfReader(file_path)
-                    for page in reader.pages:
-                        context_text += page.extract_text() + "\n"
-            else:
-                # Use full document text
-                file_path = document.file.path
-                reader = PdfReader(file_path)
-                for page in reader.pages:
-                    context_text += page.extract_text() + "\n"
-            
-            # Create enhanced prompt
-            prompt = f"""Answer the following question based on the provided document context. Be specific and cite relevant information from the context.
+            documents = list(Document.objects.filter(id__in=doc_ids).order_by('id'))
+        except (ValueError, TypeError):
+            return None, None, None, None, Response({"error": "document_ids must be a list of IDs"}, status=status.HTTP_400_BAD_REQUEST)
+        missing = set(str(i) for i in doc_ids) - set(str(document.id) for document in documents)
+        if missing:
+            return None, None, None, None, Response(
+                {"error": f"Documents not found: {', '.join(sorted(missing))}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    else:
+        documents = list(Document.objects.filter(collection=collection).order_by('id'))
+        if not documents:
+            return None, None, None, None, Response({"error": "Collection not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return documents, question, use_semantic_search, rerank, None
+
+def documents_payload(documents):
+    """
+    The "document" / "documents" fields of ask responses
+    """
+    return {
+        "document": {"id": documents[0].id, "title": documents[0].title} if len(documents) == 1 else None,
+        "documents": [{"id": document.id, "title": document.title} for document in documents]
+    }
+
+def build_ask_prompt(documents, question, use_semantic_search, rerank=True, max_tokens=None):
+    """
+    Retrieve context for a question across one or more documents and build
+    the LLM prompt; returns (prompt, sources, context_info).
 
-Context from document "{document.title}":
+    Retrieved chunks are packed by relevance into the token budget left by
+    the LLM's context window after the answer (`max_tokens`), template and
+    question; overlapping sentences of neighbouring chunks are included once.
+    Without retrieved chunks the best matching pages are packed the same
+    way, so the prompt is bounded even for very large documents.
+
+    With reranking enabled (RERANK_ENABLED; a request can opt out with
+    rerank=false) more candidates are retrieved and reordered by the cross-encoder.
+    """
+    max_tokens = max_tokens or settings.LLM_MAX_TOKENS
+    builder = ContextBuilder(context_token_budget(
+        get_llm_client().context_window(), max_tokens, settings.LLM_PROMPT_RESERVE_TOKENS, question
+    ))
+    multi_document = len(documents) > 1
+    packed = None
+    sources = []
+    
+    if use_semantic_search:
+        top_k = settings.CONTEXT_MAX_CHUNKS
+        reranker = get_reranker() if rerank else None
+        
+        # One vector store query covers every selected document
+        search_results = get_vector_store().search_documents(
+            query=question,
+            document_ids=[document.id for document in documents],
+            n_results=max(top_k, settings.RERANK_CANDIDATES) if reranker else top_k
+        )
+        if reranker:
+            with stage("rerank"):
+                search_results = reranker.rerank(question, search_results, top_k)
+    
+    build_start = time.perf_counter()
+    if use_semantic_search and search_results:
+        packed = builder.pack({
+            "document_id": result['metadata'].get('document_id'),
+            "title": result['metadata'].get('title'),
+            "text": result['text'],
+            "result": result
+        } for result in search_results)
+        sources = [{
+            "chunk_id": passage['result']['id'],
+            "document_id": passage['document_id'],
+            "title": passage['title'],
+            "similarity": round(passage['result']['similarity'], 3),
+            "rerank_score": passage['result'].get('rerank_score'),
+            "page": passage['result']['metadata'].get('page_start'),
+            "tokens": passage['tokens'],
+            "text_preview": passage['result']['text'][:200] + "..." if len(passage['result']['text']) > 200 else passage['result']['text']
+        } for passage in packed['passages']]
+    
+    if not packed or not packed['passages']:
+        # Fall back to (or use) the document text: best matching pages, within the budget
+        packed = builder.pack(page_passages(documents, question))
+    
+    if multi_document:
+        context_text = "\n\n".join(f"[{passage['title']}]\n{passage['text']}" for passage in packed['passages'])
+        context_label = f"Context from {len(documents)} documents (each passage starts with its document title):"
+    else:
+        context_text = "\n\n".join(passage['text'] for passage in packed['passages'])
+        context_label = f'Context from document "{documents[0].title}":'
+    
+    # Create enhanced prompt
+    prompt = f"""Answer the following question based on the provided document context. Be specific and cite relevant information from the context.
+
+{context_label}
 {context_text}
 
 Question: {question}
 
 Please provide a comprehensive answer based on the context above. If the context doesn't contain enough information to answer the question, please state that clearly."""
+    
+    context_info = {
+        "prompt_tokens": count_tokens(prompt),
+        "context_tokens": packed['tokens'],
+        "context_budget": packed['budget'],
+        "passages": len(packed['passages']),
+        "passages_dropped": packed['dropped'],
+        "sentences_deduplicated": packed['deduplicated']
+    }
+    observe("prompt_build", time.perf_counter() - build_start)
+    return prompt, sources, context_info
+
+def answer_scope(documents):
+    """
+    Answer cache scope: a document id, or a sorted tuple of ids for multi-document questions
+    """
+    ids = tuple(sorted(document.id for document in documents))
+    return ids[0] if len(ids) == 1 else ids
+
+def answer_mode(use_semantic_search, rerank=True):
+    """
+    Answer cache mode: answers built from different retrieval settings are not interchangeable
+    """
+    semantic = "semantic" if use_semantic_search else "full-text"
+    return f"{semantic}|rerank" if use_semantic_search and rerank and settings.RERANK_ENABLED else semantic
+
+def find_similar_answer(answer_cache, scope, mode, question):
+    """
+    Look for a cached answer to a near-identical question before doing any
+    retrieval; returns (entry, cache_info, question_embedding)
+    """
+    question_embedding = get_vector_store().embed_query(question)
+    entry, similarity = answer_cache.find_similar(scope, question_embedding, mode=mode)
+    if entry is None:
+        return None, None, question_embedding
+    return entry, {
+        "match": "semantic",
+        "similarity": round(similarity, 3),
+        "question": entry["question"]
+    }, question_embedding
+
+def cacheable_answer(answer, info):
+    # Simple-text fallbacks are not cached so the LLM answer replaces them once it is back
+    return bool(answer and answer.strip()) and info.get("model") != "simple-text-fallback"
+
+def prepare_answer(documents, question, use_semantic_search, rerank=True):
+    """
+    Answer-cache lookups and retrieval shared by the ask views.
+
+    Returns a dict with the cache "scope" and "mode" and, on a cache hit, the
+    "cached" entry and "cache_info"; otherwise "prompt", "sources", "context"
+    and the "chunk_ids" / "question_embedding" that store_answer needs.
+    """
+    prepared = {
+        "scope": answer_scope(documents),
+        "mode": answer_mode(use_semantic_search, rerank),
+        "cached": None,
+        "cache_info": None,
+        "question_embedding": None
+    }
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        prepared["cached"], prepared["cache_info"], prepared["question_embedding"] = find_similar_answer(
+            answer_cache, prepared["scope"], prepared["mode"], question
+        )
+        if prepared["cached"] is not None:
+            return prepared
+    
+    prompt, sources, context_info = build_ask_prompt(documents, question, use_semantic_search, rerank=rerank)
+    prepared.update(
+        prompt=prompt,
+        sources=sources if use_semantic_search else [],
+        context=context_info,
+        chunk_ids=[source["chunk_id"] for source in sources]
+    )
+    if answer_cache is not None:
+        prepared["cached"] = answer_cache.get(prepared["scope"], prepared["chunk_ids"], question, mode=prepared["mode"])
+        prepared["cache_info"] = {"match": "exact"} if prepared["cached"] is not None else None
+    return prepared
+
+def store_answer(prepared, question, answer, info):
+    """
+    Cache a generated answer under the scope, mode and chunks it was built from
+    """
+    answer_cache = get_answer_cache()
+    if answer_cache is not None and cacheable_answer(answer, info):
+        answer_cache.set(prepared["scope"], prepared["chunk_ids"], question, {
+            "answer": answer,
+            "question": question,
+            "sources": prepared["sources"],
+            "context": prepared["context"],
+            "model": info.get("model")
+        }, question_embedding=prepared["question_embedding"], mode=prepared["mode"])
+
+def cached_answer_payload(documents, question, use_semantic_search, prepared, processing_time):
+    cached = prepared["cached"]
+    return {
+        "answer": cached["answer"],
+        **documents_payload(documents),
+        "question": question,
+        "sources": cached["sources"],
+        "semantic_search_used": use_semantic_search,
+        "prompt_tokens": cached["context"]["prompt_tokens"],
+        "context": cached["context"],
+        "cached": True,
+        "cache": prepared["cache_info"],
+        "processing_time": round(processing_time, 2),
+        "timestamp": time.time()
+    }
+
+def answer_payload(documents, question, use_semantic_search, prepared, answer, processing_time):
+    return {
+        "answer": answer,
+        **documents_payload(documents),
+        "question": question,
+        "sources": prepared["sources"],
+        "semantic_search_used": use_semantic_search,
+        "prompt_tokens": prepared["context"]["prompt_tokens"],
+        "context": prepared["context"],
+        "cached": False,
+        "processing_time": round(processing_time, 2),
+        "timestamp": time.time()
+    }
+
+LLM_UNAVAILABLE = "AI service is currently unavailable. Please try again in a few moments."
+
+def ask_key(documents, question, use_semantic_search, rerank=True, kind="json"):
+    """
+    Requests with the same key get the same answer and can share one computation.
+    `kind` separates views whose leaders publish differently shaped results:
+    "json" (the answer_question payload) and "stream" (see AskDocumentStreamView).
+    """
+    return (kind, answer_scope(documents), normalize_question(question), use_semantic_search, rerank)
+
+def coalesce(key, function):
+    """
+    Run `function`, or wait for the identical call already in flight; returns (result, coalesced)
+    """
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return function(), False
+    return single_flight.run(key, function)
+
+def llm_slot():
+    # Admission control around LLM generation (a no-op when LLM_MAX_CONCURRENT is 0)
+    limiter = get_llm_limiter()
+    return limiter.slot() if limiter is not None else nullcontext()
+
+def overloaded_response(error, response_class=Response):
+    return response_class(
+        {"error": "Too many questions are being answered right now. Please retry shortly.", "retry_after": error.retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def wants_timings(data):
+    # The per-stage breakdown is returned for requests sent with "debug": true
+    return settings.ASK_DEBUG_TIMINGS and str(data.get("debug", "")).lower() in ("1", "true")
+
+def stage_timings(timings, request_start):
+    return rounded(dict(timings, total=time.time() - request_start))
+
+def ask_response(payload, coalesced, include_timings):
+    """
+    Response body for a (possibly shared) answer payload; its stage timings are only returned on request
+    """
+    body = dict(payload, coalesced=coalesced)
+    timings = body.pop("timings", None)
+    if include_timings:
+        body["timings"] = timings
+    return body
+
+def answer_question(documents, question, use_semantic_search, rerank=True):
+    """
+    Retrieve, generate and cache the answer to one question; returns the
+    response payload (with per-stage "timings"), or None when no answer
+    could be produced. Raises Overloaded when the LLM is saturated.
+    """
+    request_start = time.time()
+    with collect_timings() as timings:
+        prepared = prepare_answer(documents, question, use_semantic_search, rerank=rerank)
+        if prepared["cached"] is not None:
+            payload = cached_answer_payload(documents, question, use_semantic_search, prepared, time.time() - request_start)
+            return dict(payload, timings=stage_timings(timings, request_start))
+        
+        start_time = time.time()
+        llm_info = {}
+        answer = call_ollama(
+            prepared["prompt"], max_tokens=settings.LLM_MAX_TOKENS, temperature=0.3, info=llm_info,
+            question=question, document_ids=[document.id for document in documents]
+        )
+        processing_time = time.time() - start_time
+        
+        if answer is None or not answer.strip():
+            return None
+        
+        store_answer(prepared, question, answer, llm_info)
+    payload = answer_payload(documents, question, use_semantic_search, prepared, answer, processing_time)
+    return dict(payload, timings=stage_timings(timings, request_start))
+
+class AskDocumentView(APIView):
+    """
+    Answer a question about one or more documents.
+
+    Identical questions arriving while one is being answered wait for that
+    answer ("coalesced": true) instead of repeating retrieval and generation.
+    When the LLM is saturated the request gets 429 with Retry-After. Requests
+    sent with "debug": true also get the time spent per pipeline stage
+    ("timings": query_embedding, vector_query, rerank, prompt_build,
+    llm_generate, fallback, total; for a coalesced answer, its leader's).
+    """
+    def post(self, request):
+        documents, question, use_semantic_search, rerank, error_response = parse_ask_request(request.data)
+        if error_response:
+            return error_response
+
+        # Process with Ollama (Free LLM)
+        
+        try:
+            payload, coalesced = coalesce(
+                ask_key(documents, question, use_semantic_search, rerank),
+                lambda: answer_question(documents, question, use_semantic_search, rerank=rerank)
+            )
+            if payload is None:
+                return Response({"error": LLM_UNAVAILABLE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return Response(ask_response(payload, coalesced, wants_timings(request.data)))
             
-            start_time = time.time()
-            answer = call_ollama(prompt, max_tokens=1000, temperature=0.3)
-            processing_time = time.time() - start_time
-            
-            if answer is None or not answer.strip():
-                return Response(
-                    {"error": "AI service is currently unavailable. Please try again in a few moments."}, 
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-            
-            return Response({
-                "answer": answer,
-                "document": {
-                    "id": document.id,
-                    "title": document.title
-                },
+        except Overloaded as e:
+            return overloaded_response(e)
+        except Exception as e:
+            logger.error(f"Error in AskDocumentView: {str(e)}")
+            return Response({"error": f"Failed to process question: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@csrf_exempt
+@require_POST
+async def ask_document_async(request):
+    """
+    Async variant of AskDocumentView for ASGI servers (same request and response).
+
+    The question never pins a worker thread while the LLM is generating:
+    validation and retrieval (query encoding, vector search, prompt building)
+    run on the bounded retrieval thread pool, and Ollama is called with an
+    async HTTP client, so one process can hold hundreds of questions in flight.
+    Under WSGI it still works, but each request then runs its own event loop.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    
+    loop = asyncio.get_running_loop()
+    executor = get_retrieval_executor()
+    # Under WSGI the view runs on an event loop created for this request only
+    persistent_loop = isinstance(request, ASGIRequest)
+    
+    def run(function, *args, **kwargs):
+        # Copies the context, so stages timed on the thread reach the request's timings
+        return loop.run_in_executor(executor, in_context(functools.partial(function, *args, **kwargs)))
+    
+    try:
+        documents, question, use_semantic_search, rerank, error_response = await run(parse_ask_request, data)
+        if error_response:
+            return JsonResponse(error_response.data, status=error_response.status_code)
+        
+        async def answer():
+            request_start = time.time()
+            with collect_timings() as timings:
+                prepared = await run(prepare_answer, documents, question, use_semantic_search, rerank=rerank)
+                if prepared["cached"] is not None:
+                    payload = cached_answer_payload(documents, question, use_semantic_search, prepared, time.time() - request_start)
+                    return dict(payload, timings=stage_timings(timings, request_start))
+                
+                start_time = time.time()
+                llm_info = {}
+                limiter = get_llm_limiter()
+                async with limiter.aslot() if limiter is not None else nullcontext():
+                    with stage("llm_generate"):
+                        answer = await get_llm_client().agenerate(
+                            prepared["prompt"], max_tokens=settings.LLM_MAX_TOKENS, temperature=0.3, info=llm_info,
+                            persistent_loop=persistent_loop
+                        )
+                if answer is None:
+                    logger.warning("All Ollama models failed, using simple text processing fallback")
+                    llm_info["model"] = "simple-text-fallback"
+                    answer = await run(generate_simple_answer, question, [document.id for document in documents])
+                processing_time = time.time() - start_time
+                
+                if not answer or not answer.strip():
+                    return None
+                await run(store_answer, prepared, question, answer, llm_info)
+            payload = answer_payload(documents, question, use_semantic_search, prepared, answer, processing_time)
+            return dict(payload, timings=stage_timings(timings, request_start))
+        
+        single_flight = get_single_flight()
+        if single_flight is None:
+            payload, coalesced = await answer(), False
+        else:
+            payload, coalesced = await single_flight.arun(ask_key(documents, question, use_semantic_search, rerank), answer)
+        if payload is None:
+            return JsonResponse({"error": LLM_UNAVAILABLE}, status=503)
+        return JsonResponse(ask_response(payload, coalesced, wants_timings(data)))
+    
+    except Overloaded as e:
+        return overloaded_response(e, JsonResponse)
+    except Exception as e:
+        logger.error(f"Error in ask_document_async: {str(e)}")
+        return JsonResponse({"error": f"Failed to process question: {str(e)}"}, status=500)
+
+def sse_event(event, data):
+    """
+    Format one Server-Sent Event
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class SSEResponse(StreamingHttpResponse):
+    """
+    Server-Sent Events response. `on_close` callbacks run when the server
+    closes the response, whether or not the stream was consumed.
+    """
+    def __init__(self, events, on_close=()):
+        super().__init__(events, content_type="text/event-stream")
+        self["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream
+        self["X-Accel-Buffering"] = "no"
+        self._on_close = list(on_close)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            callbacks, self._on_close = self._on_close, []
+            for callback in callbacks:
+                callback()
+
+class AskDocumentStreamView(APIView):
+    """
+    Streaming variant of AskDocumentView: relays the LLM token stream as Server-Sent Events.
+
+    Events: "meta" (document(s), sources, prompt size, cached), "token" (answer
+    text deltas; a cached answer is sent as one token), "done" (timings incl.
+    time to first token, and the per-stage "timings" for "debug": true), "error".
+
+    Retrieval and admission happen before the stream starts, so a saturated
+    LLM gets a plain 429 with Retry-After. An identical question already
+    being streamed is not generated again: the request waits for that answer
+    and receives it as one token ("coalesced": true).
+    """
+    def post(self, request):
+        documents, question, use_semantic_search, rerank, error_response = parse_ask_request(request.data)
+        if error_response:
+            return error_response
+
+        request_start = time.time()
+        include_timings = wants_timings(request.data)
+        key = ask_key(documents, question, use_semantic_search, rerank, kind="stream")
+        single_flight = get_single_flight()
+        future, leader = single_flight.begin(key) if single_flight is not None else (None, True)
+        if not leader:
+            return SSEResponse(self.shared_events(
+                documents, question, use_semantic_search, future, request_start, include_timings
+            ))
+
+        # Leader: the outcome is handed to coalesced requests when the response closes
+        outcome = {}
+        on_close = []
+        if future is not None:
+            on_close.append(lambda: single_flight.finish(
+                key, future, result=outcome.get("shared"),
+                error=None if "shared" in outcome else RuntimeError("The coalesced answer failed")
+            ))
+        try:
+            with collect_timings() as timings:
+                prepared = prepare_answer(documents, question, use_semantic_search, rerank=rerank)
+            limiter = get_llm_limiter() if prepared["cached"] is None else None
+            if limiter is not None:
+                limiter.acquire()
+                slot_start = time.time()
+                # Runs before finish(), so waiters queued behind the slot move first
+                on_close.insert(0, lambda: limiter.release(time.time() - slot_start))
+        except Exception as e:
+            for callback in on_close:
+                callback()
+            if isinstance(e, Overloaded):
+                return overloaded_response(e)
+            logger.error(f"Error in AskDocumentStreamView: {str(e)}")
+            return Response({"error": f"Failed to process question: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return SSEResponse(
+            self.answer_events(
+                documents, question, use_semantic_search, prepared, outcome, request_start, timings, include_timings
+            ),
+            on_close=on_close
+        )
+
+    def done_event(self, done, timings, include_timings):
+        if include_timings:
+            done["timings"] = timings
+        return sse_event("done", done)
+
+    def shared_events(self, documents, question, use_semantic_search, future, request_start, include_timings):
+        """
+        Events for a request coalesced onto an identical one in flight
+        """
+        try:
+            shared = future.result()
+        except Exception as e:
+            yield sse_event("error", {"error": f"Failed to process question: {str(e)}"})
+            return
+        yield sse_event("meta", {
+            **documents_payload(documents),
+            "question": question,
+            "sources": shared["sources"],
+            "semantic_search_used": use_semantic_search,
+            "prompt_tokens": shared["context"]["prompt_tokens"],
+            "context": shared["context"],
+            "cached": False,
+            "coalesced": True
+        })
+        yield sse_event("token", {"token": shared["answer"]})
+        yield self.done_event({
+            "model": shared.get("model"),
+            "time_to_first_token": round(time.time() - request_start, 3),
+            "generation_time": 0.0,
+            "processing_time": round(time.time() - request_start, 2),
+            "timestamp": time.time()
+        }, shared.get("timings"), include_timings)
+
+    def answer_events(
+        self, documents, question, use_semantic_search, prepared, outcome, request_start, timings, include_timings
+    ):
+        cached = prepared["cached"]
+        if cached is not None:
+            outcome["shared"] = dict(cached, timings=stage_timings(timings, request_start))
+            yield sse_event("meta", {
+                **documents_payload(documents),
                 "question": question,
-                "sources": sources if use_semantic_search else [],
+                "sources": cached["sources"],
                 "semantic_search_used": use_semantic_search,
-                "processing_time": round(processing_time, 2),
-                "timestamp": time.time()
+                "prompt_tokens": cached["context"]["prompt_tokens"],
+                "context": cached["context"],
+                "cached": True,
+                "cache": prepared["cache_info"]
             })
-            
+            yield sse_event("token", {"token": cached["answer"]})
+            yield self.done_event({
+                "model": cached.get("model"),
+                "time_to_first_token": round(time.time() - request_start, 3),
+                "generation_time": 0.0,
+                "processing_time": round(time.time() - request_start, 2),
+                "timestamp": time.time()
+            }, outcome["shared"]["timings"], include_timings)
+            return
+
+        yield sse_event("meta", {
+            **documents_payload(documents),
+            "question": question,
+            "sources": prepared["sources"],
+            "semantic_search_used": use_semantic_search,
+            "prompt_tokens": prepared["context"]["prompt_tokens"],
+            "context": prepared["context"],
+            "cached": False
+        })
+
+        generation_start = time.time()
+        time_to_first_token = None
+        stream_info = {}
+        tokens = []
+        # The body is iterated outside the request's context; generation is timed into `timings` explicitly
+        context = timing_context(timings)
+        stream = call_ollama_stream(
+            prepared["prompt"], max_tokens=settings.LLM_MAX_TOKENS, temperature=0.3, info=stream_info,
+            question=question, document_ids=[document.id for document in documents]
+        )
+        try:
+            for token in iter(lambda: context.run(next, stream, None), None):
+                if time_to_first_token is None:
+                    time_to_first_token = time.time() - generation_start
+                tokens.append(token)
+                yield sse_event("token", {"token": token})
         except Exception as e:
-            logger.error(f"Error in AskDocumentView: {str(e)}")
-            return Response({"error": f"Failed to process question: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            logger.error(f"Error streaming answer: {str(e)}")
+            yield sse_event("error", {"error": LLM_UNAVAILABLE})
+            return
+
+        answer = "".join(tokens)
+        store_answer(prepared, question, answer, stream_info)
+        outcome["shared"] = {
+            "answer": answer,
+            "sources": prepared["sources"],
+            "context": prepared["context"],
+            "model": stream_info.get("model"),
+            "timings": stage_timings(timings, request_start)
+        }
+
+        generation_time = time.time() - generation_start
+        yield self.done_event({
+            "model": stream_info.get("model"),
+            "time_to_first_token": round(time_to_first_token, 3) if time_to_first_token is not None else None,
+            "generation_time": round(generation_time, 2),
+            "processing_time": round(time.time() - request_start, 2),
+            "timestamp": time.time()
+        }, outcome["shared"]["timings"], include_timings)
 
 def ping(request):
     return JsonResponse({"message": "DocGPT backend is running!"})
@@ -225,6 +754,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        collection = self.request.query_params.get('collection')
+        if collection is not None:
+            queryset = queryset.filter(collection=collection)
+        return queryset
+
 from django.http import JsonResponse
 
 def test_view(request):
@@ -234,10 +770,14 @@ class DocumentStatsView(APIView):
     def get(self, request, document_id=None):
         """Get statistics about documents in vector store"""
         try:
-            stats = vector_store.get_document_stats(document_id)
+            stats = get_vector_store().get_document_stats(document_id)
+            embedding_cache = get_embedding_cache()
+            lexical_index = get_lexical_index()
             return Response({
                 "success": True,
                 "stats": stats,
+                "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+                "lexical_index": lexical_index.stats() if lexical_index else None,
                 "timestamp": time.time()
             })
         except Exception as e:
@@ -253,7 +793,7 @@ class DocumentDeleteView(APIView):
             document.delete()
             
             # Delete from vector store
-            vector_store.delete_document(document_id)
+            get_vector_store().delete_document(document_id)
             
             return Response({
                 "message": "Document deleted successfully",
@@ -270,6 +810,7 @@ class DocumentDeleteView(APIView):
 
 class DocumentUploadView(APIView):
     def post(self, request, *args, **kwargs):
+        request_start = time.time()
         if 'document' not in request.FILES:
             return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -283,31 +824,130 @@ class DocumentUploadView(APIView):
         if file.size > 10 * 1024 * 1024:
             return Response({"error": "File size must be less than 10MB"}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Re-uploading to an existing document replaces its file; re-indexing
+        # then only embeds chunks whose text changed
+        document_id = request.data.get('document_id')
+        existing = None
+        if document_id:
+            try:
+                existing = Document.objects.get(id=document_id)
+            except (Document.DoesNotExist, ValueError):
+                return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+        
         try:
-            # Create document instance
-            document = Document.objects.create(
-                title=file.name,
-                file=file
-            )
-            
-            # Add to vector store for semantic search
-            success = vector_store.add_document(
-                document_id=document.id,
-                file_path=document.file.path,
-                title=document.title
-            )
+            if existing is not None:
+                existing.file.delete(save=False)
+                existing.title = file.name
+                existing.file = file
+                if 'collection' in request.data:
+                    existing.collection = request.data['collection']
+                existing.status = Document.STATUS_QUEUED
+                existing.error = ''
+                existing.save()
+                document = existing
+            else:
+                # Create document instance; ingestion runs in the background
+                document = Document.objects.create(
+                    title=file.name,
+                    file=file,
+                    collection=request.data.get('collection', ''),
+                    status=Document.STATUS_QUEUED
+                )
             
-            if not success:
-                logger.warning(f"Failed to add document {document.id} to vector store")
+            job_id = enqueue_document(document)
+            document.refresh_from_db()
             
             serializer = DocumentSerializer(document)
             return Response({
-                "message": "File uploaded and processed successfully",
+                "message": "File uploaded and queued for processing",
                 "document": serializer.data,
-                "vector_store_added": success,
-                "processing_time": time.time()
-            }, status=status.HTTP_201_CREATED)
+                "job_id": job_id,
+                "status": document.status,
+                "status_url": f"/api/status/{document.id}/",
+                # Storing the file and queueing it; ingestion timings are in the status endpoint's stage_timings
+                "processing_time": round(time.time() - request_start, 3),
+                "timestamp": time.time()
+            }, status=status.HTTP_202_ACCEPTED)
             
+        except QueueUnavailable:
+            return Response({
+                "error": "Document processing is unavailable right now. Please try again later.",
+                "document_id": document.id
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             logger.error(f"Error uploading document: {str(e)}")
             return Response({"error": "Failed to upload document"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class BatchDocumentUploadView(APIView):
+    def post(self, request, *args, **kwargs):
+        """Upload several PDFs at once and ingest them as one background job"""
+        files = request.FILES.getlist('documents')
+        if not files:
+            return Response({"error": "No files provided"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+            return Response(
+                {"error": f"At most {settings.BATCH_UPLOAD_MAX_FILES} files can be uploaded at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Validate every file before storing any of them
+        for file in files:
+            if not file.name.lower().endswith('.pdf'):
+                return Response({"error": f"Only PDF files are supported ({file.name})"}, status=status.HTTP_400_BAD_REQUEST)
+            if file.size > 10 * 1024 * 1024:
+                return Response({"error": f"File size must be less than 10MB ({file.name})"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            documents = create_documents(
+                ((file.name, file) for file in files),
+                collection=request.data.get('collection', '')
+            )
+            job_id = enqueue_documents(documents)
+            documents = Document.objects.filter(id__in=[document.id for document in documents]).order_by('id')
+            
+            return Response({
+                "message": f"{len(files)} files uploaded and queued for processing",
+                "job_id": job_id,
+                "documents": [
+                    {
+                        "document": DocumentSerializer(document).data,
+                        "status": document.status,
+                        "status_url": f"/api/status/{document.id}/"
+                    }
+                    for document in documents
+                ],
+                "timestamp": time.time()
+            }, status=status.HTTP_202_ACCEPTED)
+            
+        except QueueUnavailable:
+            return Response({
+                "error": "Document processing is unavailable right now. Please try again later.",
+                "document_ids": [document.id for document in documents]
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            logger.error(f"Error uploading documents: {str(e)}")
+            return Response({"error": "Failed to upload documents"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class DocumentStatusView(APIView):
+    def get(self, request, document_id):
+        """Report the ingestion status of a document"""
+        try:
+            document = Document.objects.get(id=document_id)
+        except Document.DoesNotExist:
+            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            "document_id": document.id,
+            "title": document.title,
+            "job_id": document.task_id,
+            "status": document.status,
+            "chunk_count": document.chunk_count,
+            "stage_timings": document.stage_timings,
+            "error": document.error or None,
+            "uploaded_at": document.uploaded_at,
+            "processed_at": document.processed_at,
+            "timestamp": time.time()
+        })
@@ -0,0 +1,18 @@
+# Gunicorn configuration for DocGPT
+# Usage: gunicorn -c gunicorn.conf.py docgpt.wsgi:application
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the app (and load the embedding model) once in the master so forked
+# workers share it copy-on-write instead of each loading their own copy
+preload_app = True
+os.environ.setdefault("DOCGPT_PRELOAD_MODELS", "true")
+
+
+def post_fork(server, worker):
+    # Each worker opens its own Chroma client (SQLite handles are not fork-safe)
+    from docgpt.registry import warm_up
+    warm_up(include_client=True)
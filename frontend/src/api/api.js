@@ -11,6 +11,11 @@ export async function uploadDocument(file) {
   return response.json();
 }
 
+export async function getDocumentStatus(documentId) {
+  const response = await fetch(`${API_BASE}/api/status/${documentId}/`);
+  return response.json();
+}
+
 export async function askQuestion(question, documentId) {
   const response = await fetch(`${API_BASE}/api/ask/`, {
     method: 'POST',
@@ -20,6 +25,46 @@ export async function askQuestion(question, documentId) {
   return response.json();
 }
 
+// Parse a text/event-stream response body, calling onEvent(eventName, data) per event
+export async function readServerSentEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let eventName = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) eventName = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) onEvent(eventName, JSON.parse(data));
+    }
+  }
+}
+
+export async function askQuestionStream(question, documentId, onEvent) {
+  const response = await fetch(`${API_BASE}/api/ask/stream/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ question, document_id: documentId }),
+  });
+  if (!response.ok) {
+    const data = await response.json();
+    throw new Error(data.error || 'Failed to get answer');
+  }
+  await readServerSentEvents(response, onEvent);
+}
+
 export async function testApi() {
   const response = await fetch(`${API_BASE}/api/test/`);
   return response.json();
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import '../DocGPT.css';
+import { readServerSentEvents } from '../api/api';
 
 export default function AskDocument() {
   const [question, setQuestion] = useState('');
@@ -52,7 +53,7 @@ export default function AskDocument() {
         use_semantic_search: useSemanticSearch
       };
       
-      const response = await fetch('/api/ask/', {
+      const response = await fetch('/api/ask/stream/', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -60,13 +61,24 @@ export default function AskDocument() {
         body: JSON.stringify(requestData)
       });
       
-      const data = await response.json();
-      
-      if (response.ok) {
-        setAnswer(data);
-      } else {
+      if (!response.ok) {
+        const data = await response.json();
         setError(data.error || 'Failed to get answer');
+        return;
       }
+      
+      // Render the answer progressively as tokens arrive
+      await readServerSentEvents(response, (event, data) => {
+        if (event === 'meta') {
+          setAnswer({ ...data, answer: '', streaming: true });
+        } else if (event === 'token') {
+          setAnswer(prev => ({ ...prev, answer: (prev?.answer || '') + data.token }));
+        } else if (event === 'done') {
+          setAnswer(prev => ({ ...prev, ...data, streaming: false }));
+        } else if (event === 'error') {
+          setError(data.error || 'Failed to get answer');
+        }
+      });
     } catch (err) {
       console.error('Question error:', err);
       setError('An error occurred while processing your question. Please try again.');
@@ -174,12 +186,29 @@ export default function AskDocument() {
           <div className="answer-meta">
             <div className="flex gap-2" style={{flexWrap: 'wrap', alignItems: 'center'}}>
               <span><strong>Document:</strong> {answer.document?.title}</span>
-              <span><strong>Processing time:</strong> {answer.processing_time}s</span>
+              {answer.streaming ? (
+                <span className="flex gap-2" style={{alignItems: 'center'}}>
+                  <span className="loading-spinner"></span>
+                  Generating...
+                </span>
+              ) : (
+                <>
+                  {answer.time_to_first_token != null && (
+                    <span><strong>First token:</strong> {answer.time_to_first_token}s</span>
+                  )}
+                  <span><strong>Processing time:</strong> {answer.processing_time}s</span>
+                </>
+              )}
               {answer.semantic_search_used && (
                 <span className="message-success" style={{padding: '0.25rem 0.5rem', fontSize: '0.8rem'}}>
                   🔍 Semantic search used
                 </span>
               )}
+              {answer.cached && (
+                <span className="message-success" style={{padding: '0.25rem 0.5rem', fontSize: '0.8rem'}}>
+                  ⚡ Cached answer
+                </span>
+              )}
             </div>
           </div>
           
@@ -1,6 +1,22 @@
 import React, { useState } from "react";
 import '../DocGPT.css';
 
+const STATUS_POLL_INTERVAL_MS = 1000;
+const STATUS_POLL_MAX_ATTEMPTS = 120;
+
+async function waitForProcessing(documentId) {
+  let statusData = { status: 'queued' };
+  for (let attempt = 0; attempt < STATUS_POLL_MAX_ATTEMPTS; attempt++) {
+    const res = await fetch(`/api/status/${documentId}/`);
+    statusData = await res.json();
+    if (!res.ok || statusData.status === 'indexed' || statusData.status === 'failed') {
+      break;
+    }
+    await new Promise(resolve => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+  }
+  return statusData;
+}
+
 export default function DocumentUpload() {
   const [file, setFile] = useState(null);
   const [message, setMessage] = useState('');
@@ -56,19 +72,25 @@ export default function DocumentUpload() {
       const data = await res.json();
       
       if (res.ok) {
-        setMessage(`✅ Upload successful! Document "${data.document.title}" has been processed and is ready for questions.`);
-        setMessageType('success');
+        setMessage(`⏳ Upload successful! Document "${data.document.title}" is being processed...`);
+        setMessageType('info');
         setFile(null);
         
         // Reset file input
         const fileInput = document.querySelector('input[type="file"]');
         if (fileInput) fileInput.value = '';
         
-        // Show additional info if vector store was successful
-        if (data.vector_store_added) {
-          setTimeout(() => {
-            setMessage(prev => prev + ' Semantic search is now available for this document.');
-          }, 1000);
+        // Ingestion runs in the background, poll until it finishes
+        const finalStatus = await waitForProcessing(data.document.id);
+        if (finalStatus.status === 'indexed') {
+          setMessage(`✅ Document "${data.document.title}" has been processed (${finalStatus.chunk_count} chunks) and is ready for questions. Semantic search is now available for this document.`);
+          setMessageType('success');
+        } else if (finalStatus.status === 'failed') {
+          setMessage(`❌ Processing failed: ${finalStatus.error || 'Unknown error'}`);
+          setMessageType('error');
+        } else {
+          setMessage(`⏳ Document "${data.document.title}" is still processing (${finalStatus.status}). You can already ask questions using the full text.`);
+          setMessageType('info');
         }
       } else {
         setMessage(`❌ Upload failed: ${data.error || 'Unknown error'}`);